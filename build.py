@@ -1,9 +1,43 @@
+import argparse
+import ctypes
+import ctypes.util
+import gzip
+import hashlib
+import itertools
+import json
 import os
+import posixpath
+import re
+import select
 import shutil
+import struct
 import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+import instrumentation
 
 # ==============================================================================
 #  Python Build Script for fireClass Project (Corrected Version)
+#
+#  Usage:
+#    - Parallel build (default):  python build.py [--jobs N]
+#    - Serial build:              python build.py --serial
+#    - Per-process minifiers:     python build.py --engine process
+#    - Engine and worker timings: python build.py --compare
+#    - Full rebuild, ignoring the build cache: python build.py --clean
+#    - Rebuild changed files on save:          python build.py --watch
+#    - Emit .gz/.br files and check sizes:     python build.py --compress [--budget-kb N]
+#    - Content-hashed asset names:             python build.py --fingerprint
+#    - One script bundle per page, small CSS/config inlined: python build.py --bundle
+#    - Stage/command timings, JSON lines and a Chrome trace: python build.py --profile
 # ==============================================================================
 
 SOURCE_DIR = 'public'
@@ -11,68 +45,962 @@ BUILD_DIR = 'BUILD'
 TERSER_CMD = os.path.join('node_modules', '.bin', 'terser')
 MINIFY_CMD = os.path.join('node_modules', '.bin', 'minify')
 
-def run_command(command_parts):
+# The 'daemon' engine keeps one Node process (MINIFY_WORKER) running for the
+# whole build and streams files to it; 'process' starts terser/minify per file.
+NODE_CMD = 'node'
+MINIFY_WORKER = 'minify-worker.mjs'
+ENGINES = ('daemon', 'process')
+DAEMON_START_TIMEOUT = 15
+
+# Incremental builds: the manifest records, for every output, the hash of its
+# source, the tool and flags that produced it and the hash of the result.
+# Minified outputs are also kept in CACHE_OBJECTS_DIR under their cache key,
+# so they can be restored without running Node even if BUILD is deleted.
+CACHE_DIR = '.build-cache'
+CACHE_OBJECTS_DIR = os.path.join(CACHE_DIR, 'objects')
+MANIFEST_FILE = os.path.join(CACHE_DIR, 'manifest.json')
+MANIFEST_VERSION = 2
+
+# The minifying happens in Node, so the jobs are I/O bound from Python's point
+# of view and a thread pool is enough to run them at once.
+DEFAULT_JOBS = os.cpu_count() or 1
+
+# Precompression: text assets get .gz and .br siblings at the highest levels.
+# The build fails if any asset's gzip size is over the budget (--budget-kb).
+# Brotli needs the optional 'brotli' package (pip install brotli).
+COMPRESS_EXTENSIONS = ('.js', '.css', '.html', '.json', '.svg')
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+DEFAULT_BUDGET_KB = 50
+
+# Fingerprinting: JS/CSS referenced from the HTML entry points are renamed to
+# name.<hash>.ext and the references rewritten, so they can be cached forever.
+# HTML entry points keep their names and are always revalidated.
+FINGERPRINT_LENGTH = 10
+FIREBASE_CONFIG_FILE = 'firebase.json'
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+HOSTING_HEADERS = [
+    {
+        'regex': f'^/.+\\.[0-9a-f]{{{FINGERPRINT_LENGTH}}}\\.(js|css)$',
+        'headers': [{'key': 'Cache-Control', 'value': IMMUTABLE_CACHE_CONTROL}]
+    },
+    {
+        # '/' as well: it serves index.html, which points at the current fingerprints.
+        'regex': '^/(.*\\.(html|json))?$',
+        'headers': [{'key': 'Cache-Control', 'value': 'no-cache'}]
+    }
+]
+
+# <script src=...> and <link href=...> in (possibly minified, unquoted) HTML.
+ASSET_REF_PATTERN = re.compile(r'''(<(?:script|link)\b[^>]*?\b(?:src|href)\s*=\s*)(["']?)([^"'\s>]+)\2''',
+                               re.IGNORECASE)
+EXTERNAL_URL_PATTERN = re.compile(r'^(?:[a-z][a-z0-9+.-]*:|//|#)', re.IGNORECASE)
+
+# Bundling: consecutive local scripts of a page are concatenated (in document
+# order) into one <page>.bundle.js; scripts and stylesheets up to the inline
+# limits are written straight into the HTML. BUNDLE_REPORT_FILE keeps the graph.
+INLINE_SCRIPT_LIMIT = 1024
+INLINE_STYLE_LIMIT = 8 * 1024
+BUNDLE_REPORT_FILE = os.path.join(CACHE_DIR, 'bundles.json')
+SCRIPT_TAG_PATTERN = re.compile(r'<script\b([^>]*)>(.*?)</script\s*>', re.IGNORECASE | re.DOTALL)
+STYLESHEET_TAG_PATTERN = re.compile(r'<link\b[^>]*\brel\s*=\s*["\']?stylesheet\b[^>]*>', re.IGNORECASE)
+URL_ATTR_PATTERN = re.compile(r'''\b(?:src|href)\s*=\s*(["']?)([^"'\s>]+)\1''', re.IGNORECASE)
+NON_BUNDLABLE_ATTR_PATTERN = re.compile(r'\b(?:async|defer|type\s*=\s*["\']?module|integrity|nomodule)\b',
+                                        re.IGNORECASE)
+CSS_RELATIVE_URL_PATTERN = re.compile(r'''url\(\s*["']?(?![a-z][a-z0-9+.-]*:|/|#)''', re.IGNORECASE)
+
+# Watch mode: saves closer together than WATCH_DEBOUNCE seconds are rebuilt as
+# one batch. WATCH_POLL_INTERVAL is used where inotify isn't available.
+WATCH_DEBOUNCE = 0.1
+WATCH_POLL_INTERVAL = 0.25
+
+def run_command(command_parts, log=print):
     """Runs a command and checks for errors."""
-    print(f"  > Running: {' '.join(command_parts)}")
+    log(f"  > Running: {' '.join(command_parts)}")
     is_windows = os.name == 'nt'
-    result = subprocess.run(command_parts, capture_output=True, text=True, shell=is_windows)
+    result = instrumentation.run(command_parts, capture_output=True, text=True, shell=is_windows)
     if result.returncode != 0:
-        print(f"    ERROR: Command failed with exit code {result.returncode}")
-        print(f"    Stderr: {result.stderr}")
+        log(f"    ERROR: Command failed with exit code {result.returncode}")
+        log(f"    Stderr: {result.stderr}")
     return result.returncode == 0
 
-def main():
-    """Main function to orchestrate the build process."""
-    print(f"--- Starting fireClass build process ---")
+class DaemonError(Exception):
+    """Raised when the minifier daemon can't be reached or has exited."""
 
-    print(f"\n--- Step 1: Cleaning up old '{BUILD_DIR}' directory... ---")
-    if os.path.exists(BUILD_DIR):
-        shutil.rmtree(BUILD_DIR)
-        print(f"Removed old '{BUILD_DIR}' directory.")
-    
-    os.makedirs(BUILD_DIR, exist_ok=True)
-    print(f"Created clean '{BUILD_DIR}' directory.")
+class MinifierDaemon:
+    """
+    A long-lived Node worker (see minify-worker.mjs) that minifies file contents.
+    Requests and responses are length-prefixed JSON frames on stdin/stdout, tagged
+    with an id so several build threads can have requests in flight at once.
+    """
+
+    def __init__(self):
+        self.process = subprocess.Popen([NODE_CMD, MINIFY_WORKER], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self._write_lock = threading.Lock()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._next_id = 0
+        self._reader = threading.Thread(target=self._read_responses, daemon=True)
+        self._reader.start()
+
+    @classmethod
+    def start(cls):
+        """Starts the worker and waits until it answers, or raises DaemonError."""
+        try:
+            daemon = cls()
+        except OSError as e:
+            raise DaemonError(f"Could not start '{NODE_CMD} {MINIFY_WORKER}': {e}")
+        try:
+            daemon.request('ping', '', timeout=DAEMON_START_TIMEOUT)
+        except DaemonError:
+            daemon.close()
+            raise
+        return daemon
+
+    def _read_exactly(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self.process.stdout.read(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def _read_responses(self):
+        while True:
+            header = self._read_exactly(4)
+            body = header and self._read_exactly(struct.unpack('>I', header)[0])
+            if body is None:
+                break
+            response = json.loads(body.decode('utf-8'))
+            with self._pending_lock:
+                future = self._pending.pop(response['id'], None)
+            if future:
+                future.set_result(response)
+
+        # The worker has exited: fail everything still waiting on it.
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(DaemonError("Minifier daemon exited"))
+
+    def request(self, kind, source, flags=(), timeout=None):
+        """Sends one file to the worker. Returns (ok, code_or_error)."""
+        future = Future()
+        with self._pending_lock:
+            self._next_id += 1
+            request_id = self._next_id
+            self._pending[request_id] = future
+
+        body = json.dumps({'id': request_id, 'kind': kind, 'flags': list(flags), 'source': source}).encode('utf-8')
+        try:
+            with self._write_lock:
+                self.process.stdin.write(struct.pack('>I', len(body)) + body)
+                self.process.stdin.flush()
+        except (OSError, ValueError) as e:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            raise DaemonError(f"Could not write to minifier daemon: {e}")
+
+        try:
+            response = future.result(timeout=timeout)
+        except TimeoutError:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            raise DaemonError("Minifier daemon did not respond in time")
+        if response['ok']:
+            return True, response['code']
+        return False, response['error']
+
+    def close(self):
+        """Closes the worker's stdin and waits for it to exit."""
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+def start_engine(engine):
+    """Returns a running MinifierDaemon for the 'daemon' engine, or None to use per-file processes."""
+    if engine != 'daemon':
+        return None
+    try:
+        with instrumentation.stage("Start minifier daemon"):
+            daemon = MinifierDaemon.start()
+        print(f"Started minifier daemon: {NODE_CMD} {MINIFY_WORKER}")
+        return daemon
+    except DaemonError as e:
+        print(f"  WARNING: {e}")
+        print("  Falling back to one terser/minify process per file.")
+        return None
+
+def hash_bytes(data):
+    """Returns the hex SHA-256 digest of a bytes object."""
+    return hashlib.sha256(data).hexdigest()
+
+def hash_file(path):
+    """Returns the hex SHA-256 digest of a file, or None if it doesn't exist."""
+    try:
+        with open(path, 'rb') as f:
+            return hash_bytes(f.read())
+    except FileNotFoundError:
+        return None
+
+def plan_file(filename):
+    """Returns the (tool, flags) used to build a file: 'terser', 'minify' or 'copy'."""
+    # *** THIS IS THE FIX: We exclude firebase-config.js from being minified by Terser ***
+    if filename.endswith('.js') and filename != 'firebase-config.js':
+        return 'terser', ['-c', '-m']
+    if filename.endswith(('.css', '.html')):
+        return 'minify', []
+    # All other files (like config.json AND firebase-config.js) will be copied as-is
+    return 'copy', []
+
+def cache_key(source_hash, tool, flags, engine):
+    """Identifies one minifier run: same source, tool, flags and engine give the same output."""
+    return hash_bytes(json.dumps([source_hash, tool, flags, engine]).encode('utf-8'))
+
+def load_manifest():
+    """Loads the build manifest, or returns an empty one if missing or outdated."""
+    try:
+        with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    except (FileNotFoundError, ValueError):
+        pass
+    return {'version': MANIFEST_VERSION, 'files': {}}
 
-    print(f"\n--- Step 2: Minifying and copying project files from '{SOURCE_DIR}'... ---")
-    
-    files_processed = 0
+def save_manifest(manifest):
+    """Writes the build manifest and drops cached objects it no longer refers to."""
+    os.makedirs(CACHE_OBJECTS_DIR, exist_ok=True)
+    tmp_path = MANIFEST_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+    live_keys = {entry['cache_key'] for entry in manifest['files'].values()}
+    for name in os.listdir(CACHE_OBJECTS_DIR):
+        if name not in live_keys:
+            os.remove(os.path.join(CACHE_OBJECTS_DIR, name))
+
+def store_object(key, dest_path):
+    """Copies a freshly built output into the object cache."""
+    os.makedirs(CACHE_OBJECTS_DIR, exist_ok=True)
+    object_path = os.path.join(CACHE_OBJECTS_DIR, key)
+    tmp_path = f"{object_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.copyfile(dest_path, tmp_path)
+    os.replace(tmp_path, object_path)
+
+def minify_file(tool, flags, source_path, dest_path, filename, log, daemon=None):
+    """Runs the minifier for one file, writing dest_path. Returns True on success."""
+    if daemon:
+        with open(source_path, 'r', encoding='utf-8') as f_in:
+            source = f_in.read()
+        kind = 'js' if tool == 'terser' else os.path.splitext(filename)[1].lstrip('.')
+        log(f"  > Minifying via daemon: {' '.join([tool] + flags)}")
+        try:
+            with instrumentation.stage(f"{tool} {filename}", category='daemon', per_thread=True):
+                ok, output = daemon.request(kind, source, flags)
+        except DaemonError as e:
+            log(f"    WARNING: {e}; falling back to a separate process.")
+        else:
+            if ok:
+                with open(dest_path, 'w', encoding='utf-8') as f_out:
+                    f_out.write(output)
+                return True
+            log(f"    ERROR: {tool} failed for {filename}")
+            log(f"    Error: {output}")
+            return False
+
+    if tool == 'terser':
+        command = [TERSER_CMD, source_path, '-o', dest_path] + flags
+        return run_command(command, log)
+
+    with open(dest_path, 'w', encoding='utf-8') as f_out:
+        result = instrumentation.run([MINIFY_CMD, source_path] + flags, capture_output=True, text=True,
+                                     shell=(os.name == 'nt'))
+        if result.returncode == 0:
+            f_out.write(result.stdout)
+            return True
+    log(f"    ERROR: Minify failed for {filename}")
+    log(f"    Stderr: {result.stderr}")
+    return False
+
+def build_file(source_path, dest_path, filename, previous=None, daemon=None):
+    """
+    Builds a single file into the build directory, reusing earlier work when possible:
+    an output that already matches the manifest is left in place, and a known
+    (source, tool, flags) combination is restored from the object cache.
+    Output is collected instead of printed so parallel jobs don't interleave.
+    Returns (status, log_lines, manifest_entry); status is 'built', 'cached',
+    'unchanged' or 'failed'.
+    """
+    lines = []
+    log = lines.append
+    log(f"\nProcessing: {source_path}")
+
+    tool, flags = plan_file(filename)
+    # The daemon drives terser/minify through their APIs rather than their CLIs,
+    # so its outputs are cached separately from the per-process ones.
+    engine = None if tool == 'copy' else ('daemon' if daemon else 'process')
+    source_hash = hash_file(source_path)
+    key = cache_key(source_hash, tool, flags, engine)
+
+    if previous and previous['cache_key'] == key and hash_file(dest_path) == previous['output_hash']:
+        log(f"  > Unchanged, left in place.")
+        return 'unchanged', lines, previous
+
+    object_path = os.path.join(CACHE_OBJECTS_DIR, key)
+    if tool != 'copy' and os.path.exists(object_path):
+        shutil.copyfile(object_path, dest_path)
+        log(f"  > Restored from build cache.")
+        status = 'cached'
+    elif tool == 'copy':
+        shutil.copy2(source_path, dest_path)
+        log(f"  > Copied '{filename}' as-is.")
+        status = 'built'
+    elif minify_file(tool, flags, source_path, dest_path, filename, log, daemon):
+        store_object(key, dest_path)
+        status = 'built'
+    else:
+        return 'failed', lines, None
+
+    entry = {
+        'source_hash': source_hash,
+        'tool': tool,
+        'flags': flags,
+        'engine': engine,
+        'cache_key': key,
+        'output_hash': hash_file(dest_path),
+    }
+    return status, lines, entry
+
+def make_job(source_path):
+    """Returns the (source, dest, filename) job for one source file."""
+    relative_path = os.path.relpath(source_path, SOURCE_DIR)
+    dest_path = os.path.join(BUILD_DIR, relative_path)
+
+    # Created up front so the workers never race on the same directory.
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    return source_path, dest_path, os.path.basename(source_path)
+
+def collect_jobs():
+    """Walks the source directory and returns a (source, dest, filename) job per file."""
+    jobs = []
     for root, _, files in os.walk(SOURCE_DIR):
         for filename in files:
-            source_path = os.path.join(root, filename)
-            relative_path = os.path.relpath(source_path, SOURCE_DIR)
-            dest_path = os.path.join(BUILD_DIR, relative_path)
-            
-            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-            
-            print(f"\nProcessing: {source_path}")
-
-            success = False
-            # *** THIS IS THE FIX: We exclude firebase-config.js from being minified by Terser ***
-            if filename.endswith('.js') and filename != 'firebase-config.js':
-                command = [TERSER_CMD, source_path, '-o', dest_path, '-c', '-m']
-                success = run_command(command)
-            elif filename.endswith(('.css', '.html')):
-                with open(dest_path, 'w', encoding='utf-8') as f_out:
-                    result = subprocess.run([MINIFY_CMD, source_path], capture_output=True, text=True, shell=(os.name == 'nt'))
-                    if result.returncode == 0:
-                        f_out.write(result.stdout)
-                        success = True
-                    else:
-                        print(f"    ERROR: Minify failed for {filename}")
-                        print(f"    Stderr: {result.stderr}")
+            jobs.append(make_job(os.path.join(root, filename)))
+    return jobs
+
+def run_jobs(jobs, workers, manifest, daemon=None):
+    """
+    Runs the per-file jobs, one at a time or on a pool of `workers` threads.
+    Returns (counts per status, new manifest entries keyed by build-relative path).
+    """
+    counts = {'built': 0, 'cached': 0, 'unchanged': 0, 'failed': 0}
+    entries = {}
+
+    def run(job):
+        relative_path = os.path.relpath(job[1], BUILD_DIR).replace(os.sep, '/')
+        return relative_path, build_file(*job, manifest['files'].get(relative_path), daemon)
+
+    def report(results):
+        # Results arrive in job order, so the log reads the same as a serial run.
+        for relative_path, (status, lines, entry) in results:
+            for line in lines:
+                print(line)
+            counts[status] += 1
+            if entry:
+                entries[relative_path] = entry
+
+    if workers <= 1:
+        report(run(job) for job in jobs)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            report(pool.map(run, jobs))
+
+    return counts, entries
+
+def remove_stale_outputs(expected_paths):
+    """Deletes files in the build directory that no current source produces."""
+    removed = 0
+    for root, _, files in os.walk(BUILD_DIR, topdown=False):
+        for filename in files:
+            path = os.path.join(root, filename)
+            if os.path.relpath(path, BUILD_DIR).replace(os.sep, '/') not in expected_paths:
+                os.remove(path)
+                print(f"  > Removed stale output: {path}")
+                removed += 1
+        if root != BUILD_DIR and not os.listdir(root):
+            os.rmdir(root)
+    return removed
+
+def resolve_reference(page_path, url):
+    """Returns the build-relative path a local URL in page_path points to, or None for external URLs."""
+    if EXTERNAL_URL_PATTERN.match(url):
+        return None
+    url = url.split('#')[0].split('?')[0]
+    if url.startswith('/'):
+        return url.lstrip('/')
+    return posixpath.normpath(posixpath.join(posixpath.dirname(page_path), url))
+
+def find_asset_references(page_path, html):
+    """Yields (match, build-relative target) for each local script/stylesheet reference in a page."""
+    for match in ASSET_REF_PATTERN.finditer(html):
+        target = resolve_reference(page_path, match.group(3))
+        if target:
+            yield match, target
+
+def fingerprint_assets(outputs):
+    """
+    Renames every JS/CSS output referenced by an HTML entry point to name.<hash>.ext
+    and rewrites the references. `outputs` maps build-relative paths to output
+    hashes and is updated in place. Returns {original path: fingerprinted path}.
+    """
+    pages = sorted(path for path in outputs if path.endswith('.html'))
+    renames = {}
+
+    for page in pages:
+        page_path = os.path.join(BUILD_DIR, page)
+        with open(page_path, 'r', encoding='utf-8') as f:
+            html = f.read()
+
+        def rewrite(match, page=page):
+            target = resolve_reference(page, match.group(3))
+            if target not in outputs or not target.endswith(('.js', '.css')):
+                return match.group(0)
+            if target not in renames:
+                root, ext = posixpath.splitext(target)
+                renames[target] = f"{root}.{outputs[target][:FINGERPRINT_LENGTH]}{ext}"
+            url = match.group(3)
+            new_url = posixpath.join(posixpath.dirname(url), posixpath.basename(renames[target]))
+            return f"{match.group(1)}{match.group(2)}{new_url}{match.group(2)}"
+
+        new_html = ASSET_REF_PATTERN.sub(rewrite, html)
+        if new_html != html:
+            with open(page_path, 'w', encoding='utf-8') as f:
+                f.write(new_html)
+            outputs[page] = hash_bytes(new_html.encode('utf-8'))
+
+    for original, fingerprinted in sorted(renames.items()):
+        os.replace(os.path.join(BUILD_DIR, original), os.path.join(BUILD_DIR, fingerprinted))
+        outputs[fingerprinted] = outputs.pop(original)
+        print(f"  > {original} -> {fingerprinted}")
+    return renames
+
+def update_hosting_headers():
+    """Makes sure firebase.json serves fingerprinted assets as immutable and HTML as no-cache."""
+    with open(FIREBASE_CONFIG_FILE, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    hosting = config.setdefault('hosting', {})
+    if hosting.get('headers') == HOSTING_HEADERS:
+        print(f"  > '{FIREBASE_CONFIG_FILE}' caching headers are up to date.")
+        return
+    hosting['headers'] = HOSTING_HEADERS
+    with open(FIREBASE_CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+    print(f"  > Updated caching headers in '{FIREBASE_CONFIG_FILE}'.")
+
+def read_output(relative_path):
+    """Reads a built file as text."""
+    with open(os.path.join(BUILD_DIR, relative_path), 'r', encoding='utf-8') as f:
+        return f.read()
+
+def page_cost(page, html, outputs):
+    """Returns (requests, bytes) to load a page: the HTML plus every script/stylesheet it references."""
+    requests = 1
+    local = set()
+    for match in ASSET_REF_PATTERN.finditer(html):
+        requests += 1
+        target = resolve_reference(page, match.group(3))
+        if target in outputs:
+            local.add(target)
+    size = len(html.encode('utf-8')) + sum(os.path.getsize(os.path.join(BUILD_DIR, path)) for path in local)
+    return requests, size
+
+def bundle_page(page, outputs, sources):
+    """
+    Bundles and inlines one page's scripts and stylesheets (see INLINE_*_LIMIT).
+    Updates `outputs` and `sources` with new bundles. Returns the page's graph entry.
+    """
+    html = read_output(page)
+    before = page_cost(page, html, outputs)
+    page_dir = posixpath.dirname(page)
+    stem = posixpath.splitext(posixpath.basename(page))[0]
+    graph = {'page': page, 'nodes': [], 'bundles': {}}
+    replacements = []
+    run = []
+
+    def flush():
+        if len(run) < 2:
+            run.clear()
+            return
+        name = f"{stem}.bundle.js" if not graph['bundles'] else f"{stem}.bundle-{len(graph['bundles']) + 1}.js"
+        bundle_path = posixpath.join(posixpath.dirname(run[0][1]), name)
+        # Each part is already minified; ';' guards against parts that rely on ASI at the end.
+        code = ';\n'.join(read_output(target).rstrip().rstrip(';') for _, target in run) + ';\n'
+        with open(os.path.join(BUILD_DIR, bundle_path), 'w', encoding='utf-8') as f:
+            f.write(code)
+        outputs[bundle_path] = hash_bytes(code.encode('utf-8'))
+        sources[bundle_path] = [source for _, target in run for source in sources[target]]
+        graph['bundles'][bundle_path] = [target for _, target in run]
+
+        url = posixpath.relpath(bundle_path, page_dir or '.')
+        replacements.append((run[0][0].start(), run[0][0].end(), f'<script src="{url}"></script>'))
+        for match, _ in run[1:]:
+            replacements.append((match.start(), match.end(), ''))
+        run.clear()
+
+    for match in SCRIPT_TAG_PATTERN.finditer(html):
+        attrs = match.group(1)
+        url_match = URL_ATTR_PATTERN.search(attrs)
+        target = resolve_reference(page, url_match.group(2)) if url_match else None
+        if not url_match:
+            flush()
+            graph['nodes'].append({'type': 'inline-script'})
+        elif target not in outputs or NON_BUNDLABLE_ATTR_PATTERN.search(attrs):
+            flush()
+            graph['nodes'].append({'type': 'external-script', 'url': url_match.group(2)})
+        elif os.path.getsize(os.path.join(BUILD_DIR, target)) <= INLINE_SCRIPT_LIMIT:
+            flush()
+            code = read_output(target).replace('</script', '<\\/script')
+            replacements.append((match.start(), match.end(), f"<script>{code}</script>"))
+            graph['nodes'].append({'type': 'inlined-script', 'path': target})
+        else:
+            run.append((match, target))
+            graph['nodes'].append({'type': 'bundled-script', 'path': target})
+    flush()
+
+    for match in STYLESHEET_TAG_PATTERN.finditer(html):
+        url_match = URL_ATTR_PATTERN.search(match.group(0))
+        target = resolve_reference(page, url_match.group(2)) if url_match else None
+        if target not in outputs:
+            graph['nodes'].append({'type': 'external-stylesheet', 'url': url_match.group(2) if url_match else None})
+            continue
+        css = read_output(target)
+        # Relative url(...)s would resolve against the page instead of the stylesheet once inlined.
+        if len(css.encode('utf-8')) > INLINE_STYLE_LIMIT or CSS_RELATIVE_URL_PATTERN.search(css):
+            graph['nodes'].append({'type': 'stylesheet', 'path': target})
+            continue
+        css = css.replace('</style', '<\\/style')
+        replacements.append((match.start(), match.end(), f"<style>{css}</style>"))
+        graph['nodes'].append({'type': 'inlined-stylesheet', 'path': target})
+
+    for start, end, text in sorted(replacements, reverse=True):
+        html = html[:start] + text + html[end:]
+    with open(os.path.join(BUILD_DIR, page), 'w', encoding='utf-8') as f:
+        f.write(html)
+    outputs[page] = hash_bytes(html.encode('utf-8'))
+
+    after = page_cost(page, html, outputs)
+    graph['before'] = {'requests': before[0], 'bytes': before[1]}
+    graph['after'] = {'requests': after[0], 'bytes': after[1]}
+    return graph
+
+def bundle_pages(outputs, sources):
+    """
+    Bundles every HTML page, drops outputs that are now only reached through a
+    bundle or inline copy, prints the dependency graph and per-page costs, and
+    writes them to BUNDLE_REPORT_FILE.
+    """
+    pages = sorted(path for path in outputs if path.endswith('.html'))
+    graphs = [bundle_page(page, outputs, sources) for page in pages]
+
+    consumed = {node['path'] for graph in graphs for node in graph['nodes']
+                if node['type'] in ('bundled-script', 'inlined-script', 'inlined-stylesheet')}
+    still_referenced = {target for page in pages for _, target in find_asset_references(page, read_output(page))}
+    for path in sorted(consumed - still_referenced):
+        del outputs[path]
+        os.remove(os.path.join(BUILD_DIR, path))
+
+    for graph in graphs:
+        print(f"\n  {graph['page']}")
+        for node in graph['nodes']:
+            print(f"    - {node['type']}: {node.get('path') or node.get('url') or ''}".rstrip(': '))
+        for bundle_path, parts in graph['bundles'].items():
+            print(f"    => {bundle_path} = {' + '.join(parts)}")
+        before, after = graph['before'], graph['after']
+        print(f"    Requests: {before['requests']} -> {after['requests']}, "
+              f"local bytes: {before['bytes']:,} -> {after['bytes']:,}")
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(BUNDLE_REPORT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(graphs, f, indent=2)
+    print(f"\n  Dependency graph written to '{BUNDLE_REPORT_FILE}'.")
+
+def compress_file(relative_path, output_hash, previous):
+    """
+    Writes .gz and .br variants next to one built asset, unless the previous
+    build already compressed this exact output. Returns its 'compressed' entry.
+    """
+    dest_path = os.path.join(BUILD_DIR, relative_path)
+    variants = [dest_path + '.gz'] + ([dest_path + '.br'] if brotli else [])
+    if (previous and previous['output_hash'] == output_hash
+            and (previous['brotli'] is not None) == bool(brotli)
+            and all(os.path.exists(path) for path in variants)):
+        return previous
+
+    with open(dest_path, 'rb') as f:
+        data = f.read()
+    # mtime=0 keeps the .gz byte-for-byte reproducible between builds.
+    gz_data = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    with open(dest_path + '.gz', 'wb') as f:
+        f.write(gz_data)
+    br_size = None
+    if brotli:
+        br_data = brotli.compress(data, quality=BROTLI_QUALITY)
+        with open(dest_path + '.br', 'wb') as f:
+            f.write(br_data)
+        br_size = len(br_data)
+    return {'output_hash': output_hash, 'gzip': len(gz_data), 'brotli': br_size}
+
+def compress_assets(outputs, previous, workers):
+    """Precompresses every text asset in parallel. Returns the new 'compressed' manifest section."""
+    targets = sorted(path for path in outputs if path.endswith(COMPRESS_EXTENSIONS))
+    if not brotli:
+        print("  WARNING: 'brotli' is not installed; only .gz files will be written (pip install brotli).")
+
+    def run(relative_path):
+        with instrumentation.stage(f"compress {relative_path}", category='compress', per_thread=True):
+            return relative_path, compress_file(relative_path, outputs[relative_path], previous.get(relative_path))
+
+    # zlib and brotli release the GIL while compressing, so threads run them in parallel.
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return dict(pool.map(run, targets))
+
+def print_size_report(sources, compressed, budget_bytes):
+    """Prints raw, minified, gzip and Brotli sizes per asset. Returns the assets over budget."""
+    over_budget = []
+
+    print(f"\n  {'Asset':<36} {'Raw':>9} {'Minified':>9} {'Gzip':>9} {'Brotli':>9}")
+    totals = [0, 0, 0, 0]
+    for relative_path, sizes in sorted(compressed.items()):
+        raw = sum(os.path.getsize(source) for source in sources[relative_path])
+        minified = os.path.getsize(os.path.join(BUILD_DIR, relative_path))
+        br = sizes['brotli']
+        br_text = f"{br:,}" if br is not None else "-"
+        flag = ""
+        if sizes['gzip'] > budget_bytes:
+            over_budget.append(relative_path)
+            flag = "  ❌ over budget"
+        print(f"  {relative_path:<36} {raw:>9,} {minified:>9,} {sizes['gzip']:>9,} {br_text:>9}{flag}")
+        for i, value in enumerate((raw, minified, sizes['gzip'], br or 0)):
+            totals[i] += value
+    br_total = f"{totals[3]:,}" if brotli else "-"
+    print(f"  {'Total':<36} {totals[0]:>9,} {totals[1]:>9,} {totals[2]:>9,} {br_total:>9}")
+    print(f"  Budget: {budget_bytes / 1024:.0f} KB gzipped per asset.")
+    return over_budget
+
+def build(workers, clean=False, engine='daemon', compress=False, budget_kb=DEFAULT_BUDGET_KB,
+          fingerprint=False, bundle=False):
+    """
+    Brings the build directory up to date. Returns (counts per status, seconds);
+    counts['over_budget'] lists the assets whose compressed size is over budget.
+    """
+    start = time.perf_counter()
+    step = itertools.count(1)
+
+    if clean:
+        print(f"\n--- Step {next(step)}: Cleaning up old '{BUILD_DIR}' directory and build cache... ---")
+        with instrumentation.stage("Clean"):
+            for path in (BUILD_DIR, CACHE_DIR):
+                if os.path.exists(path):
+                    shutil.rmtree(path)
+                    print(f"Removed old '{path}' directory.")
+    else:
+        print(f"\n--- Step {next(step)}: Loading build cache from '{CACHE_DIR}'... ---")
+
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    manifest = load_manifest()
+    print(f"Build cache has {len(manifest['files'])} entries.")
+
+    mode = "serially" if workers <= 1 else f"with {workers} workers"
+    print(f"\n--- Step {next(step)}: Minifying and copying project files from '{SOURCE_DIR}' {mode}... ---")
+    with instrumentation.stage("Minify and copy", engine=engine, workers=workers):
+        jobs = collect_jobs()
+        daemon = start_engine(engine)
+        try:
+            counts, entries = run_jobs(jobs, workers, manifest, daemon)
+        finally:
+            if daemon:
+                daemon.close()
+
+    # What ends up in BUILD: build-relative path -> content hash, and where it came from.
+    outputs = {path: entry['output_hash'] for path, entry in entries.items()}
+    sources = {os.path.relpath(dest, BUILD_DIR).replace(os.sep, '/'): [source] for source, dest, _ in jobs}
+
+    if bundle:
+        print(f"\n--- Step {next(step)}: Bundling scripts and inlining small assets into HTML pages... ---")
+        with instrumentation.stage("Bundle"):
+            bundle_pages(outputs, sources)
+
+    if fingerprint:
+        print(f"\n--- Step {next(step)}: Fingerprinting assets referenced by HTML pages... ---")
+        with instrumentation.stage("Fingerprint"):
+            renames = fingerprint_assets(outputs)
+            for original, fingerprinted in renames.items():
+                sources[fingerprinted] = sources[original]
+            update_hosting_headers()
+
+    expected_paths = set(outputs)
+
+    compressed = {}
+    counts['over_budget'] = []
+    if compress:
+        print(f"\n--- Step {next(step)}: Precompressing assets (gzip -{GZIP_LEVEL}, Brotli q{BROTLI_QUALITY})... ---")
+        with instrumentation.stage("Precompress", workers=workers):
+            compressed = compress_assets(outputs, manifest.get('compressed', {}), workers)
+        counts['over_budget'] = print_size_report(sources, compressed, budget_kb * 1024)
+        for relative_path, sizes in compressed.items():
+            expected_paths.add(relative_path + '.gz')
+            if sizes['brotli'] is not None:
+                expected_paths.add(relative_path + '.br')
+
+    print(f"\n--- Step {next(step)}: Removing stale outputs from '{BUILD_DIR}'... ---")
+    with instrumentation.stage("Remove stale outputs and save manifest"):
+        counts['removed'] = remove_stale_outputs(expected_paths)
+        save_manifest({'version': MANIFEST_VERSION, 'files': entries, 'compressed': compressed})
+
+    return counts, time.perf_counter() - start
+
+class InotifyWatcher:
+    """Watches a directory tree with Linux inotify (through ctypes, no extra packages)."""
+
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_ISDIR = 0x40000000
+    EVENT_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_MODIFY
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, root):
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError("libc not found")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError("inotify is not available on this system")
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}
+        for dirpath, _, _ in os.walk(root):
+            self._add_watch(dirpath)
+
+    def _add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), self.EVENT_MASK)
+        if wd >= 0:
+            self._dirs[wd] = path
+
+    def changes(self, timeout):
+        """Blocks up to `timeout` seconds and returns the set of paths that changed."""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        data = os.read(self._fd, 64 * 1024)
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'surrogateescape')
+            offset += length
+            if wd not in self._dirs or not name:
+                continue
+            path = os.path.join(self._dirs[wd], name)
+            if mask & self.IN_ISDIR:
+                # A new (or moved-in) directory: watch it and pick up anything already inside.
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    for dirpath, _, files in os.walk(path):
+                        self._add_watch(dirpath)
+                        changed.update(os.path.join(dirpath, f) for f in files)
+                continue
+            changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+class PollingWatcher:
+    """Fallback watcher that compares file mtimes and sizes every WATCH_POLL_INTERVAL seconds."""
+
+    def __init__(self, root):
+        self._root = root
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for dirpath, _, files in os.walk(self._root):
+            for filename in files:
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def changes(self, timeout):
+        """Sleeps up to `timeout` seconds and returns the set of paths that changed."""
+        time.sleep(min(timeout, WATCH_POLL_INTERVAL))
+        current = self._scan()
+        changed = {path for path in current.keys() | self._snapshot.keys()
+                   if current.get(path) != self._snapshot.get(path)}
+        self._snapshot = current
+        return changed
+
+    def close(self):
+        pass
+
+def create_watcher(root):
+    """Returns an inotify watcher where supported, otherwise a polling one."""
+    try:
+        watcher = InotifyWatcher(root)
+        print(f"Watching '{root}' with inotify.")
+    except (OSError, AttributeError) as e:
+        watcher = PollingWatcher(root)
+        print(f"Watching '{root}' by polling every {WATCH_POLL_INTERVAL}s (inotify unavailable: {e}).")
+    return watcher
+
+def rebuild_changed(paths, manifest, daemon):
+    """
+    Rebuilds just the given source files with the same rules as a full build,
+    and removes the outputs of sources that were deleted. Updates the manifest.
+    """
+    for source_path in sorted(paths):
+        relative_path = os.path.relpath(source_path, SOURCE_DIR).replace(os.sep, '/')
+        if os.path.isfile(source_path):
+            status, lines, entry = build_file(*make_job(source_path), manifest['files'].get(relative_path), daemon)
+            for line in lines:
+                print(line)
+            if entry:
+                manifest['files'][relative_path] = entry
             else:
-                # All other files (like config.json AND firebase-config.js) will be copied as-is
-                shutil.copy2(source_path, dest_path)
-                print(f"  > Copied '{filename}' as-is.")
-                success = True
+                manifest['files'].pop(relative_path, None)
+        elif relative_path in manifest['files']:
+            dest_path = os.path.join(BUILD_DIR, relative_path)
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+            del manifest['files'][relative_path]
+            print(f"\nRemoved: {dest_path} (source deleted)")
+    save_manifest(manifest)
+
+def watch(engine='daemon'):
+    """Watches the source directory and rebuilds files as they are saved, until Ctrl+C."""
+    print(f"\n--- Watching '{SOURCE_DIR}' for changes (Ctrl+C to stop)... ---")
+    watcher = create_watcher(SOURCE_DIR)
+    daemon = start_engine(engine)
+    manifest = load_manifest()
+    try:
+        while True:
+            changed = watcher.changes(timeout=1.0)
+            if not changed:
+                continue
+            first_event = time.perf_counter()
+            # Debounce: editors often write a file several times per save.
+            while True:
+                more = watcher.changes(timeout=WATCH_DEBOUNCE)
+                if not more:
+                    break
+                changed |= more
+            with instrumentation.stage("Rebuild changed files", files=len(changed)):
+                rebuild_changed(changed, manifest, daemon)
+            elapsed_ms = (time.perf_counter() - first_event) * 1000
+            print(f"⚡ Rebuilt {len(changed)} changed file(s) in {elapsed_ms:.0f} ms.")
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        watcher.close()
+        if daemon:
+            daemon.close()
 
-            if success:
-                files_processed += 1
+def main():
+    """Main function to orchestrate the build process."""
+    parser = argparse.ArgumentParser(description="Minify the fireClass project into the BUILD directory.")
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS,
+                        help=f"Number of files to minify at the same time (default: {DEFAULT_JOBS}).")
+    parser.add_argument('--serial', action='store_true', help="Minify one file at a time (same as --jobs 1).")
+    parser.add_argument('--engine', choices=ENGINES, default='daemon',
+                        help="'daemon' streams files to one long-lived Node worker (default); "
+                             "'process' starts terser/minify for every file.")
+    parser.add_argument('--clean', action='store_true',
+                        help=f"Delete '{BUILD_DIR}' and the build cache and rebuild everything.")
+    parser.add_argument('--compare', action='store_true',
+                        help="Build from a clean tree with each engine, serially and in parallel, "
+                             "and report the wall-clock times.")
+    parser.add_argument('--compress', action='store_true',
+                        help="Write .gz and .br variants of text assets and print a size report.")
+    parser.add_argument('--budget-kb', type=float, default=DEFAULT_BUDGET_KB,
+                        help=f"With --compress, fail if any asset is over this many gzipped KB "
+                             f"(default: {DEFAULT_BUDGET_KB}).")
+    parser.add_argument('--fingerprint', action='store_true',
+                        help="Rename JS/CSS referenced by the HTML pages to name.<hash>.ext for long-lived caching.")
+    parser.add_argument('--bundle', action='store_true',
+                        help="Concatenate each page's scripts into one bundle and inline small CSS and scripts.")
+    parser.add_argument('--watch', action='store_true',
+                        help=f"After building, keep watching '{SOURCE_DIR}' and rebuild files as they change "
+                             f"(not with --fingerprint, --bundle or --compress).")
+    instrumentation.add_profile_arguments(parser)
+    args = parser.parse_args()
+    if args.watch and (args.fingerprint or args.bundle or args.compress):
+        # Watch rebuilds write plain minified files, which the renamed, bundled or
+        # compressed outputs of the first build would no longer match
+        parser.error("--watch can't be combined with --fingerprint, --bundle or --compress")
+    instrumentation.enable_profile(args, 'build')
+
+    workers = 1 if args.serial else max(1, args.jobs)
+    clean = args.clean or args.compare
+
+    print(f"--- Starting fireClass build process ---")
+
+    timings = []
+    if args.compare:
+        runs = [('process', 1)]
+        if workers > 1:
+            runs.append(('process', workers))
+        runs.append(('daemon', 1))
+        for engine, run_workers in runs:
+            with instrumentation.stage(f"Build ({engine} engine, {run_workers} workers)", category='build'):
+                _, seconds = build(run_workers, clean=True, engine=engine)
+            timings.append((engine, run_workers, seconds))
+    with instrumentation.stage(f"Build ({args.engine} engine, {workers} workers)", category='build'):
+        counts, seconds = build(workers, clean=clean, engine=args.engine,
+                                compress=args.compress, budget_kb=args.budget_kb,
+                                fingerprint=args.fingerprint, bundle=args.bundle)
+    timings.append((args.engine, workers, seconds))
+    files_processed = counts['built'] + counts['cached'] + counts['unchanged']
 
     print("\n" + "="*50)
     print(f"✅ Build process complete! Processed {files_processed} files.")
+    print(f"   Minified/copied: {counts['built']}, restored from cache: {counts['cached']}, "
+          f"unchanged: {counts['unchanged']}, stale removed: {counts['removed']}")
+    if counts['failed']:
+        print(f"❌ {counts['failed']} files failed to build.")
     print(f"Production-ready files are located in the '{BUILD_DIR}' directory.")
+    for engine, run_workers, seconds in timings:
+        mode = "serial" if run_workers <= 1 else f"{run_workers} workers"
+        print(f"⏱️  {engine} engine, {mode}: {seconds:.2f}s")
+    if len(timings) > 1:
+        baseline = timings[0][2]
+        fastest = min(timings, key=lambda timing: timing[2])
+        print(f"🚀 Fastest: {fastest[0]} engine with {fastest[1]} workers, "
+              f"{baseline / fastest[2]:.1f}x faster than one process per file, serially")
+    if counts['over_budget']:
+        print(f"❌ Size budget exceeded ({args.budget_kb:g} KB gzipped): {', '.join(counts['over_budget'])}")
     print("="*50)
 
+    if counts['over_budget']:
+        sys.exit(1)
+    if args.watch:
+        watch(args.engine)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,208 @@
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+
+import build
+
+# ==============================================================================
+#  Build-output regression gate: compares BUILD against the previous build
+#
+#  Run after build.py and before 'firebase deploy'. Files are matched by path
+#  (fingerprinted names like app.0123456789.js match app.js) and compared by
+#  content hash; every asset's size is reported as built (minified), gzipped
+#  and, if the 'brotli' package is installed, Brotli-compressed. Cold-load
+#  size is the transfer for a first visit to each page: the HTML plus every
+#  local script and stylesheet it references.
+#
+#  Exits 1 if the total payload grew by more than --max-regression percent
+#  (or --max-regression-kb), so a size regression stops the deploy.
+#
+#  Usage:
+#    - Compare BUILD with BUILD-OLD:  python compare_builds.py
+#    - Other trees:                   python compare_builds.py --old BUILD-OLD --new BUILD
+#    - Stricter gate on Brotli size:  python compare_builds.py --metric brotli --max-regression 2
+#    - Machine-readable report:       python compare_builds.py --json size-report.json
+# ==============================================================================
+
+OLD_BUILD_DIR = 'BUILD-OLD'
+PAGES = ['index.html', 'student-app.html']
+METRICS = ('minified', 'gzip', 'brotli')
+DEFAULT_METRIC = 'gzip'
+DEFAULT_MAX_REGRESSION = 5.0  # Percent of the previous total
+# .gz/.br siblings from 'build.py --compress' are variants of an asset, not assets
+VARIANT_EXTENSIONS = ('.gz', '.br')
+FINGERPRINT_PATTERN = re.compile(rf'^(.*)\.[0-9a-f]{{{build.FINGERPRINT_LENGTH}}}(\.(?:js|css))$')
+
+def logical_path(relative_path):
+    """The path an asset would have without its fingerprint."""
+    match = FINGERPRINT_PATTERN.match(relative_path)
+    return match.group(1) + match.group(2) if match else relative_path
+
+def measure(data):
+    """Returns {metric: bytes} for one built file."""
+    sizes = {'minified': len(data), 'gzip': len(gzip.compress(data, compresslevel=build.GZIP_LEVEL, mtime=0))}
+    sizes['brotli'] = len(build.brotli.compress(data, quality=build.BROTLI_QUALITY)) if build.brotli else None
+    return sizes
+
+def scan_tree(root):
+    """Returns {logical path: asset} for every file in a build tree."""
+    assets = {}
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith(VARIANT_EXTENSIONS):
+                continue
+            path = os.path.join(directory, filename)
+            relative_path = os.path.relpath(path, root).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                data = f.read()
+            assets[logical_path(relative_path)] = {'path': relative_path, 'hash': build.hash_bytes(data),
+                                                   'sizes': measure(data)}
+    return assets
+
+def cold_load(root, assets, page):
+    """
+    Returns the transfer for a first visit to `page`: {'requests', 'external',
+    metric: bytes} for the HTML and the local assets it references, or None if
+    the page isn't in the tree.
+    """
+    page_asset = assets.get(page)
+    if not page_asset:
+        return None
+    with open(os.path.join(root, page_asset['path']), 'r', encoding='utf-8') as f:
+        html = f.read()
+    by_path = {asset['path']: asset for asset in assets.values()}
+    local = {page_asset['path']}
+    external = 0
+    for match in build.ASSET_REF_PATTERN.finditer(html):
+        target = build.resolve_reference(page_asset['path'], match.group(3))
+        if target is None:
+            external += 1  # CDN scripts; their size isn't in the build
+        elif target in by_path:
+            local.add(target)
+    result = {'requests': len(local) + external, 'external': external}
+    for metric in METRICS:
+        sizes = [by_path[path]['sizes'][metric] for path in local]
+        result[metric] = None if None in sizes else sum(sizes)
+    return result
+
+def compare(old_root, new_root):
+    """Returns the comparison report of two build trees."""
+    old_assets, new_assets = scan_tree(old_root), scan_tree(new_root)
+    files = []
+    for name in sorted(set(old_assets) | set(new_assets)):
+        old, new = old_assets.get(name), new_assets.get(name)
+        if not old:
+            status = 'added'
+        elif not new:
+            status = 'removed'
+        else:
+            status = 'unchanged' if old['hash'] == new['hash'] else 'changed'
+        files.append({'name': name, 'status': status,
+                      'old': old['sizes'] if old else None, 'new': new['sizes'] if new else None,
+                      'old_hash': old['hash'] if old else None, 'new_hash': new['hash'] if new else None})
+
+    totals = {}
+    for side, assets in (('old', old_assets), ('new', new_assets)):
+        totals[side] = {}
+        for metric in METRICS:
+            sizes = [asset['sizes'][metric] for asset in assets.values()]
+            totals[side][metric] = None if None in sizes else sum(sizes)
+
+    pages = {page: {'old': cold_load(old_root, old_assets, page), 'new': cold_load(new_root, new_assets, page)}
+             for page in PAGES}
+    return {'old': old_root, 'new': new_root, 'files': files, 'totals': totals, 'pages': pages}
+
+def format_delta(old, new):
+    if old is None or new is None:
+        return "-"
+    delta = new - old
+    return f"{delta:+,}" if delta else "0"
+
+def format_size(size):
+    return f"{size:,}" if size is not None else "-"
+
+def print_report(report):
+    print(f"\n  {'Asset':<32} {'Status':<10} {'Minified':>9} {'Δ':>8} {'Gzip':>9} {'Δ':>8} {'Brotli':>9} {'Δ':>8}")
+    for entry in report['files']:
+        old, new = entry['old'] or {}, entry['new'] or {}
+        current = new or old
+        flag = {'added': "  🆕", 'removed': "  🗑️", 'changed': "", 'unchanged': ""}[entry['status']]
+        print(f"  {entry['name']:<32} {entry['status']:<10}"
+              + "".join(f" {format_size(current.get(metric)):>9} {format_delta(old.get(metric), new.get(metric)):>8}"
+                        for metric in METRICS) + flag)
+    old, new = report['totals']['old'], report['totals']['new']
+    print(f"  {'Total':<32} {'':<10}"
+          + "".join(f" {format_size(new[metric]):>9} {format_delta(old[metric], new[metric]):>8}" for metric in METRICS))
+
+    print(f"\n  {'Cold load':<32} {'Requests':>10} {'Minified':>9} {'Δ':>8} {'Gzip':>9} {'Δ':>8} {'Brotli':>9} {'Δ':>8}")
+    for page, sides in report['pages'].items():
+        old, new = sides['old'] or {}, sides['new'] or {}
+        if not new:
+            print(f"  {page:<32} {'missing':>10}")
+            continue
+        requests = f"{new['requests']} ({new['external']} ext.)"
+        print(f"  {page:<32} {requests:>10}"
+              + "".join(f" {format_size(new[metric]):>9} {format_delta(old.get(metric), new[metric]):>8}"
+                        for metric in METRICS))
+
+def check_regression(report, metric, max_percent, max_kb):
+    """Returns a description of the regression if the total is over a threshold, else None."""
+    old, new = report['totals']['old'][metric], report['totals']['new'][metric]
+    delta = new - old
+    percent = delta / old * 100 if old else 0.0
+    if delta > 0 and (percent > max_percent or (max_kb is not None and delta > max_kb * 1024)):
+        return f"total {metric} size grew by {delta:,} bytes ({percent:+.1f}%)"
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two build trees and fail on payload regressions.")
+    parser.add_argument('--old', default=OLD_BUILD_DIR, help=f"The previous build (default: {OLD_BUILD_DIR}).")
+    parser.add_argument('--new', default=build.BUILD_DIR, help=f"The new build (default: {build.BUILD_DIR}).")
+    parser.add_argument('--metric', choices=METRICS, default=DEFAULT_METRIC,
+                        help=f"Size the gate applies to (default: {DEFAULT_METRIC}).")
+    parser.add_argument('--max-regression', type=float, default=DEFAULT_MAX_REGRESSION,
+                        help=f"Fail if the total grew by more than this many percent "
+                             f"(default: {DEFAULT_MAX_REGRESSION:g}).")
+    parser.add_argument('--max-regression-kb', type=float,
+                        help="Also fail if the total grew by more than this many KB.")
+    parser.add_argument('--json', metavar='FILE', help="Also write the report to FILE as JSON.")
+    args = parser.parse_args()
+
+    for root in (args.old, args.new):
+        if not os.path.isdir(root):
+            print(f"❌ Build directory '{root}' not found; run build.py first.")
+            sys.exit(2)
+    if args.metric == 'brotli' and not build.brotli:
+        print("❌ --metric brotli needs the 'brotli' package (pip install brotli).")
+        sys.exit(2)
+
+    print(f"--- Comparing '{args.new}' against '{args.old}' ---")
+    report = compare(args.old, args.new)
+    print_report(report)
+
+    counts = {}
+    for entry in report['files']:
+        counts[entry['status']] = counts.get(entry['status'], 0) + 1
+    regression = check_regression(report, args.metric, args.max_regression, args.max_regression_kb)
+    report['gate'] = {'metric': args.metric, 'max_regression': args.max_regression,
+                      'max_regression_kb': args.max_regression_kb, 'failed': regression}
+
+    print("\n" + "="*50)
+    print(f"   Changed: {counts.get('changed', 0)}, added: {counts.get('added', 0)}, "
+          f"removed: {counts.get('removed', 0)}, unchanged: {counts.get('unchanged', 0)}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"📈 Report written to '{args.json}'")
+    if regression:
+        print(f"❌ Size regression: {regression}.")
+    else:
+        print(f"✅ Total {args.metric} size is within {args.max_regression:g}% of '{args.old}'.")
+    print("="*50)
+    sys.exit(1 if regression else 0)
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,10 @@ import shutil
 import json
 import argparse
 import getpass
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import instrumentation
 
 # ==============================================================================
 #  Python Installation Script for fireClass & Game Theory Projects
@@ -14,120 +18,197 @@ import getpass
 #  Usage:
 #    - Simulation Mode (default): python install.py
 #    - Live Execution Mode:       python install.py --live
+#    - Resume after a failure:    python install.py --live --project my-project-123
+#    - Simulated slow commands:   python install.py --project demo --sim-latency 1 --state-file sim-state.json
+#    - Step/command timings:      python install.py --profile
+#
+#  Provisioning steps are a dependency graph: steps whose dependencies are done
+#  run concurrently, and every completed step is recorded in a state file so a
+#  rerun for the same project skips it.
 # ==============================================================================
 
-def print_header(title):
+# --- Configuration ---
+STATE_FILE = '.deploy-state.json'
+STATE_VERSION = 1
+DEFAULT_JOBS = 4
+
+SERVICES_TO_ENABLE = [
+    'secretmanager.googleapis.com',
+    'cloudfunctions.googleapis.com',
+    'cloudbuild.googleapis.com',
+    'artifactregistry.googleapis.com'
+]
+
+SECRETS = ['OPENAI_API_KEY', 'CLAUDE_API_KEY', 'GEMINI_API_KEY']
+
+def print_header(title, log=print):
     """Prints a formatted header."""
-    print("\n" + "="*70)
-    print(f"--- {title} ---")
-    print("="*70)
+    log("\n" + "="*70)
+    log(f"--- {title} ---")
+    log("="*70)
+
+def log_command_output(result, log):
+    """Passes a finished command's captured stdout and stderr to `log`."""
+    for stream in (result.stdout, result.stderr):
+        for line in (stream or '').splitlines():
+            log(f"    | {line}")
 
-def run_command(command_parts, simulate=True, capture_output=False):
+def run_command(command_parts, simulate=True, capture_output=False, cwd=None, log=print, latency=0,
+                log_output=False):
     """
     Runs a command and checks for errors.
-    In simulation mode (default), it just prints the command.
+    In simulation mode (default), it just prints the command, after waiting
+    `latency` seconds to stand in for the real command's run time.
+    With `log_output`, the command's output goes to `log` once it exits instead
+    of straight to the terminal, so commands running at once don't interleave.
     """
     command_str = ' '.join(command_parts)
-    print(f"  > Executing: {command_str}")
-    
+    log(f"  > Executing: {command_str}")
+
     if simulate:
-        print("    [SIMULATE] Command not executed.")
+        with instrumentation.stage(command_str, category='command (simulated)', per_thread=True):
+            time.sleep(latency)
+        log("    [SIMULATE] Command not executed.")
         return True, "simulated_output"
-        
+
     try:
         is_windows = os.name == 'nt'
-        result = subprocess.run(
-            command_parts, 
-            capture_output=capture_output, 
-            text=True, 
+        capture = capture_output or log_output
+        result = instrumentation.run(
+            command_parts,
+            capture_output=capture,
+            text=True,
             shell=is_windows,
-            check=not capture_output
+            check=not capture,
+            cwd=cwd
         )
-        if capture_output and result.returncode != 0:
-            print(f"    ERROR: Command failed with exit code {result.returncode}")
-            print(f"    Stderr: {result.stderr}")
+        if log_output:
+            log_command_output(result, log)
+        if capture and result.returncode != 0:
+            log(f"    ERROR: Command failed with exit code {result.returncode}")
+            if not log_output:
+                log(f"    Stderr: {result.stderr}")
             return False, result.stderr
-            
+
         return True, result.stdout if capture_output else ""
     except (subprocess.CalledProcessError, FileNotFoundError) as e:
-        print(f"    FATAL ERROR: Could not run command. {e}")
+        log(f"    FATAL ERROR: Could not run command. {e}")
         return False, str(e)
 
+class DeployContext:
+    """What every provisioning step gets: the project, the mode and a command runner."""
+
+    def __init__(self, project_id, simulate=True, latency=0, fail_steps=(), secret_values=None):
+        self.project_id = project_id
+        self.simulate = simulate
+        self.latency = latency
+        self.fail_steps = set(fail_steps)
+        self.secret_values = secret_values or {}
+
+    def run(self, step_name, command_parts, log, capture_output=False, cwd=None):
+        if self.simulate and step_name in self.fail_steps:
+            command_str = ' '.join(command_parts)
+            log(f"  > Executing: {command_str}")
+            start = time.perf_counter()
+            time.sleep(self.latency)
+            instrumentation.record(command_str, 'command (simulated)', start, time.perf_counter() - start,
+                                   exit_status=1)
+            log("    [SIMULATE] Injected failure.")
+            return False, "simulated_failure"
+        return run_command(command_parts, self.simulate, capture_output, cwd, log, self.latency,
+                           log_output=True)
+
+class Step:
+    """One provisioning step; `action(context, log)` returns True on success."""
+
+    def __init__(self, name, title, action, deps=()):
+        self.name = name
+        self.title = title
+        self.action = action
+        self.deps = tuple(deps)
+
 def check_dependencies(simulate=True):
     """Checks if required command-line tools are installed."""
     print_header("Step 0: Checking Prerequisites")
     dependencies = ['node', 'npm', 'firebase']
     all_found = True
-    
+
     for dep in dependencies:
         if shutil.which(dep):
             print(f"  [V] Found: {dep}")
         else:
             print(f"  [X] NOT FOUND: {dep}")
             all_found = False
-            
+
     if not all_found:
         print("\nERROR: One or more dependencies are missing.")
         print("Please install Node.js (which includes npm) and the Firebase CLI.")
         print(" - Node.js: https://nodejs.org/")
         print(" - Firebase CLI: npm install -g firebase-tools")
         return False
-        
+
     print("  All prerequisites are installed.")
     return True
 
-def create_project(simulate=True):
+def create_project(simulate=True, project_id=None):
     """Guides the user through creating a new Firebase project."""
     print_header("Step 1: Create Firebase Project")
-    
-    project_id = input("Enter a unique ID for your new Firebase project (e.g., 'my-poker-game-123'): ")
+
+    if not project_id:
+        project_id = input("Enter a unique ID for your new Firebase project (e.g., 'my-poker-game-123'): ")
     if not project_id:
         print("Project ID cannot be empty.")
         return None
-        
-    print("\nAttempting to create Firebase project...")
-    success, _ = run_command(['firebase', 'projects:create', project_id, '--display-name', project_id, '--location=europe-west1'], simulate)
+    return project_id
 
+def create_firebase_project(context, log):
+    """Creates the Firebase project itself; everything else depends on it."""
+    log("\nAttempting to create Firebase project...")
+    success, _ = context.run('project', ['firebase', 'projects:create', context.project_id,
+                                         '--display-name', context.project_id, '--location=europe-west1'], log)
     if success:
-        print(f"Project '{project_id}' created successfully (or simulated).")
-        return project_id
+        log(f"Project '{context.project_id}' created successfully (or simulated).")
     else:
-        print("Failed to create project.")
-        return None
+        log("Failed to create project.")
+    return success
 
-def enable_services(project_id, simulate=True):
-    """Enables required Google Cloud services for the project."""
-    print_header("Step 2: Enable Cloud Services")
+def enable_services(context, log):
+    """Enables required Google Cloud services for the project, in one batched call."""
+    log(f"\nEnabling {', '.join(SERVICES_TO_ENABLE)}...")
+    success, _ = context.run('services', ['gcloud', 'services', 'enable'] + SERVICES_TO_ENABLE +
+                             ['--project', context.project_id], log)
+    return success
 
-    services_to_enable = [
-        'secretmanager.googleapis.com',
-        'cloudfunctions.googleapis.com',
-        'cloudbuild.googleapis.com',
-        'artifactregistry.googleapis.com'
-    ]
+def create_firestore(context, log):
+    log("\nEnabling Firestore...")
+    success, _ = context.run('firestore', ['gcloud', 'firestore', 'databases', 'create', '--location=eur3',
+                                           '--project', context.project_id], log)
+
+    log("\nNote: Anonymous Authentication must be enabled manually in the Firebase Console.")
+    log("Go to Authentication > Sign-in method > Add new provider > Anonymous > Enable.")
+    return success
 
-    for service in services_to_enable:
-        print(f"\nEnabling {service}...")
-        run_command(['gcloud', 'services', 'enable', service, '--project', project_id], simulate)
+def read_hosting_headers(path):
+    """Returns hosting.headers from an existing firebase.json, or None."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('hosting', {}).get('headers')
+    except (OSError, ValueError, AttributeError):
+        return None
 
-    print("\nEnabling Firestore...")
-    run_command(['gcloud', 'firestore', 'databases', 'create', '--location=eur3', '--project', project_id], simulate)
-    
-    print("\nNote: Anonymous Authentication must be enabled manually in the Firebase Console.")
-    print("Go to Authentication > Sign-in method > Add new provider > Anonymous > Enable.")
+def write_local_config(context, log):
+    """Writes .firebaserc, firebase.json and public/config.json."""
+    project_id = context.project_id
+    simulate = context.simulate
 
-def setup_local_project(project_id, simulate=True):
-    """Sets up the local project files and installs dependencies."""
-    print_header("Step 4 & 5: Setup Local Project & Configuration")
-    
     firebaserc_content = { "projects": { "default": project_id } }
-    print("\nCreating .firebaserc file...")
+    log("\nCreating .firebaserc file...")
     if not simulate:
         with open('.firebaserc', 'w') as f:
             json.dump(firebaserc_content, f, indent=2)
-    print(f"  Content: {json.dumps(firebaserc_content)}")
+    log(f"  Content: {json.dumps(firebaserc_content)}")
 
-    print("\nCreating firebase.json from template...")
+    log("\nCreating firebase.json from template...")
     firebase_json_content = {
       "firestore": {"rules": "firestore.rules", "indexes": "firestore.indexes.json"},
       "functions": {"source": "functions"},
@@ -137,12 +218,17 @@ def setup_local_project(project_id, simulate=True):
         "rewrites": [{"source": "**", "destination": "/index.html"}]
       }
     }
+    # build.py adds the caching headers for fingerprinted assets; keep them
+    existing_headers = read_hosting_headers('firebase.json')
+    if existing_headers:
+        firebase_json_content["hosting"]["headers"] = existing_headers
+        log("  Keeping the existing hosting headers.")
     if not simulate:
         with open('firebase.json', 'w') as f:
             json.dump(firebase_json_content, f, indent=2)
-    print("  firebase.json created.")
+    log("  firebase.json created.")
 
-    print("\nCreating public/config.json...")
+    log("\nCreating public/config.json...")
     student_app_url = f"https://{project_id}.web.app/student-app.html"
     config_json_content = {
         "studentAppUrl": student_app_url,
@@ -155,54 +241,177 @@ def setup_local_project(project_id, simulate=True):
         os.makedirs('public', exist_ok=True)
         with open(os.path.join('public', 'config.json'), 'w') as f:
             json.dump(config_json_content, f, indent=2)
-    print(f"  Student App URL set to: {student_app_url}")
-    
-    print("\nGenerating public/firebase-config.js...")
-    run_command(['firebase', 'apps:sdkconfig', 'WEB', '--project', project_id, '-o', os.path.join('public', 'firebase-config.js')], simulate)
+    log(f"  Student App URL set to: {student_app_url}")
+    return True
 
-    print("\nInstalling function dependencies (npm install)...")
-    if not simulate:
-        if os.path.isdir('functions') and os.path.exists(os.path.join('functions', 'package.json')):
-            subprocess.run(['npm', 'install'], cwd='functions', check=True, shell=(os.name == 'nt'))
-        else:
-            print("  [SKIP] 'functions' directory or 'package.json' not found. Skipping npm install.")
-    else:
-        print("  [SIMULATE] Would run 'npm install' in 'functions' directory.")
+def generate_sdk_config(context, log):
+    log("\nGenerating public/firebase-config.js...")
+    success, _ = context.run('sdkconfig', ['firebase', 'apps:sdkconfig', 'WEB', '--project', context.project_id,
+                                           '-o', os.path.join('public', 'firebase-config.js')], log)
+    return success
+
+def install_function_dependencies(context, log):
+    log("\nInstalling function dependencies (npm install)...")
+    if not context.simulate and not (os.path.isdir('functions') and
+                                     os.path.exists(os.path.join('functions', 'package.json'))):
+        log("  [SKIP] 'functions' directory or 'package.json' not found. Skipping npm install.")
+        return True
+    success, _ = context.run('npm_install', ['npm', 'install'], log, cwd='functions')
+    return success
 
-def set_secrets(project_id, simulate=True):
-    """Guides the user to set the necessary API key secrets."""
+def collect_secrets(simulate=True):
+    """Asks for the API key secrets up front, so the steps themselves never prompt."""
     print_header("Step 6: Set API Key Secrets")
+    if simulate:
+        print("  [SIMULATE] Would prompt for: " + ', '.join(SECRETS))
+        return {}
+
     print("You will be prompted to enter your API keys from external services.")
     print("Your input will not be shown on screen for security.")
-    
-    secrets = ['OPENAI_API_KEY', 'CLAUDE_API_KEY', 'GEMINI_API_KEY']
-    
-    for secret_name in secrets:
-        if simulate:
-            print(f"\n  [SIMULATE] Would prompt for {secret_name} and run:")
-            print(f"  > firebase functions:secrets:set {secret_name} --project {project_id}")
-            continue
-            
+    secret_values = {}
+    for secret_name in SECRETS:
+        secret_value = getpass.getpass(f"  Please enter your {secret_name}: ")
+        if secret_value:
+            secret_values[secret_name] = secret_value
+        else:
+            print(f"  Skipping {secret_name} as no value was provided.")
+    return secret_values
+
+def set_secrets(context, log):
+    """Sets the API key secrets collected by collect_secrets()."""
+    project_id = context.project_id
+    if context.simulate:
+        for secret_name in SECRETS:
+            log(f"\n  [SIMULATE] Would run:")
+            context.run('secrets', ['firebase', 'functions:secrets:set', secret_name, '--project', project_id], log)
+        return True
+
+    all_set = True
+    for secret_name, secret_value in context.secret_values.items():
         try:
-            secret_value = getpass.getpass(f"  Please enter your {secret_name}: ")
-            if secret_value:
-                command = f'echo "{secret_value}" | firebase functions:secrets:set {secret_name} --project {project_id}'
-                print(f"  > Setting secret for {secret_name}...")
-                subprocess.run(command, shell=True, check=True, text=True)
-                print(f"  Secret for {secret_name} set successfully.")
-            else:
-                print(f"  Skipping {secret_name} as no value was provided.")
+            command = f'echo "{secret_value}" | firebase functions:secrets:set {secret_name} --project {project_id}'
+            log(f"  > Setting secret for {secret_name}...")
+            result = instrumentation.run(command, shell=True, capture_output=True, text=True,
+                                         name=f"firebase functions:secrets:set {secret_name} --project {project_id}")
+            log_command_output(result, log)
+            if result.returncode != 0:
+                log(f"  Setting secret {secret_name} failed with exit code {result.returncode}.")
+                all_set = False
+                continue
+            log(f"  Secret for {secret_name} set successfully.")
         except Exception as e:
-            print(f"  An error occurred while setting secret {secret_name}: {e}")
+            log(f"  An error occurred while setting secret {secret_name}: {e}")
+            all_set = False
+    return all_set
+
+def provisioning_steps():
+    """The provisioning graph. A step starts once all of its `deps` have completed."""
+    return [
+        Step('project', "Step 1: Create Firebase Project", create_firebase_project),
+        Step('services', "Step 2: Enable Cloud Services", enable_services, deps=['project']),
+        Step('firestore', "Step 3: Create Firestore Database", create_firestore, deps=['project']),
+        Step('local_config', "Step 4: Local Project Configuration", write_local_config),
+        Step('sdkconfig', "Step 5: Generate Firebase SDK Config", generate_sdk_config,
+             deps=['project', 'local_config']),
+        Step('npm_install', "Step 5: Install Function Dependencies", install_function_dependencies),
+        Step('secrets', "Step 6: Set API Key Secrets", set_secrets, deps=['services']),
+    ]
+
+def load_state(state_file, project_id):
+    """Completed steps for this project from an earlier run."""
+    if not state_file:
+        return {}
+    try:
+        with open(state_file, 'r') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if state.get('version') != STATE_VERSION or state.get('project_id') != project_id:
+        return {}
+    return state.get('completed', {})
+
+def save_state(state_file, project_id, completed):
+    if not state_file:
+        return
+    temp_file = state_file + '.tmp'
+    with open(temp_file, 'w') as f:
+        json.dump({'version': STATE_VERSION, 'project_id': project_id, 'completed': completed}, f, indent=2)
+    os.replace(temp_file, state_file)
+
+def run_steps(steps, context, jobs=DEFAULT_JOBS, state_file=None):
+    """
+    Runs the step graph on a thread pool. Steps recorded as completed in the
+    state file are skipped; a failed step blocks only the steps that depend on
+    it. Each step's output, including that of the commands it runs, is printed
+    in one block, every line prefixed with the step name, when it finishes or
+    fails.
+    Returns (completed, failed, blocked) lists of step names.
+    """
+    by_name = {step.name: step for step in steps}
+    for step in steps:
+        missing = [dep for dep in step.deps if dep not in by_name]
+        if missing:
+            raise ValueError(f"Step '{step.name}' depends on unknown steps: {', '.join(missing)}")
+
+    completed = load_state(state_file, context.project_id)
+    for name in completed:
+        if name in by_name:
+            print(f"  ✓ Already done: {by_name[name].title}")
+    done = {name for name in completed if name in by_name}
+    failed = set()
+    running = {}
+
+    def execute(step):
+        lines = []
+        print_header(step.title, lines.append)
+        start = time.perf_counter()
+        try:
+            with instrumentation.stage(step.title, per_thread=True, step=step.name) as span:
+                ok = step.action(context, lines.append)
+                span['exit_status'] = 0 if ok else 1
+        except Exception as e:
+            lines.append(f"    FATAL ERROR: {e}")
+            ok = False
+        return ok, lines, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while True:
+            for step in steps:
+                if step.name in done or step.name in failed or step.name in running:
+                    continue
+                if all(dep in done for dep in step.deps):
+                    running[step.name] = pool.submit(execute, step)
+            if not running:
+                break
+
+            finished, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+            for name, future in list(running.items()):
+                if future not in finished:
+                    continue
+                del running[name]
+                ok, lines, seconds = future.result()
+                for line in '\n'.join(lines).splitlines():
+                    print(f"[{name}] {line}".rstrip())
+                if ok:
+                    done.add(name)
+                    completed[name] = {'seconds': round(seconds, 3), 'finished_at': time.time()}
+                    save_state(state_file, context.project_id, completed)
+                    print(f"  ✅ {by_name[name].title} ({seconds:.2f}s)")
+                else:
+                    failed.add(name)
+                    print(f"  ❌ {by_name[name].title} failed ({seconds:.2f}s)")
+
+    blocked = [step.name for step in steps if step.name not in done and step.name not in failed]
+    return sorted(done), sorted(failed), blocked
 
 def final_deploy(simulate=True):
     """Runs the final deploy command after user confirmation."""
     print_header("Step 7: Final Deployment")
-    
+
     if simulate:
         print("  [SIMULATE] Would ask for confirmation and run 'firebase deploy'.")
         return
-        
+
     confirm = input("Are you ready to deploy the entire project to Firebase? (y/n): ").lower()
     if confirm == 'y':
         print("Deploying project...")
@@ -214,10 +423,23 @@ def main():
     """Main function to orchestrate the installation."""
     parser = argparse.ArgumentParser(description="Automated installer for fireClass and related projects.")
     parser.add_argument('--live', action='store_true', help="Run in live mode, executing all commands.")
+    parser.add_argument('--project', help="Firebase project ID (skips the prompt; use the same ID to resume).")
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS,
+                        help=f"Steps to run at the same time (default: {DEFAULT_JOBS}).")
+    parser.add_argument('--state-file',
+                        help=f"Where completed steps are recorded (default: {STATE_FILE} in live mode, none in simulation).")
+    parser.add_argument('--reset', action='store_true', help="Forget completed steps and run everything again.")
+    parser.add_argument('--sim-latency', type=float, default=0,
+                        help="Simulation only: seconds each simulated command takes.")
+    parser.add_argument('--sim-fail', action='append', default=[], metavar='STEP',
+                        help="Simulation only: make a step fail (repeatable), to try out resuming.")
+    instrumentation.add_profile_arguments(parser)
     args = parser.parse_args()
+    instrumentation.enable_profile(args, 'deploy')
 
     # Simulation is the default unless --live is specified.
     is_simulation = not args.live
+    state_file = args.state_file or (None if is_simulation else STATE_FILE)
 
     if is_simulation:
         print_header("RUNNING IN SIMULATION MODE")
@@ -240,7 +462,7 @@ def main():
     if not is_simulation:
         input("Press Enter to continue...")
 
-    project_id = create_project(is_simulation)
+    project_id = create_project(is_simulation, args.project)
     if not project_id and not is_simulation:
         print("Exiting due to project creation failure.")
         return
@@ -248,6 +470,29 @@ def main():
         project_id = "simulated-project-123"
         print(f"[SIMULATE] Using dummy project ID: {project_id}")
 
-    enable_services
+    if args.reset and state_file and os.path.exists(state_file):
+        os.remove(state_file)
+
+    steps = provisioning_steps()
+    pending = set(step.name for step in steps) - set(load_state(state_file, project_id))
+    secret_values = collect_secrets(is_simulation) if 'secrets' in pending else {}
+
+    context = DeployContext(project_id, is_simulation, args.sim_latency, args.sim_fail, secret_values)
+    start = time.perf_counter()
+    with instrumentation.stage("Provision", category='run', jobs=args.jobs):
+        done, failed, blocked = run_steps(steps, context, args.jobs, state_file)
+    elapsed = time.perf_counter() - start
+
+    print_header("Provisioning Summary")
+    print(f"  Completed: {len(done)}, failed: {len(failed)}, not started: {len(blocked)} ({elapsed:.2f}s)")
+    if failed or blocked:
+        print(f"  Failed: {', '.join(failed) or '-'}")
+        print(f"  Waiting on a failed step: {', '.join(blocked) or '-'}")
+        if state_file:
+            print(f"  Completed steps are saved in '{state_file}'; run again with --project {project_id} to resume.")
+        return
+
+    final_deploy(is_simulation)
+
 if __name__ == "__main__":
-    main()    
\ No newline at end of file
+    main()
@@ -1,151 +1,99 @@
 #!/usr/bin/env python3
 """
 Convert Markdown article to HTML with proper styling
+
+Usage:
+    python convert_article.py          # article_final.md -> article_final.html
+    python convert_article.py --all    # every .md under fireClass-documentation/
+    python convert_article.py --all --force
+    python convert_article.py --all --optimize-images
+    python convert_article.py --all --pdf   # also print every page to PDF
+
+Every page links one shared, minified stylesheet, assets/docs.<hash>.css.
+The pages and assets/ are build output and are not committed.
+Rendered pages are cached in .render-cache/ by source hash, and an export
+manifest records each document's dependencies (source, images, stylesheet),
+so a batch run skips the documents whose dependencies haven't changed.
+
+--pdf prints the pages with one headless Chromium shared by all documents
+(render_pdf.js, needs the repository's Node dev dependencies: npm install
+and npx playwright install chromium).
+
+--optimize-images rewrites the pages' <img> tags to optimized copies in
+images/optimized/: PNGs are recompressed and get responsive WebP variants
+(needs Pillow: pip install pillow), SVGs are minified and small ones inlined
+as data URIs. Every image gets width/height attributes.
 """
 
-import markdown
+import argparse
+import hashlib
+import json
 import os
+import re
+import shutil
+import struct
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from urllib.parse import quote
+
+import markdown
+
+try:
+    from PIL import Image
+except ImportError:  # Optional: without it PNGs are copied as-is
+    Image = None
+
+# --- Configuration ---
+DOCS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SOURCE = 'article_final.md'
+MARKDOWN_EXTENSIONS = ['fenced_code', 'tables', 'codehilite']
+CACHE_DIR = os.path.join(DOCS_DIR, '.render-cache')
+# Bump when the template or extensions change so cached pages are re-rendered
+RENDER_VERSION = 3
+# A single document is rendered in-process; a pool only adds start-up time for it
+PARALLEL_THRESHOLD = 2
+DEFAULT_JOBS = os.cpu_count() or 1
+
+# --- Export ---
+STYLE_DIR = os.path.join(DOCS_DIR, 'assets')
+STYLESHEET_PREFIX = 'docs.'
+STYLESHEET_HASH_LENGTH = 10
+EXPORT_MANIFEST_FILE = os.path.join(CACHE_DIR, 'exports.json')
+# Bump when the export steps change so every document is exported again
+EXPORT_VERSION = 1
+NODE_CMD = 'node'
+PDF_RENDERER = os.path.join(DOCS_DIR, 'render_pdf.js')
+# Pages printed at the same time in the shared browser
+DEFAULT_PDF_JOBS = min(4, DEFAULT_JOBS)
+
+# --- Image optimization ---
+IMAGES_DIR = os.path.join(DOCS_DIR, 'images')
+OPTIMIZED_DIR = os.path.join(IMAGES_DIR, 'optimized')
+IMAGE_MANIFEST_FILE = os.path.join(OPTIMIZED_DIR, 'manifest.json')
+# Bump when the optimization settings change so cached images are redone
+IMAGE_VERSION = 1
+WEBP_WIDTHS = (480, 960, 1600)
+WEBP_QUALITY = 80
+SVG_INLINE_LIMIT = 4 * 1024
+# The article container is at most 900px wide
+IMAGE_SIZES = "(max-width: 900px) 100vw, 900px"
 
-def convert_markdown_to_html():
-    # Read the markdown file
-    with open('article_final.md', 'r', encoding='utf-8') as f:
-        md_content = f.read()
-    
-    # Convert to HTML
-    html_content = markdown.markdown(md_content, extensions=['fenced_code', 'tables', 'codehilite'])
-    
-    # Create full HTML document
-    full_html = f"""<!DOCTYPE html>
+IMG_TAG_PATTERN = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+SRC_ATTR_PATTERN = re.compile(r'\ssrc\s*=\s*"([^"]+)"', re.IGNORECASE)
+
+TITLES = {
+    'article_final.md': 'fireClass Control - Article'
+}
+
+HTML_TEMPLATE = """<!DOCTYPE html>
 <html lang="en" dir="ltr">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>fireClass Control - Article</title>
-    <style>
-        body {{
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            max-width: 900px;
-            margin: 0 auto;
-            padding: 20px;
-            background: #f8f9fa;
-        }}
-        
-        .article-container {{
-            background: white;
-            padding: 40px;
-            border-radius: 10px;
-            box-shadow: 0 4px 20px rgba(0,0,0,0.1);
-        }}
-        
-        h1 {{
-            color: #2c3e50;
-            border-bottom: 3px solid #3498db;
-            padding-bottom: 10px;
-            margin-bottom: 30px;
-        }}
-        
-        h2 {{
-            color: #34495e;
-            margin-top: 40px;
-            margin-bottom: 20px;
-            border-left: 4px solid #3498db;
-            padding-left: 15px;
-        }}
-        
-        h3 {{
-            color: #2c3e50;
-            margin-top: 30px;
-            margin-bottom: 15px;
-        }}
-        
-        p {{
-            margin-bottom: 15px;
-            text-align: justify;
-        }}
-        
-        code {{
-            background: #f4f4f4;
-            padding: 2px 6px;
-            border-radius: 4px;
-            font-family: 'Courier New', monospace;
-            color: #e74c3c;
-        }}
-        
-        pre {{
-            background: #2d3748;
-            color: #f7fafc;
-            padding: 20px;
-            border-radius: 8px;
-            overflow-x: auto;
-            margin: 20px 0;
-        }}
-        
-        pre code {{
-            background: none;
-            color: inherit;
-            padding: 0;
-        }}
-        
-        .svg-container {{
-            text-align: center;
-            margin: 30px 0;
-            padding: 20px;
-            background: #f8f9fa;
-            border-radius: 8px;
-        }}
-        
-        .svg-container svg {{
-            max-width: 100%;
-            height: auto;
-            border: 1px solid #ddd;
-            border-radius: 8px;
-        }}
-        
-        blockquote {{
-            border-left: 4px solid #3498db;
-            margin: 20px 0;
-            padding: 10px 20px;
-            background: #ecf0f1;
-            font-style: italic;
-        }}
-        
-        ul, ol {{
-            margin: 15px 0;
-            padding-left: 30px;
-        }}
-        
-        li {{
-            margin-bottom: 8px;
-        }}
-        
-        .highlight {{
-            background: #fff3cd;
-            padding: 15px;
-            border-radius: 6px;
-            border-left: 4px solid #ffc107;
-            margin: 20px 0;
-        }}
-        
-        @media (max-width: 768px) {{
-            body {{
-                padding: 10px;
-            }}
-            
-            .article-container {{
-                padding: 20px;
-            }}
-            
-            h1 {{
-                font-size: 24px;
-            }}
-            
-            h2 {{
-                font-size: 20px;
-            }}
-        }}
-    </style>
+    <title>{title}</title>
+    <link rel="stylesheet" href="{stylesheet}">
 </head>
 <body>
     <div class="article-container">
@@ -153,13 +101,592 @@ def convert_markdown_to_html():
     </div>
 </body>
 </html>"""
-    
-    # Write to file
-    with open('article_final.html', 'w', encoding='utf-8') as f:
-        f.write(full_html)
-    
-    print("✅ Article converted successfully!")
-    print("📄 Open 'article_final.html' in your browser to view the article")
+
+# Shared by every page; written once as STYLE_DIR/docs.<hash>.css (minified)
+STYLESHEET = """body {
+    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+    line-height: 1.6;
+    color: #333;
+    max-width: 900px;
+    margin: 0 auto;
+    padding: 20px;
+    background: #f8f9fa;
+}
+
+.article-container {
+    background: white;
+    padding: 40px;
+    border-radius: 10px;
+    box-shadow: 0 4px 20px rgba(0,0,0,0.1);
+}
+
+h1 {
+    color: #2c3e50;
+    border-bottom: 3px solid #3498db;
+    padding-bottom: 10px;
+    margin-bottom: 30px;
+}
+
+h2 {
+    color: #34495e;
+    margin-top: 40px;
+    margin-bottom: 20px;
+    border-left: 4px solid #3498db;
+    padding-left: 15px;
+}
+
+h3 {
+    color: #2c3e50;
+    margin-top: 30px;
+    margin-bottom: 15px;
+}
+
+p {
+    margin-bottom: 15px;
+    text-align: justify;
+}
+
+code {
+    background: #f4f4f4;
+    padding: 2px 6px;
+    border-radius: 4px;
+    font-family: 'Courier New', monospace;
+    color: #e74c3c;
+}
+
+pre {
+    background: #2d3748;
+    color: #f7fafc;
+    padding: 20px;
+    border-radius: 8px;
+    overflow-x: auto;
+    margin: 20px 0;
+}
+
+pre code {
+    background: none;
+    color: inherit;
+    padding: 0;
+}
+
+.svg-container {
+    text-align: center;
+    margin: 30px 0;
+    padding: 20px;
+    background: #f8f9fa;
+    border-radius: 8px;
+}
+
+.svg-container svg {
+    max-width: 100%;
+    height: auto;
+    border: 1px solid #ddd;
+    border-radius: 8px;
+}
+
+blockquote {
+    border-left: 4px solid #3498db;
+    margin: 20px 0;
+    padding: 10px 20px;
+    background: #ecf0f1;
+    font-style: italic;
+}
+
+ul, ol {
+    margin: 15px 0;
+    padding-left: 30px;
+}
+
+li {
+    margin-bottom: 8px;
+}
+
+.highlight {
+    background: #fff3cd;
+    padding: 15px;
+    border-radius: 6px;
+    border-left: 4px solid #ffc107;
+    margin: 20px 0;
+}
+
+img {
+    height: auto;
+}
+
+@media (max-width: 768px) {
+    body {
+        padding: 10px;
+    }
+
+    .article-container {
+        padding: 20px;
+    }
+
+    h1 {
+        font-size: 24px;
+    }
+
+    h2 {
+        font-size: 20px;
+    }
+}
+"""
+
+# One converter per process, reused between documents via reset()
+_converter = None
+
+def get_converter():
+    global _converter
+    if _converter is None:
+        _converter = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    return _converter
+
+def document_title(relative_path, md_content):
+    """Uses the fixed title for the article, otherwise the document's first heading."""
+    if relative_path in TITLES:
+        return TITLES[relative_path]
+    for line in md_content.splitlines():
+        if line.startswith('# '):
+            return line[2:].strip()
+    return os.path.splitext(os.path.basename(relative_path))[0]
+
+def stylesheet_href(relative_path, stylesheet):
+    """The shared stylesheet's URL from a page next to relative_path."""
+    page_dir = os.path.join(DOCS_DIR, os.path.dirname(relative_path))
+    return os.path.relpath(os.path.join(STYLE_DIR, stylesheet), page_dir).replace(os.sep, '/')
+
+def render_document(relative_path, md_content, stylesheet):
+    """Renders one Markdown document to a full HTML page linking the shared stylesheet."""
+    html_content = get_converter().reset().convert(md_content)
+    return HTML_TEMPLATE.format(title=document_title(relative_path, md_content),
+                                stylesheet=stylesheet_href(relative_path, stylesheet),
+                                html_content=html_content)
+
+def cache_key(relative_path, md_content, stylesheet):
+    digest = hashlib.sha256()
+    digest.update(f"{RENDER_VERSION}:{','.join(MARKDOWN_EXTENSIONS)}:{markdown.__version__}\0".encode('utf-8'))
+    # The title and the stylesheet link depend on where the page is and which stylesheet is current
+    digest.update(f"{relative_path}\0{stylesheet}\0".encode('utf-8'))
+    digest.update(md_content.encode('utf-8'))
+    return digest.hexdigest()
+
+def minify_css(css):
+    """Drops comments and the whitespace around punctuation and before closing braces."""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r'([{;])\s*([\w-]+)\s*:\s*', r'\1\2:', css)
+    return css.replace(';}', '}').strip()
+
+def write_stylesheet():
+    """
+    Writes the minified STYLESHEET to STYLE_DIR/docs.<hash>.css unless it's
+    already there, removes older versions, and returns its file name.
+    """
+    css = minify_css(STYLESHEET)
+    name = f"{STYLESHEET_PREFIX}{hashlib.sha256(css.encode('utf-8')).hexdigest()[:STYLESHEET_HASH_LENGTH]}.css"
+    os.makedirs(STYLE_DIR, exist_ok=True)
+    write_if_changed(os.path.join(STYLE_DIR, name), css)
+    for old in os.listdir(STYLE_DIR):
+        if old != name and old.startswith(STYLESHEET_PREFIX) and old.endswith('.css'):
+            os.remove(os.path.join(STYLE_DIR, old))
+    return name
+
+def find_documents():
+    """Every .md file under the documentation folder, relative to it."""
+    documents = []
+    for dirpath, dirs, files in os.walk(DOCS_DIR):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+        for filename in sorted(files):
+            if filename.endswith('.md'):
+                documents.append(os.path.relpath(os.path.join(dirpath, filename), DOCS_DIR))
+    return documents
+
+def write_if_changed(path, content):
+    """Writes the page unless the file already holds exactly this content."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    return True
+
+def minify_svg(svg):
+    """Drops the XML prolog, comments, metadata and whitespace between tags."""
+    svg = re.sub(r'<\?xml.*?\?>|<!DOCTYPE[^>]*>|<!--.*?-->', '', svg, flags=re.DOTALL)
+    svg = re.sub(r'<metadata\b.*?</metadata>', '', svg, flags=re.DOTALL)
+    svg = re.sub(r'>\s+<', '><', svg)
+    svg = re.sub(r'\s+', ' ', svg)
+    return svg.strip()
+
+def svg_size(svg):
+    """Width/height of the root <svg>, falling back to its viewBox."""
+    root = re.search(r'<svg\b[^>]*>', svg)
+    tag = root.group(0) if root else ''
+    width = re.search(r'\swidth="([\d.]+)(?:px)?"', tag)
+    height = re.search(r'\sheight="([\d.]+)(?:px)?"', tag)
+    if width and height:
+        return round(float(width.group(1))), round(float(height.group(1)))
+    view_box = re.search(r'viewBox="[\d.\s-]+?([\d.]+)\s+([\d.]+)"', tag)
+    if view_box:
+        return round(float(view_box.group(1))), round(float(view_box.group(2)))
+    return None, None
+
+def png_size(data):
+    """Width/height from the PNG header, so no image library is needed."""
+    if data[:8] != b'\x89PNG\r\n\x1a\n':
+        return None, None
+    return struct.unpack('>II', data[16:24])
+
+def write_optimized(name, data):
+    with open(os.path.join(OPTIMIZED_DIR, name), 'wb') as f:
+        f.write(data)
+    return name
+
+def optimize_image(relative_path, source_hash):
+    """
+    Optimizes one image (relative to the documentation folder). Output files
+    carry the source hash, so an unchanged image never has to be redone.
+    """
+    with open(os.path.join(DOCS_DIR, relative_path), 'rb') as f:
+        data = f.read()
+    stem, ext = os.path.splitext(os.path.basename(relative_path))
+    name = f"{stem}.{source_hash[:10]}"
+    result = {'source_hash': source_hash, 'version': IMAGE_VERSION, 'original_bytes': len(data),
+              'src': None, 'inline': None, 'webp': []}
+
+    if ext.lower() == '.svg':
+        svg = minify_svg(data.decode('utf-8'))
+        encoded = svg.encode('utf-8')
+        result['width'], result['height'] = svg_size(svg)
+        result['optimized_bytes'] = len(encoded)
+        if len(encoded) <= SVG_INLINE_LIMIT:
+            result['inline'] = 'data:image/svg+xml,' + quote(svg.replace('"', "'"), safe=" '=/:;,.-_()")
+        else:
+            result['src'] = write_optimized(f"{name}.svg", encoded)
+        return result
+
+    if Image is None:
+        result['width'], result['height'] = png_size(data)
+        result['optimized_bytes'] = len(data)
+        result['src'] = write_optimized(f"{name}{ext.lower()}", data)
+        return result
+
+    with Image.open(BytesIO(data)) as image:
+        image.load()
+        width, height = image.size
+        buffer = BytesIO()
+        image.save(buffer, 'PNG', optimize=True)
+        png = buffer.getvalue() if buffer.tell() < len(data) else data
+        result['width'], result['height'] = width, height
+        result['optimized_bytes'] = len(png)
+        result['src'] = write_optimized(f"{name}.png", png)
+
+        for target in sorted({w for w in WEBP_WIDTHS if w < width} | {width}):
+            variant = image if target == width else image.resize(
+                (target, max(1, round(height * target / width))), Image.LANCZOS)
+            buffer = BytesIO()
+            variant.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=6)
+            webp_name = write_optimized(f"{name}.{target}w.webp", buffer.getvalue())
+            result['webp'].append([target, webp_name, buffer.tell()])
+    return result
+
+def load_image_manifest():
+    try:
+        with open(IMAGE_MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def image_is_current(entry, source_hash):
+    if not entry or entry.get('source_hash') != source_hash or entry.get('version') != IMAGE_VERSION:
+        return False
+    names = [entry['src']] if entry.get('src') else []
+    names += [name for _, name, _ in entry.get('webp', [])]
+    return all(os.path.exists(os.path.join(OPTIMIZED_DIR, name)) for name in names)
+
+def find_page_images(page_path, html):
+    """Local images referenced by a page, relative to the documentation folder."""
+    images = []
+    page_dir = os.path.dirname(page_path)
+    for tag in IMG_TAG_PATTERN.findall(html):
+        match = SRC_ATTR_PATTERN.search(tag)
+        if not match or re.match(r'^(?:[a-z]+:|//|/)', match.group(1), re.IGNORECASE):
+            continue
+        relative = os.path.normpath(os.path.join(page_dir, match.group(1)))
+        if relative.lower().endswith(('.png', '.svg')) and os.path.exists(os.path.join(DOCS_DIR, relative)):
+            images.append(relative)
+    return images
+
+def optimize_images(pages, jobs, keep=()):
+    """
+    Optimizes every image the pages reference, in parallel, reusing earlier
+    results from the manifest. `keep` lists images of pages that weren't
+    exported this run, so their optimized copies aren't removed. Returns the
+    manifest entries by image path.
+    """
+    os.makedirs(OPTIMIZED_DIR, exist_ok=True)
+    manifest = load_image_manifest()
+    images = sorted({image for page_path, html in pages for image in find_page_images(page_path, html)} | set(keep))
+
+    pending = []
+    for relative_path in images:
+        with open(os.path.join(DOCS_DIR, relative_path), 'rb') as f:
+            source_hash = hashlib.sha256(f.read()).hexdigest()
+        if not image_is_current(manifest.get(relative_path), source_hash):
+            pending.append((relative_path, source_hash))
+
+    paths = [item[0] for item in pending]
+    hashes = [item[1] for item in pending]
+    if len(pending) > 1 and jobs > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as pool:
+            results = list(pool.map(optimize_image, paths, hashes))
+    else:
+        results = [optimize_image(path, source_hash) for path, source_hash in pending]
+    manifest.update(zip(paths, results))
+
+    # Keep only what the current pages use
+    manifest = {path: manifest[path] for path in images}
+    keep = {'manifest.json'}
+    for entry in manifest.values():
+        keep.update([entry['src']] if entry.get('src') else [])
+        keep.update(name for _, name, _ in entry.get('webp', []))
+    for name in os.listdir(OPTIMIZED_DIR):
+        if name not in keep:
+            os.remove(os.path.join(OPTIMIZED_DIR, name))
+    with open(IMAGE_MANIFEST_FILE, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    print(f"🖼️  Images: {len(images)} referenced, {len(pending)} optimized, {len(images) - len(pending)} cached")
+    return manifest
+
+def rewrite_page_images(page_path, html, manifest):
+    """Points <img> tags at the optimized images; PNGs get a WebP <picture> wrapper."""
+    page_dir = os.path.dirname(page_path)
+    first = [True]
+
+    def rewrite(match):
+        tag = match.group(0)
+        src = SRC_ATTR_PATTERN.search(tag)
+        if not src:
+            return tag
+        entry = manifest.get(os.path.normpath(os.path.join(page_dir, src.group(1))))
+        if not entry:
+            return tag
+
+        def url(name):
+            return os.path.relpath(os.path.join(OPTIMIZED_DIR, name), os.path.join(DOCS_DIR, page_dir)).replace(os.sep, '/')
+
+        new_src = entry['inline'] or url(entry['src'])
+        attrs = tag[len('<img'):].rstrip('/>').replace(src.group(0), '')
+        extra = ''
+        if entry.get('width') and not re.search(r'\swidth\s*=', attrs):
+            extra += f' width="{entry["width"]}" height="{entry["height"]}"'
+        if not re.search(r'\sloading\s*=', attrs):
+            # The first image is likely in view; let the rest load when scrolled to
+            extra += ' decoding="async"' if first[0] else ' loading="lazy" decoding="async"'
+        first[0] = False
+        img = f'<img src="{new_src}"{extra}{attrs.rstrip()}>'
+        if not entry['webp']:
+            return img
+        srcset = ', '.join(f"{url(name)} {width}w" for width, name, _ in entry['webp'])
+        return f'<picture><source type="image/webp" srcset="{srcset}" sizes="{IMAGE_SIZES}">{img}</picture>'
+
+    return IMG_TAG_PATTERN.sub(rewrite, html)
+
+def print_image_report(manifest):
+    """Original bytes against what a browser downloads (largest WebP, or the optimized file)."""
+    if not manifest:
+        return
+    total_before = total_after = 0
+    print(f"\n  {'Image':<40} {'original':>10} {'optimized':>10} {'webp':>10}")
+    for path, entry in sorted(manifest.items()):
+        webp = entry['webp'][-1][2] if entry['webp'] else None
+        delivered = webp or entry['optimized_bytes']
+        total_before += entry['original_bytes']
+        total_after += delivered
+        webp_text = f"{webp / 1024:.1f} KB" if webp else ('inline' if entry['inline'] else '-')
+        print(f"  {path:<40} {entry['original_bytes'] / 1024:>7.1f} KB "
+              f"{entry['optimized_bytes'] / 1024:>7.1f} KB {webp_text:>10}")
+    saved = total_before - total_after
+    print(f"  Saved {saved / 1024:.1f} KB of {total_before / 1024:.1f} KB "
+          f"({100 * saved / total_before if total_before else 0:.0f}%)")
+
+
+def file_hash(path):
+    """Hex SHA-256 of a file, or None if it doesn't exist."""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+def output_path(relative_path, ext):
+    return os.path.join(DOCS_DIR, os.path.splitext(relative_path)[0] + ext)
+
+def load_export_manifest():
+    try:
+        with open(EXPORT_MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest.get('documents', {}) if manifest.get('version') == EXPORT_VERSION else {}
+
+def save_export_manifest(documents):
+    temp_path = EXPORT_MANIFEST_FILE + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': EXPORT_VERSION, 'documents': documents}, f, indent=2, sort_keys=True)
+    os.replace(temp_path, EXPORT_MANIFEST_FILE)
+
+def export_dependencies(relative_path, source_hash, html, stylesheet, optimize):
+    """The export manifest entry for a page: everything its HTML and PDF were made from."""
+    images = find_page_images(relative_path, html)
+    return {'source_hash': source_hash, 'stylesheet': stylesheet, 'optimize': optimize,
+            'images': {image: file_hash(os.path.join(DOCS_DIR, image)) for image in images}, 'pdf': False}
+
+def export_is_current(relative_path, entry, source_hash, stylesheet, optimize, pdf):
+    """True if none of the document's dependencies changed and its outputs are still there."""
+    if (not entry or entry['source_hash'] != source_hash or entry['stylesheet'] != stylesheet
+            or entry['optimize'] != optimize):
+        return False
+    if any(file_hash(os.path.join(DOCS_DIR, image)) != image_hash for image, image_hash in entry['images'].items()):
+        return False
+    if not os.path.exists(output_path(relative_path, '.html')):
+        return False
+    return not pdf or (entry['pdf'] and os.path.exists(output_path(relative_path, '.pdf')))
+
+def render_pdfs(documents, jobs):
+    """
+    Prints the documents' HTML pages to PDFs next to them with one headless
+    Chromium for all of them (render_pdf.js). Returns the documents printed.
+    """
+    if not shutil.which(NODE_CMD):
+        print(f"  ❌ PDFs skipped: '{NODE_CMD}' is not installed.")
+        return set()
+    request = {'jobs': jobs, 'documents': [
+        {'name': relative_path, 'html': output_path(relative_path, '.html'), 'pdf': output_path(relative_path, '.pdf')}
+        for relative_path in documents]}
+    result = subprocess.run([NODE_CMD, PDF_RENDERER], input=json.dumps(request),
+                            capture_output=True, text=True, encoding='utf-8')
+    if result.returncode != 0:
+        print(f"  ❌ PDFs skipped: {result.stderr.strip()}")
+        return set()
+
+    printed = set()
+    for item in json.loads(result.stdout):
+        if item.get('error'):
+            print(f"  ❌ PDF failed: {item['name']}: {item['error']}")
+            continue
+        printed.add(item['name'])
+        print(f"  > Printed: {os.path.relpath(item['pdf'], DOCS_DIR)} "
+              f"({item['bytes'] / 1024:.0f} KB, {item['ms']:.0f} ms)")
+    return printed
+
+def convert_markdown_to_html(documents=(DEFAULT_SOURCE,), force=False, jobs=DEFAULT_JOBS, optimize=False,
+                             pdf=False, pdf_jobs=DEFAULT_PDF_JOBS):
+    """
+    Exports the given documents whose dependencies changed: their HTML pages,
+    and with pdf=True their PDFs. Returns how many were 'rendered', taken from
+    the render cache ('cached'), 'skipped' as up to date, and 'pdf_failed'.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    stylesheet = write_stylesheet()
+    exports = load_export_manifest()
+    counts = {'rendered': 0, 'cached': 0, 'skipped': 0, 'pdf_failed': 0}
+
+    pages = []
+    pending = []
+    source_hashes = {}
+    keep_images = []
+    for relative_path in documents:
+        with open(os.path.join(DOCS_DIR, relative_path), 'r', encoding='utf-8') as f:
+            md_content = f.read()
+        source_hash = hashlib.sha256(md_content.encode('utf-8')).hexdigest()
+        entry = exports.get(relative_path)
+        if not force and export_is_current(relative_path, entry, source_hash, stylesheet, optimize, pdf):
+            keep_images.extend(entry['images'])
+            counts['skipped'] += 1
+            print(f"  ✓ Up to date: {relative_path}")
+            continue
+        source_hashes[relative_path] = source_hash
+
+        key = cache_key(relative_path, md_content, stylesheet)
+        cached_path = os.path.join(CACHE_DIR, f"{key}.html")
+        if not force and os.path.exists(cached_path):
+            with open(cached_path, 'r', encoding='utf-8') as f:
+                pages.append((relative_path, f.read()))
+            counts['cached'] += 1
+            print(f"  ✓ Cached: {relative_path}")
+            continue
+        pending.append((relative_path, md_content, cached_path))
+
+    paths = [item[0] for item in pending]
+    sources = [item[1] for item in pending]
+    stylesheets = [stylesheet] * len(pending)
+    if len(pending) >= PARALLEL_THRESHOLD and jobs > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as pool:
+            # Small batches go one document per task so each worker gets one
+            chunksize = max(1, len(pending) // (jobs * 4))
+            rendered = list(pool.map(render_document, paths, sources, stylesheets, chunksize=chunksize))
+    else:
+        rendered = [render_document(*args) for args in zip(paths, sources, stylesheets)]
+
+    for (relative_path, _, cached_path), full_html in zip(pending, rendered):
+        temp_path = cached_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(full_html)
+        os.replace(temp_path, cached_path)
+        pages.append((relative_path, full_html))
+        counts['rendered'] += 1
+        print(f"  > Rendered: {relative_path}")
+
+    manifest = optimize_images(pages, jobs, keep_images) if optimize else None
+    for relative_path, full_html in pages:
+        exports[relative_path] = export_dependencies(relative_path, source_hashes[relative_path], full_html,
+                                                     stylesheet, optimize)
+        if manifest is not None:
+            full_html = rewrite_page_images(relative_path, full_html, manifest)
+        write_if_changed(output_path(relative_path, '.html'), full_html)
+    if manifest is not None:
+        print_image_report(manifest)
+
+    if pdf and pages:
+        printed = render_pdfs([relative_path for relative_path, _ in pages], pdf_jobs)
+        for relative_path, _ in pages:
+            exports[relative_path]['pdf'] = relative_path in printed
+        counts['pdf_failed'] = len(pages) - len(printed)
+    save_export_manifest(exports)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert fireClass documentation from Markdown to HTML.")
+    parser.add_argument('documents', nargs='*',
+                        help=f"Markdown files relative to the documentation folder (default: {DEFAULT_SOURCE}).")
+    parser.add_argument('--all', action='store_true', help="Convert every .md file under the documentation folder.")
+    parser.add_argument('--force', action='store_true', help="Ignore the render cache and the export manifest.")
+    parser.add_argument('--optimize-images', action='store_true',
+                        help="Use optimized, responsive copies of the pages' images (see images/optimized/).")
+    parser.add_argument('--pdf', action='store_true', help="Also print every exported page to a PDF next to it.")
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_JOBS,
+                        help=f"Worker processes for large batches (default: {DEFAULT_JOBS}).")
+    parser.add_argument('--pdf-jobs', type=int, default=DEFAULT_PDF_JOBS,
+                        help=f"Pages printed at the same time in the shared browser (default: {DEFAULT_PDF_JOBS}).")
+    args = parser.parse_args()
+
+    documents = find_documents() if args.all else (args.documents or [DEFAULT_SOURCE])
+    counts = convert_markdown_to_html(documents, force=args.force, jobs=max(1, args.jobs),
+                                      optimize=args.optimize_images, pdf=args.pdf, pdf_jobs=max(1, args.pdf_jobs))
+
+    print(f"✅ Exported {len(documents)} document(s): {counts['rendered']} rendered, "
+          f"{counts['cached']} from the render cache, {counts['skipped']} up to date")
+    if DEFAULT_SOURCE in documents:
+        print("📄 Open 'article_final.html' in your browser to view the article")
+    if counts['pdf_failed']:
+        print(f"❌ {counts['pdf_failed']} PDF(s) could not be printed.")
+        sys.exit(1)
 
 if __name__ == "__main__":
-    convert_markdown_to_html() 
\ No newline at end of file
+    main()
@@ -0,0 +1,77 @@
+// PDF step of convert_article.py --pdf (run that instead).
+//
+// Launches one headless Chromium with Playwright and prints every page in the
+// request to PDF, a few at a time in the same browser, so the browser starts
+// once per export instead of once per document.
+//
+// stdin:  {"jobs": N, "documents": [{"name": ..., "html": path, "pdf": path}, ...]}
+// stdout: [{"name": ..., "pdf": path, "bytes": N, "ms": N} or {"name": ..., "error": ...}, ...]
+
+const fs = require('fs');
+const { pathToFileURL } = require('url');
+
+const PDF_OPTIONS = {
+    format: 'A4',
+    printBackground: true,
+    margin: { top: '15mm', right: '12mm', bottom: '15mm', left: '12mm' }
+};
+const PAGE_TIMEOUT_MS = 60000;
+
+function loadPlaywright() {
+    try {
+        return require('playwright');
+    } catch (error) {
+        process.stderr.write("Playwright is not installed: run 'npm install' and 'npx playwright install chromium' " +
+                             'in the repository root.\n');
+        process.exit(3);
+    }
+}
+
+async function printDocument(context, doc) {
+    const start = Date.now();
+    const page = await context.newPage();
+    try {
+        await page.goto(pathToFileURL(doc.html).href, { waitUntil: 'load', timeout: PAGE_TIMEOUT_MS });
+        // Lazy images below the fold would otherwise be missing from the PDF
+        await page.evaluate(() => Promise.all(Array.from(document.images, img => {
+            img.loading = 'eager';
+            return img.complete ? null : new Promise(resolve => {
+                img.addEventListener('load', resolve);
+                img.addEventListener('error', resolve);
+            });
+        })));
+        await page.emulateMedia({ media: 'print' });
+        await page.pdf({ ...PDF_OPTIONS, path: doc.pdf });
+        return { name: doc.name, pdf: doc.pdf, bytes: fs.statSync(doc.pdf).size, ms: Date.now() - start };
+    } catch (error) {
+        return { name: doc.name, error: String(error.message || error) };
+    } finally {
+        await page.close();
+    }
+}
+
+async function main() {
+    const input = JSON.parse(fs.readFileSync(0, 'utf8'));
+    const { chromium } = loadPlaywright();
+    const browser = await chromium.launch({ headless: true });
+    const results = new Array(input.documents.length);
+    try {
+        const context = await browser.newContext();
+        let next = 0;
+        const worker = async () => {
+            while (next < input.documents.length) {
+                const index = next++;
+                results[index] = await printDocument(context, input.documents[index]);
+            }
+        };
+        await Promise.all(Array.from({ length: Math.max(1, input.jobs || 1) }, worker));
+    } finally {
+        await browser.close();
+    }
+    process.stdout.write(JSON.stringify(results));
+}
+
+main().catch(error => {
+    process.stderr.write(`${error.stack || error}\n`);
+    process.exit(1);
+});
@@ -0,0 +1,133 @@
+/**
+ * מטמון תשובות AI ואיחוד בקשות זהות
+ *
+ * A TTL cache keyed by model and normalized prompt, with single-flight
+ * coalescing: while a prompt is on its way to the provider, identical prompts
+ * wait for that call instead of making their own. The cache lives in the
+ * function instance's memory, so each instance keeps its own entries and
+ * counters.
+ */
+
+const DEFAULT_TTL_MS = 10 * 60 * 1000;
+const DEFAULT_MAX_ENTRIES = 500;
+
+/**
+ * Prompts that differ only in spacing share a key. Case and every other
+ * character are kept: they can change the answer (code, names, symbols).
+ * @param {string} prompt
+ * @return {string}
+ */
+function normalizePrompt(prompt) {
+  return prompt.replace(/\s+/g, " ").trim();
+}
+
+/**
+ * TTL + LRU response cache with request coalescing.
+ */
+class AiResponseCache {
+  /**
+   * Creates an empty cache.
+   * @param {object} options ttlMs, maxEntries, now (clock, for tests)
+   */
+  constructor({
+    ttlMs = DEFAULT_TTL_MS,
+    maxEntries = DEFAULT_MAX_ENTRIES,
+    now = Date.now,
+  } = {}) {
+    this.ttlMs = ttlMs;
+    this.maxEntries = maxEntries;
+    this.now = now;
+    this.entries = new Map(); // key -> {value, expiresAt}, oldest first
+    this.inFlight = new Map(); // key -> promise of the upstream call
+    this.counters = {
+      hits: 0,
+      misses: 0,
+      coalesced: 0,
+      errors: 0,
+      evictions: 0,
+    };
+  }
+
+  /**
+   * The cached response for (model, prompt), or fetcher()'s, shared with any
+   * identical request already in flight. Failed calls are not cached.
+   * @param {string} model
+   * @param {string} prompt
+   * @param {function} fetcher async () => response
+   * @return {Promise<{value: *, source: string}>} source is "hit",
+   *     "coalesced" or "miss"
+   */
+  async get(model, prompt, fetcher) {
+    const key = `${model}\u0000${normalizePrompt(prompt)}`;
+
+    const entry = this.entries.get(key);
+    if (entry && entry.expiresAt > this.now()) {
+      // Move to the end: most recently used
+      this.entries.delete(key);
+      this.entries.set(key, entry);
+      this.counters.hits++;
+      return {value: entry.value, source: "hit"};
+    }
+    if (entry) {
+      this.entries.delete(key);
+    }
+
+    const pending = this.inFlight.get(key);
+    if (pending) {
+      this.counters.coalesced++;
+      return {value: await pending, source: "coalesced"};
+    }
+
+    this.counters.misses++;
+    const call = (async () => {
+      try {
+        const value = await fetcher();
+        this.store(key, value);
+        return value;
+      } catch (error) {
+        this.counters.errors++;
+        throw error;
+      } finally {
+        this.inFlight.delete(key);
+      }
+    })();
+    this.inFlight.set(key, call);
+    return {value: await call, source: "miss"};
+  }
+
+  /**
+   * Saves a response and evicts the least recently used entries over
+   * maxEntries.
+   * @param {string} key
+   * @param {*} value
+   */
+  store(key, value) {
+    this.entries.set(key, {value, expiresAt: this.now() + this.ttlMs});
+    while (this.entries.size > this.maxEntries) {
+      this.entries.delete(this.entries.keys().next().value);
+      this.counters.evictions++;
+    }
+  }
+
+  /**
+   * The instance's counters, for getAiCacheStats.
+   * @return {object} counters plus the current size and hit rate
+   */
+  stats() {
+    const {hits, misses, coalesced} = this.counters;
+    const requests = hits + misses + coalesced;
+    return {
+      ...this.counters,
+      entries: this.entries.size,
+      inFlight: this.inFlight.size,
+      hitRate: requests ? (hits + coalesced) / requests : 0,
+    };
+  }
+}
+
+module.exports = {
+  AiResponseCache,
+  normalizePrompt,
+  DEFAULT_TTL_MS,
+  DEFAULT_MAX_ENTRIES,
+};
@@ -15,6 +15,7 @@ const {HttpsError} = require("firebase-functions/v2/https");
 const {defineSecret} = require("firebase-functions/params");
 const admin = require("firebase-admin");
 const https = require("https");
+const {AiResponseCache} = require("./aiCache");
 
 
 
@@ -33,6 +34,29 @@ const geminiApiKey = defineSecret("GEMINI_API_KEY");
 const claudeApiKey = defineSecret("CLAUDE_API_KEY");
 const openaiApiKey = defineSecret("OPENAI_API_KEY");
 
+// Identical prompts to the same model within the TTL are answered once per
+// instance; see aiCache.js. Counters are returned by getAiCacheStats.
+const aiCache = new AiResponseCache();
+
+// Polls with `responseStore: "shards"` spread answers over this many documents
+// in rooms/{roomCode}/pollShards instead of the room document itself.
+const POLL_RESPONSE_SHARDS = 10;
+
+/**
+ * בחירת shard לפי מזהה התלמיד (FNV-1a), כך שאותו תלמיד תמיד כותב לאותו מסמך
+ * @param {string} key studentId, or the sanitized player name for open-text
+ *     polls
+ * @return {number} shard index
+ */
+function pollShardFor(key) {
+  let hash = 0x811c9dc5;
+  for (let i = 0; i < key.length; i++) {
+    hash ^= key.charCodeAt(i);
+    hash = Math.imul(hash, 0x01000193) >>> 0;
+  }
+  return hash % POLL_RESPONSE_SHARDS;
+}
+
 /**
  * פונקציה מרכזית לכל קריאות AI - קוראת להגדרות החדר ומחליטה איזה מודל להפעיל
  */
@@ -91,29 +115,20 @@ exports.askAI = onCall({
     const selectedModel = roomData.settings?.ai_model || 'chatgpt';
     console.log(`🎯 Room ${roomCode} selected model: ${selectedModel}`);
     
-    let result;
-    switch (selectedModel) {
-      case 'chatgpt':
-        result = await callChatGPT(prompt);
-        break;
-      case 'claude':
-        result = await callClaude(prompt);
-        break;
-      case 'gemini':
-        result = await callGemini(prompt);
-        break;
-      default:
-        console.log(`⚠️ Unknown model ${selectedModel}, falling back to ChatGPT`);
-        result = await callChatGPT(prompt);
-        break;
+    let model = selectedModel;
+    if (!AI_CALLERS[model]) {
+      console.log(`⚠️ Unknown model ${selectedModel}, falling back to ChatGPT`);
+      model = "chatgpt";
     }
+    const {value: result, source} = await askModel(model, prompt);
     
     await roomRef.update({ 'last_activity': admin.firestore.FieldValue.serverTimestamp() });
     
-    console.log(`✅ AI response generated successfully using ${selectedModel}`);
+    console.log(`✅ AI response (${source}) using ${selectedModel}`);
     return { 
       result: result.text, 
-      model: result.modelName 
+      model: result.modelName,
+      cached: source !== "miss"
     };
     
   } catch (error) {
@@ -132,7 +147,8 @@ exports.submitPollAnswer = onCall({
   region: DEPLOY_REGION,
   allow: "all" // מאפשר קריאות ממשתמשים לא מאומתים (תלמידים)
 }, async (request) => {
-  const { roomCode, studentId, playerName, answer } = request.data;
+  const {roomCode, studentId, playerName, answer, responseStore} =
+    request.data;
 
   if (!roomCode || !studentId || !playerName || answer === undefined) {
     throw new HttpsError("invalid-argument", "Missing required fields.");
@@ -141,14 +157,58 @@ exports.submitPollAnswer = onCall({
   const db = admin.firestore();
   const roomRef = db.collection("rooms").doc(roomCode);
 
+  // Sharded polls (the client passes the poll's responseStore): one plain write
+  // to the student's shard, no transaction on the room document.
+  if (responseStore === "shards") {
+    const roomSnapshot = await roomRef.get();
+    if (!roomSnapshot.exists) {
+      throw new HttpsError("not-found", `Room ${roomCode} does not exist.`);
+    }
+    const settings = roomSnapshot.data().settings;
+    if (!settings) {
+      throw new HttpsError("failed-precondition",
+          `Room ${roomCode} has no settings.`);
+    }
+    const activePoll = settings.currentPoll;
+    if (!activePoll || !activePoll.isActive) {
+      return { success: true, attempts: 1 }; // No active poll to answer
+    }
+    if (activePoll.responseStore === "shards") {
+      const isOpenText = activePoll.type === "open_text";
+      const key = isOpenText ? playerName.replace(/[.#$[\]]/g, "_") : studentId;
+      const shard = pollShardFor(key);
+      const value = isOpenText ?
+        admin.firestore.FieldValue.arrayUnion(answer) : answer;
+      const shardRef =
+        roomRef.collection("pollShards").doc(`${activePoll.id}_${shard}`);
+      await shardRef.set({
+        pollId: activePoll.id,
+        responses: {[key]: value},
+        answeredAt: {[key]: admin.firestore.FieldValue.serverTimestamp()},
+        updatedAt: admin.firestore.FieldValue.serverTimestamp()
+      }, {merge: true});
+      return { success: true, attempts: 1, shard };
+    }
+  }
+
+  // Firestore re-runs the transaction when another answer commits first;
+  // the count is returned so load tests can see contention on the room doc.
+  let attempts = 0;
+
   try {
     await db.runTransaction(async (transaction) => {
+      attempts++;
       const roomDoc = await transaction.get(roomRef);
       if (!roomDoc.exists) {
         throw new HttpsError("not-found", `Room ${roomCode} does not exist.`);
       }
 
-      const currentPoll = roomDoc.data().settings.currentPoll;
+      const settings = roomDoc.data().settings;
+      if (!settings) {
+        throw new HttpsError("failed-precondition",
+            `Room ${roomCode} has no settings.`);
+      }
+      const currentPoll = settings.currentPoll;
       if (!currentPoll || !currentPoll.isActive) {
         return; // No active poll to answer
       }
@@ -157,19 +217,24 @@ exports.submitPollAnswer = onCall({
         'settings.last_poll_activity': admin.firestore.FieldValue.serverTimestamp()
       };
 
+      let responseKey = studentId;
       if (currentPoll.type === 'open_text') {
-        const studentIdentifier = playerName.replace(/[.#$[\]]/g, '_');
-        const responseField = `settings.currentPoll.responses.${studentIdentifier}`;
+        responseKey = playerName.replace(/[.#$[\]]/g, "_");
+        const responseField = `settings.currentPoll.responses.${responseKey}`;
         updateData[responseField] = admin.firestore.FieldValue.arrayUnion(answer);
       } else {
-        const responseField = `settings.currentPoll.responses.${studentId}`;
+        const responseField = `settings.currentPoll.responses.${responseKey}`;
         updateData[responseField] = answer;
       }
+      // Time of the student's latest answer; saved with the poll in
+      // questionHistory for response-time analytics (tools/poll_analytics.py)
+      updateData[`settings.currentPoll.answeredAt.${responseKey}`] =
+        admin.firestore.FieldValue.serverTimestamp();
 
       transaction.update(roomRef, updateData);
     });
 
-    return { success: true };
+    return { success: true, attempts };
 
   } catch (error) {
     console.error(`Error in submitPollAnswer for room ${roomCode}:`, error);
@@ -178,6 +243,118 @@ exports.submitPollAnswer = onCall({
   }
 });
 
+/**
+ * איחוד תשובות מה-shards של הסקר הפעיל וכתיבת סיכום קומפקטי למסמך החדר.
+ * Called periodically by the teacher dashboard while a sharded poll runs.
+ * Choice polls get `tallies` and `responseCount`; open-text polls also get the
+ * merged `responses`, which the dashboard shows and the AI analyzes. With
+ * `final: true` (the poll is closing) every poll also gets the merged
+ * `responses` and `answeredAt`, so questionHistory keeps the per-student
+ * answers.
+ * The room is only written when a shard changed since the last aggregation:
+ * `aggregatedThrough` holds the newest shard `updatedAt` that aggregation read,
+ * so a shard written while it ran is newer and is picked up next time.
+ * With `reset: true` the poll's shards and aggregated responses are cleared.
+ */
+exports.aggregatePollResponses = onCall({
+  region: DEPLOY_REGION
+}, async (request) => {
+  if (!request.auth) {
+    throw new HttpsError("unauthenticated", "Authentication required");
+  }
+  const {roomCode, reset, final} = request.data;
+  if (!roomCode) {
+    throw new HttpsError("invalid-argument", "roomCode is required");
+  }
+
+  const db = admin.firestore();
+  const roomRef = db.collection("rooms").doc(roomCode);
+  const roomDoc = await roomRef.get();
+  if (!roomDoc.exists) {
+    throw new HttpsError("not-found", `Room ${roomCode} does not exist.`);
+  }
+  const roomData = roomDoc.data();
+  if (request.auth.uid !== roomData.teacher_uid) {
+    throw new HttpsError("permission-denied",
+        "Only the teacher can aggregate poll responses");
+  }
+  const settings = roomData.settings;
+  if (!settings) {
+    throw new HttpsError("failed-precondition",
+        `Room ${roomCode} has no settings.`);
+  }
+  const currentPoll = settings.currentPoll;
+  if (!currentPoll || currentPoll.responseStore !== "shards") {
+    return {aggregated: false};
+  }
+
+  const shards = await roomRef.collection("pollShards")
+      .where("pollId", "==", currentPoll.id).get();
+
+  if (reset) {
+    const batch = db.batch();
+    shards.forEach((doc) => batch.delete(doc.ref));
+    batch.update(roomRef, {
+      "settings.currentPoll.responses": {},
+      "settings.currentPoll.tallies": {},
+      "settings.currentPoll.responseCount": 0,
+      "settings.currentPoll.aggregatedAt":
+        admin.firestore.FieldValue.serverTimestamp(),
+      "settings.currentPoll.aggregatedThrough":
+        admin.firestore.FieldValue.delete(),
+    });
+    await batch.commit();
+    return {aggregated: true, responseCount: 0};
+  }
+
+  // Timestamp.valueOf() strings sort in time order, to the nanosecond
+  let aggregatedThrough = currentPoll.aggregatedThrough || null;
+  const lastAggregated = aggregatedThrough ? aggregatedThrough.valueOf() : "";
+  let changed = false;
+  shards.forEach((doc) => {
+    const updatedAt = doc.get("updatedAt");
+    if (!updatedAt || updatedAt.valueOf() > lastAggregated) changed = true;
+    if (!updatedAt) return;
+    if (!aggregatedThrough ||
+        updatedAt.valueOf() > aggregatedThrough.valueOf()) {
+      aggregatedThrough = updatedAt;
+    }
+  });
+  if (!changed && !final) {
+    return {aggregated: false, responseCount: currentPoll.responseCount || 0};
+  }
+
+  const responses = {};
+  const answeredAt = {};
+  shards.forEach((doc) => {
+    Object.assign(responses, doc.get("responses") || {});
+    Object.assign(answeredAt, doc.get("answeredAt") || {});
+  });
+  const tallies = {};
+  Object.values(responses).forEach((value) => {
+    if (!Array.isArray(value)) {
+      tallies[value] = (tallies[value] || 0) + 1;
+    }
+  });
+  const responseCount = Object.keys(responses).length;
+
+  const updateData = {
+    "settings.currentPoll.tallies": tallies,
+    "settings.currentPoll.responseCount": responseCount,
+    "settings.currentPoll.aggregatedAt":
+      admin.firestore.FieldValue.serverTimestamp(),
+    "settings.currentPoll.aggregatedThrough": aggregatedThrough,
+  };
+  if (currentPoll.type === "open_text" || final) {
+    updateData["settings.currentPoll.responses"] = responses;
+  }
+  if (final) {
+    updateData["settings.currentPoll.answeredAt"] = answeredAt;
+  }
+  await roomRef.update(updateData);
+  return {aggregated: true, responseCount};
+});
+
 /**
  * פונקציית עזר לקריאה ל-ChatGPT
  */
@@ -374,6 +551,35 @@ async function callGemini(prompt) {
   });
 }
 
+const AI_CALLERS = {
+  chatgpt: callChatGPT,
+  claude: callClaude,
+  gemini: callGemini
+};
+
+/**
+ * Calls a model through the response cache.
+ * @param {string} model key of AI_CALLERS
+ * @param {string} prompt
+ * @return {Promise<{value: {text: string, modelName: string},
+ *     source: string}>}
+ */
+function askModel(model, prompt) {
+  return aiCache.get(model, prompt, () => AI_CALLERS[model](prompt));
+}
+
+/**
+ * מוני המטמון של ה-AI (hits/misses) של המופע הנוכחי
+ */
+exports.getAiCacheStats = onCall({
+  region: DEPLOY_REGION
+}, async (request) => {
+  if (!request.auth) {
+    throw new HttpsError("unauthenticated", "Authentication required");
+  }
+  return aiCache.stats();
+});
+
 /**
  * הפונקציות הישנות - עדיין נשארות לתאימות לאחור (אם צריך לבדיקות)
  * אבל הClient לא אמור לקרוא להן ישירות יותר
@@ -387,7 +593,7 @@ exports.askGemini = onCall({
   if (!prompt) {
     throw new HttpsError("invalid-argument", "Prompt is required");
   }
-  const result = await callGemini(prompt);
+  const {value: result} = await askModel("gemini", prompt);
   return { result: result.text, model: result.modelName };
 });
 
@@ -400,7 +606,7 @@ exports.askClaude = onCall({
   if (!prompt) {
     throw new HttpsError("invalid-argument", "Prompt is required");
   }
-  const result = await callClaude(prompt);
+  const {value: result} = await askModel("claude", prompt);
   return { result: result.text, model: result.modelName };
 });
 
@@ -413,47 +619,463 @@ exports.askChatGPT = onCall({
   if (!prompt) {
     throw new HttpsError("invalid-argument", "Prompt is required");
   }
-  const result = await callChatGPT(prompt);
+  const {value: result} = await askModel("chatgpt", prompt);
   return { result: result.text, model: result.modelName };
 });
 
+// cleanupOldClassrooms reads old rooms a page at a time and deletes each room
+// with its subcollections in write batches, a few batches in flight at once.
+// Progress is checkpointed after every page, so a run that stops early (time
+// budget, error) is picked up by the next one.
+const CLEANUP_MAX_AGE_DAYS = 7;
+const CLEANUP_PAGE_SIZE = 100; // Rooms per query page
+// Deletes per write batch (Firestore allows 500)
+const CLEANUP_BATCH_SIZE = 400;
+// Batches committing, and rooms being read, at once
+const CLEANUP_CONCURRENCY = 4;
+const CLEANUP_TIMEOUT_SECONDS = 540;
+// Stop and checkpoint well before the timeout
+const CLEANUP_TIME_BUDGET_MS = 480 * 1000;
+const CLEANUP_CHECKPOINT = "maintenance/cleanupOldClassrooms";
+
+/**
+ * מחיקת מסמכים במנות (batch) עם מספר מוגבל של מנות במקביל
+ */
+class BatchDeleter {
+  /**
+   * Creates a deleter with no queued documents.
+   * @param {Firestore} db
+   */
+  constructor(db) {
+    this.db = db;
+    this.refs = [];
+    this.inFlight = new Set();
+    this.deleted = 0;
+    this.error = null;
+  }
+
+  /**
+   * Queues a document for deletion, committing a batch once one is full.
+   * @param {DocumentReference} ref
+   */
+  async delete(ref) {
+    this.refs.push(ref);
+    if (this.refs.length >= CLEANUP_BATCH_SIZE) {
+      await this.flush();
+    }
+  }
+
+  /**
+   * Starts committing the next full batch, or, with `partial`, whatever is
+   * queued. Waits while CLEANUP_CONCURRENCY batches are in flight.
+   * @param {boolean} partial commit a batch smaller than CLEANUP_BATCH_SIZE
+   */
+  async flush(partial = false) {
+    // Wait for a free slot first; the check and the commit happen without an
+    // await in between
+    while (this.inFlight.size >= CLEANUP_CONCURRENCY) {
+      await Promise.race(this.inFlight);
+    }
+    if (this.error) throw this.error;
+    // Another caller may have taken the full batch while this one waited
+    const full = this.refs.length >= CLEANUP_BATCH_SIZE;
+    if (this.refs.length === 0 || (!partial && !full)) return;
+    const refs = this.refs.splice(0, CLEANUP_BATCH_SIZE);
+
+    const batch = this.db.batch();
+    refs.forEach((ref) => batch.delete(ref));
+    const commit = batch.commit()
+        .then(() => {
+          this.deleted += refs.length;
+        }, (error) => {
+          this.error = this.error || error;
+        })
+        .finally(() => this.inFlight.delete(commit));
+    this.inFlight.add(commit);
+  }
+
+  /**
+   * Commits everything queued and waits for all batches in flight. Throws the
+   * first commit error.
+   */
+  async drain() {
+    while (this.refs.length > 0) {
+      await this.flush(true);
+    }
+    await Promise.all(this.inFlight);
+    if (this.error) throw this.error;
+  }
+}
+
+/**
+ * Runs fn on every item, at most `limit` at a time.
+ * @param {Array} items
+ * @param {number} limit
+ * @param {function} fn async function(item)
+ */
+async function forEachLimited(items, limit, fn) {
+  let next = 0;
+  const worker = async () => {
+    while (next < items.length) {
+      await fn(items[next++]);
+    }
+  };
+  const workers = Array.from({length: Math.min(limit, items.length)}, worker);
+  await Promise.all(workers);
+}
+
+/**
+ * Queues every document in a room's subcollections (students, messages,
+ * questionHistory, pollShards, ...) for deletion. Documents are read as
+ * references only, one batch-sized page at a time.
+ * @param {DocumentReference} roomRef
+ * @param {BatchDeleter} deleter
+ */
+async function deleteRoomSubcollections(roomRef, deleter) {
+  const collections = await roomRef.listCollections();
+  for (const collection of collections) {
+    let last = null;
+    for (;;) {
+      let query = collection.orderBy(admin.firestore.FieldPath.documentId())
+          .select().limit(CLEANUP_BATCH_SIZE);
+      if (last) query = query.startAfter(last);
+      const page = await query.get();
+      for (const doc of page.docs) {
+        await deleter.delete(doc.ref);
+      }
+      if (page.size < CLEANUP_BATCH_SIZE) break;
+      last = page.docs[page.size - 1];
+    }
+  }
+}
+
 /**
  * Scheduled function to clean up old classrooms.
  * Runs every day at 2:00 AM Israel time.
+ * Deletes rooms older than CLEANUP_MAX_AGE_DAYS together with their
+ * subcollections.
  */
 exports.cleanupOldClassrooms = onSchedule({
   schedule: "0 2 * * *",
   timeZone: "Asia/Jerusalem",
-  region: DEPLOY_REGION
+  region: DEPLOY_REGION,
+  timeoutSeconds: CLEANUP_TIMEOUT_SECONDS
 }, async (event) => {
   console.log("🧹 Starting cleanup of old classrooms...");
-  
+  const startedAt = Date.now();
+
   const db = admin.firestore();
+  const checkpointRef = db.doc(CLEANUP_CHECKPOINT);
+  const checkpoint = await checkpointRef.get();
+
+  // A checkpoint means the previous run stopped early: finish it with the same
+  // cutoff
+  let cutoff;
+  let cursor = null;
+  let deletedRooms = 0;
+  let deletedDocuments = 0;
+  if (checkpoint.exists) {
+    ({cutoff, cursor, deletedRooms, deletedDocuments} = checkpoint.data());
+    const resumeAfter = cursor ? cursor.roomId : "(start)";
+    console.log(`↩️ Resuming cleanup after room ${resumeAfter}`);
+  } else {
+    const oneWeekAgo = new Date();
+    oneWeekAgo.setDate(oneWeekAgo.getDate() - CLEANUP_MAX_AGE_DAYS);
+    cutoff = admin.firestore.Timestamp.fromDate(oneWeekAgo);
+  }
 
-  const oneWeekAgo = new Date();
-  oneWeekAgo.setDate(oneWeekAgo.getDate() - 7);
+  console.log("🔍 Looking for rooms older than:", cutoff.toDate());
 
-  console.log("🔍 Looking for rooms older than:", oneWeekAgo);
+  const deleter = new BatchDeleter(db);
+  for (;;) {
+    let query = db.collection("rooms")
+        .where("last_activity", "<", cutoff)
+        .orderBy("last_activity")
+        .orderBy(admin.firestore.FieldPath.documentId())
+        .select("last_activity")
+        .limit(CLEANUP_PAGE_SIZE);
+    if (cursor) {
+      query = query.startAfter(cursor.lastActivity, cursor.roomId);
+    }
+    const page = await query.get();
+    if (page.empty) break;
 
-  const query = db.collection("rooms")
-      .where("last_activity", "<", oneWeekAgo);
+    await forEachLimited(page.docs, CLEANUP_CONCURRENCY,
+        (doc) => deleteRoomSubcollections(doc.ref, deleter));
+    // Room documents go last, so a room whose subcollections failed is found
+    // again next run
+    await deleter.drain();
+    for (const doc of page.docs) {
+      await deleter.delete(doc.ref);
+    }
+    await deleter.drain();
 
-  const oldRoomsSnapshot = await query.get();
-  let deletedCount = 0;
+    const last = page.docs[page.size - 1];
+    cursor = {lastActivity: last.get("last_activity"), roomId: last.id};
+    deletedRooms += page.size;
+    await checkpointRef.set({
+      cutoff,
+      cursor,
+      deletedRooms,
+      deletedDocuments: deletedDocuments + deleter.deleted,
+      updatedAt: admin.firestore.FieldValue.serverTimestamp()
+    });
+
+    if (page.size < CLEANUP_PAGE_SIZE) break;
+    if (Date.now() - startedAt > CLEANUP_TIME_BUDGET_MS) {
+      console.log(`⏸️ Time budget reached after ${deletedRooms} rooms; ` +
+          "the next run continues.");
+      return {
+        deletedRooms,
+        deletedDocuments: deletedDocuments + deleter.deleted,
+        finished: false,
+      };
+    }
+  }
 
-  if (oldRoomsSnapshot.empty) {
+  deletedDocuments += deleter.deleted;
+  if (checkpoint.exists || deletedRooms > 0) {
+    await checkpointRef.delete();
+  }
+  if (deletedRooms === 0) {
     console.log("✅ No old rooms to delete.");
-    return {deletedCount: 0};
+  } else {
+    console.log(`✅ Cleanup completed. Deleted ${deletedRooms} old rooms ` +
+        `(${deletedDocuments} documents).`);
+  }
+  return {deletedRooms, deletedDocuments, finished: true};
+});
+
+// ========== דחיסת הודעות לחדרים פעילים ==========
+
+// Newest messages left in rooms/{code}/messages (clients keep the newest 50
+// live)
+const MESSAGE_LIVE_KEEP = 200;
+// Rooms are compacted once they have more live messages than this
+const MESSAGE_COMPACT_THRESHOLD = 300;
+// Messages per archive document, and per write batch
+const MESSAGE_ARCHIVE_CHUNK = 100;
+// Archive documents stay well under Firestore's 1 MiB
+const MESSAGE_ARCHIVE_MAX_BYTES = 512 * 1024;
+// Rooms with a message this recent are checked
+const MESSAGE_COMPACTION_LOOKBACK_MINUTES = 20;
+const AUDIENCE_BACKFILL_CHECKPOINT = "maintenance/messageAudienceBackfill";
+
+/**
+ * Who a message is delivered to: ["all"], or a private message's recipient
+ * and sender.
+ * Messages written before the audience field existed get it from is_private.
+ * @param {object} message
+ * @return {Array<string>}
+ */
+function messageAudience(message) {
+  if (Array.isArray(message.audience)) return message.audience;
+  if (!message.is_private) return ["all"];
+  return [message.recipient_uid, message.sender_uid];
+}
+
+/**
+ * Sets `audience` on a room's messages that were written without it, so that
+ * students' audience-filtered queries find them.
+ * @param {DocumentReference} roomRef
+ * @return {Promise<number>} messages updated
+ */
+async function backfillRoomAudience(roomRef) {
+  const messages = roomRef.collection("messages");
+  let updated = 0;
+  let last = null;
+  for (;;) {
+    let query = messages.orderBy(admin.firestore.FieldPath.documentId())
+        .select("audience", "is_private", "recipient_uid", "sender_uid")
+        .limit(MESSAGE_ARCHIVE_CHUNK);
+    if (last) query = query.startAfter(last);
+    const page = await query.get();
+    const missing = page.docs.filter(
+        (doc) => !Array.isArray(doc.get("audience")));
+    if (missing.length > 0) {
+      const batch = roomRef.firestore.batch();
+      missing.forEach((doc) => {
+        batch.update(doc.ref, {audience: messageAudience(doc.data())});
+      });
+      await batch.commit();
+      updated += missing.length;
+    }
+    if (page.size < MESSAGE_ARCHIVE_CHUNK) break;
+    last = page.docs[page.size - 1];
+  }
+  return updated;
+}
+
+/**
+ * Writes one archive chunk and deletes its messages, in one batch.
+ * @param {DocumentReference} roomRef
+ * @param {object} chunk {audience, docs}
+ */
+async function writeArchiveChunk(roomRef, chunk) {
+  const messages = chunk.docs.map((doc) => {
+    const message = doc.data();
+    delete message.audience; // Kept once, on the chunk
+    // Tells it apart from a live message with the same timestamp
+    message.id = doc.id;
+    return message;
+  });
+  const batch = roomRef.firestore.batch();
+  batch.set(roomRef.collection("messageArchive").doc(), {
+    audience: chunk.audience,
+    from: messages[0].timestamp,
+    to: messages[messages.length - 1].timestamp,
+    count: messages.length,
+    messages
+  });
+  chunk.docs.forEach((doc) => batch.delete(doc.ref));
+  await batch.commit();
+}
+
+/**
+ * Rolls a room's oldest messages into rooms/{code}/messageArchive, leaving the
+ * newest MESSAGE_LIVE_KEEP. Each archive document holds up to
+ * MESSAGE_ARCHIVE_CHUNK messages with one audience, so a student's backfill
+ * query only matches messages addressed to them; chunks of different audiences
+ * overlap in time.
+ * @param {DocumentReference} roomRef
+ * @return {Promise<number>} messages archived
+ */
+async function compactRoomMessages(roomRef) {
+  const messages = roomRef.collection("messages");
+  const liveCount = (await messages.count().get()).data().count;
+  if (liveCount <= MESSAGE_COMPACT_THRESHOLD) return 0;
+
+  let remaining = liveCount - MESSAGE_LIVE_KEEP;
+  let archived = 0;
+  let last = null;
+  // audience key -> {audience, docs, bytes} being filled
+  const open = new Map();
+  while (remaining > 0) {
+    let query = messages.orderBy("timestamp")
+        .limit(Math.min(remaining, MESSAGE_ARCHIVE_CHUNK));
+    if (last) query = query.startAfter(last);
+    const page = await query.get();
+    if (page.empty) break;
+
+    for (const doc of page.docs) {
+      const audience = messageAudience(doc.data());
+      const key = audience.join("\u0000");
+      const bytes = JSON.stringify(doc.data()).length;
+      let chunk = open.get(key);
+      const full = chunk && (chunk.docs.length >= MESSAGE_ARCHIVE_CHUNK ||
+          chunk.bytes + bytes > MESSAGE_ARCHIVE_MAX_BYTES);
+      if (full) {
+        await writeArchiveChunk(roomRef, chunk);
+        archived += chunk.docs.length;
+        chunk = null;
+      }
+      if (!chunk) {
+        chunk = {audience, docs: [], bytes: 0};
+        open.set(key, chunk);
+      }
+      chunk.docs.push(doc);
+      chunk.bytes += bytes;
+    }
+    remaining -= page.size;
+    last = page.docs[page.size - 1];
+  }
+
+  for (const chunk of open.values()) {
+    await writeArchiveChunk(roomRef, chunk);
+    archived += chunk.docs.length;
   }
+  return archived;
+}
+
+/**
+ * Scheduled function that keeps active rooms' message collections short.
+ * Runs every 15 minutes over the rooms that had a message since the previous
+ * run.
+ */
+exports.compactMessages = onSchedule({
+  schedule: "every 15 minutes",
+  timeZone: "Asia/Jerusalem",
+  region: DEPLOY_REGION
+}, async (event) => {
+  const db = admin.firestore();
+  const since = admin.firestore.Timestamp.fromMillis(
+      Date.now() - MESSAGE_COMPACTION_LOOKBACK_MINUTES * 60 * 1000);
+  const recent = await db.collectionGroup("messages")
+      .where("timestamp", ">=", since)
+      .select("audience", "is_private", "recipient_uid", "sender_uid").get();
 
-  const deletePromises = [];
-  oldRoomsSnapshot.forEach((doc) => {
-    console.log(`🗑️ Scheduling deletion for room: ${doc.id}`);
-    deletePromises.push(doc.ref.delete());
-    deletedCount++;
+  const rooms = new Map();
+  // Clients loaded before the audience field existed still write messages
+  // without it
+  const batch = db.batch();
+  let backfilled = 0;
+  recent.docs.forEach((doc) => {
+    const roomRef = doc.ref.parent.parent;
+    rooms.set(roomRef.path, roomRef);
+    const missing = !Array.isArray(doc.get("audience"));
+    if (missing && backfilled < MESSAGE_ARCHIVE_CHUNK) {
+      batch.update(doc.ref, {audience: messageAudience(doc.data())});
+      backfilled++;
+    }
   });
+  if (backfilled > 0) await batch.commit();
+
+  let archived = 0;
+  await forEachLimited(Array.from(rooms.values()), CLEANUP_CONCURRENCY,
+      async (roomRef) => {
+        archived += await compactRoomMessages(roomRef);
+      });
+  console.log(
+      `🗜️ Compacted ${archived} messages in ${rooms.size} active rooms.`);
+  return {rooms: rooms.size, archived, backfilled};
+});
+
+/**
+ * One-off migration: sets `audience` on every message written before the field
+ * existed. Runs every 15 minutes until a full pass over the rooms is done, then
+ * only checks its checkpoint; stragglers from old clients are caught by
+ * compactMessages.
+ */
+exports.backfillMessageAudience = onSchedule({
+  schedule: "every 15 minutes",
+  timeZone: "Asia/Jerusalem",
+  region: DEPLOY_REGION,
+  timeoutSeconds: CLEANUP_TIMEOUT_SECONDS
+}, async (event) => {
+  const startedAt = Date.now();
+  const db = admin.firestore();
+  const checkpointRef = db.doc(AUDIENCE_BACKFILL_CHECKPOINT);
+  const checkpoint = await checkpointRef.get();
+  if (checkpoint.get("finished")) return {updated: 0, finished: true};
+
+  let cursor = checkpoint.get("cursor") || null;
+  let updated = checkpoint.get("updated") || 0;
+  for (;;) {
+    let query = db.collection("rooms")
+        .orderBy(admin.firestore.FieldPath.documentId())
+        .select().limit(CLEANUP_PAGE_SIZE);
+    if (cursor) query = query.startAfter(cursor);
+    const page = await query.get();
 
-  await Promise.all(deletePromises);
-  console.log(`✅ Cleanup completed. Deleted ${deletedCount} old rooms.`);
-  return {deletedCount};
+    await forEachLimited(page.docs, CLEANUP_CONCURRENCY, async (doc) => {
+      updated += await backfillRoomAudience(doc.ref);
+    });
+    const finished = page.size < CLEANUP_PAGE_SIZE;
+    if (!page.empty) cursor = page.docs[page.size - 1].id;
+    await checkpointRef.set({
+      cursor,
+      updated,
+      finished,
+      updatedAt: admin.firestore.FieldValue.serverTimestamp()
+    });
+
+    if (finished) break;
+    if (Date.now() - startedAt > CLEANUP_TIME_BUDGET_MS) {
+      console.log(`⏸️ Audience backfill paused after room ${cursor}; ` +
+          "the next run continues.");
+      return {updated, finished: false};
+    }
+  }
+  console.log(`✅ Audience backfill completed. Updated ${updated} messages.`);
+  return {updated, finished: true};
 });
\ No newline at end of file
@@ -0,0 +1,239 @@
+import atexit
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: no rusage, so CPU time and RSS are left empty
+    resource = None
+
+# ==============================================================================
+#  Timing and profiling for fireClass scripts (build.py, deploy.py)
+#
+#  Stages and subprocesses are recorded with wall time, CPU time, peak RSS and
+#  exit status. With --profile a run writes:
+#    - <dir>/<script>-<time>.jsonl       one JSON object per stage/command
+#    - <dir>/<script>-<time>.trace.json  Chrome trace events (chrome://tracing, ui.perfetto.dev)
+#  and prints the slowest entries when it exits.
+#
+#  Usage from a script:
+#    instrumentation.add_profile_arguments(parser)
+#    instrumentation.enable_profile(args, 'build')
+#    with instrumentation.stage("Minify"):
+#        ...
+#    result = instrumentation.run(['terser', ...], capture_output=True, text=True)
+# ==============================================================================
+
+PROFILE_DIR = '.profile'
+DEFAULT_TOP = 10
+
+def max_rss_kb(usage):
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+    return usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+
+class Recorder:
+    """Collects timing events from any thread."""
+
+    def __init__(self):
+        self.events = []
+        self.start = time.perf_counter()
+        self.start_time = time.time()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._thread_ids = {}
+
+    def _thread_id(self):
+        thread = threading.current_thread()
+        with self._lock:
+            if thread.ident not in self._thread_ids:
+                self._thread_ids[thread.ident] = (len(self._thread_ids) + 1, thread.name)
+            return self._thread_ids[thread.ident][0]
+
+    def _thread_child_cpu(self):
+        """CPU seconds of the subprocesses this thread has run so far."""
+        return getattr(self._local, 'child_cpu', 0.0)
+
+    def record(self, name, category, start, wall, cpu=None, peak_rss_kb=None, exit_status=0, **args):
+        event = {
+            'name': name,
+            'category': category,
+            'start': round(start - self.start, 6),
+            'wall': round(wall, 6),
+            'cpu': None if cpu is None else round(cpu, 6),
+            'peak_rss_kb': peak_rss_kb,
+            'exit_status': exit_status,
+            'thread': self._thread_id()
+        }
+        if args:
+            event['args'] = args
+        with self._lock:
+            self.events.append(event)
+        return event
+
+    @contextmanager
+    def stage(self, name, category='stage', per_thread=False, **args):
+        """
+        Times a block. CPU time is the whole process's (plus finished subprocesses)
+        unless `per_thread`, for blocks that run on a worker thread next to others.
+        The block may set an 'exit_status' key on the yielded dict; an exception sets 1.
+        """
+        start = time.perf_counter()
+        if per_thread:
+            cpu_start = time.thread_time() + self._thread_child_cpu()
+        else:
+            cpu_start = time.process_time() + self._children_cpu()
+        span = {'exit_status': 0}
+        try:
+            yield span
+        except BaseException:
+            span['exit_status'] = 1
+            raise
+        finally:
+            wall = time.perf_counter() - start
+            if per_thread:
+                cpu = time.thread_time() + self._thread_child_cpu() - cpu_start
+            else:
+                cpu = time.process_time() + self._children_cpu() - cpu_start
+            peak = max_rss_kb(resource.getrusage(resource.RUSAGE_SELF)) if resource else None
+            self.record(name, category, start, wall, cpu, peak, span['exit_status'], **args)
+
+    @staticmethod
+    def _children_cpu():
+        if not resource:
+            return 0.0
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+
+    def run(self, command, capture_output=False, text=False, shell=False, cwd=None, check=False,
+            input=None, name=None, category='command'):
+        """
+        subprocess.run() that records the command. The child is reaped with
+        os.wait4 so its own CPU time and peak RSS are known, even while other
+        threads run commands too.
+        """
+        label = name or (command if isinstance(command, str) else ' '.join(command))
+        pipe = subprocess.PIPE if capture_output else None
+        start = time.perf_counter()
+        try:
+            process = subprocess.Popen(command, stdin=subprocess.PIPE if input is not None else None,
+                                       stdout=pipe, stderr=pipe, text=text, shell=shell, cwd=cwd)
+        except OSError as e:
+            self.record(label, category, start, time.perf_counter() - start, exit_status=None, error=str(e))
+            raise
+
+        usage = None
+        if hasattr(os, 'wait4'):
+            stdout, stderr = self._drain(process, input)
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+        else:
+            stdout, stderr = process.communicate(input)
+        wall = time.perf_counter() - start
+
+        cpu = peak = None
+        if usage:
+            cpu = usage.ru_utime + usage.ru_stime
+            peak = max_rss_kb(usage)
+            self._local.child_cpu = self._thread_child_cpu() + cpu
+        self.record(label, category, start, wall, cpu, peak, process.returncode)
+
+        result = subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+        if check:
+            result.check_returncode()
+        return result
+
+    @staticmethod
+    def _drain(process, input):
+        """Reads the pipes on threads (as communicate() does) without reaping the child."""
+        output = {}
+
+        def read(key, stream):
+            output[key] = stream.read()
+            stream.close()
+
+        readers = [threading.Thread(target=read, args=(key, stream), daemon=True)
+                   for key, stream in (('stdout', process.stdout), ('stderr', process.stderr)) if stream]
+        for reader in readers:
+            reader.start()
+        if process.stdin:
+            try:
+                process.stdin.write(input)
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+        for reader in readers:
+            reader.join()
+        return output.get('stdout'), output.get('stderr')
+
+    def write_jsonl(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for event in self.events:
+                f.write(json.dumps(event) + '\n')
+
+    def write_chrome_trace(self, path):
+        """Complete ('X') events in microseconds, one track per thread."""
+        pid = os.getpid()
+        trace = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread_name}}
+                 for tid, thread_name in self._thread_ids.values()]
+        for event in self.events:
+            args = {key: event[key] for key in ('cpu', 'peak_rss_kb', 'exit_status')}
+            args.update(event.get('args', {}))
+            trace.append({
+                'name': event['name'],
+                'cat': event['category'],
+                'ph': 'X',
+                'ts': round(event['start'] * 1e6),
+                'dur': round(event['wall'] * 1e6),
+                'pid': pid,
+                'tid': event['thread'],
+                'args': args
+            })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+    def print_summary(self, top=DEFAULT_TOP):
+        """The `top` slowest stages and commands by wall time."""
+        slowest = sorted(self.events, key=lambda event: event['wall'], reverse=True)[:top]
+        if not slowest:
+            return
+        print(f"\n⏱️  Slowest {len(slowest)} of {len(self.events)} recorded stages/commands:")
+        print(f"  {'wall':>8} {'cpu':>8} {'peak RSS':>10} {'exit':>4}  name")
+        for event in slowest:
+            cpu = f"{event['cpu']:.2f}s" if event['cpu'] is not None else '-'
+            rss = f"{event['peak_rss_kb'] / 1024:.1f} MB" if event['peak_rss_kb'] is not None else '-'
+            status = '-' if event['exit_status'] is None else event['exit_status']
+            name = event['name'] if len(event['name']) <= 70 else event['name'][:67] + '...'
+            print(f"  {event['wall']:>7.2f}s {cpu:>8} {rss:>10} {status:>4}  [{event['category']}] {name}")
+
+    def write_profile(self, directory, run_name, top=DEFAULT_TOP):
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.fromtimestamp(self.start_time).strftime('%Y%m%d-%H%M%S')
+        base = os.path.join(directory, f"{run_name}-{stamp}")
+        self.write_jsonl(base + '.jsonl')
+        self.write_chrome_trace(base + '.trace.json')
+        self.print_summary(top)
+        print(f"📈 Profile written to '{base}.jsonl' and '{base}.trace.json'")
+
+# One recorder per process, shared by everything the script imports
+RECORDER = Recorder()
+stage = RECORDER.stage
+run = RECORDER.run
+record = RECORDER.record
+
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', nargs='?', const=PROFILE_DIR, metavar='DIR',
+                        help=f"Write timings as JSON lines and a Chrome trace to DIR (default: {PROFILE_DIR}) "
+                             f"and print the slowest steps.")
+    parser.add_argument('--profile-top', type=int, default=DEFAULT_TOP, metavar='N',
+                        help=f"How many of the slowest steps to print with --profile (default: {DEFAULT_TOP}).")
+
+def enable_profile(args, run_name):
+    """Writes the profile when the script exits, however it exits, if --profile was given."""
+    if args.profile:
+        atexit.register(RECORDER.write_profile, args.profile, run_name, args.profile_top)
@@ -0,0 +1,97 @@
+/*
+ * Copyright © 2025 Meir Livneh. All Rights Reserved.
+ *
+ * This software and associated documentation files (the "Software") are proprietary and confidential.
+ * The Software is furnished under a license agreement and may be used or copied only in
+ * accordance with the terms of the agreement.
+ *
+ * Unauthorized copying of this file, via any medium, is strictly prohibited.
+ */
+
+// minify-worker.mjs - long-lived minifier used by build.py
+//
+// build.py starts this once per build and streams files to it instead of
+// starting a new terser/minify process for every file.
+//
+// Protocol (both directions): a 4-byte big-endian length followed by that many
+// bytes of UTF-8 JSON.
+//   request:  {id, kind: "js" | "css" | "html" | "ping", flags: [...], source}
+//   response: {id, ok: true, code} or {id, ok: false, error}
+
+import {minify as terserMinify} from 'terser';
+import {minify} from 'minify';
+import {mkdtemp, writeFile, rm} from 'node:fs/promises';
+import {tmpdir} from 'node:os';
+import {join} from 'node:path';
+
+let pending = Buffer.alloc(0);
+
+function send(response) {
+    const body = Buffer.from(JSON.stringify(response), 'utf8');
+    const header = Buffer.alloc(4);
+    header.writeUInt32BE(body.length, 0);
+    process.stdout.write(Buffer.concat([header, body]));
+}
+
+// Same options the terser CLI gets from build.py: -c -> compress, -m -> mangle
+async function minifyJS(source, flags) {
+    const result = await terserMinify(source, {
+        compress: flags.includes('-c'),
+        mangle: flags.includes('-m')
+    });
+    return result.code;
+}
+
+// Uses minify's in-memory API when available, otherwise goes through a temp
+// file so the result matches what the `minify` CLI produces.
+async function minifyMarkup(kind, source) {
+    if (typeof minify[kind] === 'function') {
+        return minify[kind](source);
+    }
+    const dir = await mkdtemp(join(tmpdir(), 'fireclass-minify-'));
+    try {
+        const file = join(dir, `input.${kind}`);
+        await writeFile(file, source, 'utf8');
+        return await minify(file);
+    } finally {
+        await rm(dir, {recursive: true, force: true});
+    }
+}
+
+async function handle(request) {
+    const {id, kind, flags = [], source = ''} = request;
+    try {
+        let code;
+        if (kind === 'ping') {
+            code = 'pong';
+        } else if (kind === 'js') {
+            code = await minifyJS(source, flags);
+        } else if (kind === 'css' || kind === 'html') {
+            code = await minifyMarkup(kind, source);
+        } else {
+            throw new Error(`Unknown kind: ${kind}`);
+        }
+        send({id, ok: true, code});
+    } catch (error) {
+        send({id, ok: false, error: error && error.message ? error.message : String(error)});
+    }
+}
+
+process.stdin.on('data', (chunk) => {
+    pending = Buffer.concat([pending, chunk]);
+    while (pending.length >= 4) {
+        const length = pending.readUInt32BE(0);
+        if (pending.length < 4 + length) break;
+        const frame = pending.subarray(4, 4 + length);
+        pending = pending.subarray(4 + length);
+        let request;
+        try {
+            request = JSON.parse(frame.toString('utf8'));
+        } catch (error) {
+            // No id to answer to: skip the frame and keep serving the others
+            console.error(`minify-worker: skipping malformed frame: ${error.message}`);
+            continue;
+        }
+        handle(request);
+    }
+});
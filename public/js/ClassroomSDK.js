@@ -35,6 +35,7 @@ class ClassroomSDK {
         this.chatContainer = null;
         this.chatMessages = null;
         this.chatInput = null;
+        this.chatEarlierButton = null;
         this.aiButton = null;
         this.aiContainer = null;
         this.aiMessages = null;
@@ -42,8 +43,21 @@ class ClassroomSDK {
         
         // Listeners
         this.studentsListener = null;
+        this.studentsById = new Map(); // studentId -> student data, kept by listenForStudents({ delta: true })
         this.messagesListener = null;
         this.roomListener = null;
+
+        // Messages: a live window of the newest messages, earlier ones loaded on demand
+        this.messageWindow = 50;
+        this.messagePageSize = 50;
+        this.hasOlderMessages = false;
+        this.olderMessagesCursor = null; // Oldest message loaded from rooms/{code}/messages
+        this.archiveBoundary = null; // Timestamp of that message, once the live collection is exhausted
+        this.archiveCursor = null; // Last rooms/{code}/messageArchive chunk read
+        this.archiveOldestEnd = null; // Its `to`: no unread chunk holds a message after it
+        this.archivePending = []; // Messages read from the archive and not returned yet, oldest first
+        this.archiveExhausted = false;
+        this.archiveChunksPerRead = 2;
     }
 
     // Anonymous authentication
@@ -154,14 +168,35 @@ class ClassroomSDK {
         });
     }
 
-    // Listen for students
-    listenForStudents(callback) {
+    // Listen for students.
+    // By default the callback gets the whole list on every change. With { delta: true } it gets
+    // only what changed - [{ type: 'added' | 'modified' | 'removed', id, data, oldIndex, newIndex }] -
+    // plus the studentsById map, so one student's update costs O(1) instead of O(N).
+    listenForStudents(callback, options = {}) {
         if (!this.roomCode) return;
-        
+
         const studentsCollection = this.db.collection('rooms').doc(this.roomCode)
                                          .collection('students');
-        
+        this.studentsById = new Map();
+
         this.studentsListener = studentsCollection.onSnapshot(snapshot => {
+            if (options.delta) {
+                const changes = snapshot.docChanges().map(change => {
+                    const id = change.doc.id;
+                    const data = change.doc.data();
+                    if (change.type === 'removed') {
+                        this.studentsById.delete(id);
+                    } else {
+                        this.studentsById.set(id, data);
+                    }
+                    return { type: change.type, id, data, oldIndex: change.oldIndex, newIndex: change.newIndex };
+                });
+                if (changes.length > 0 && typeof callback === 'function') {
+                    callback(changes, this.studentsById);
+                }
+                return;
+            }
+
             const students = [];
             snapshot.forEach(doc => {
                 students.push(doc.data());
@@ -176,27 +211,53 @@ class ClassroomSDK {
         });
     }
 
-    // Listen for messages
+    // Who a message is delivered to: everyone, or only the private message's recipient and sender
+    messageAudience(recipientUid = null) {
+        const senderUid = this.isTeacher ? this.auth.currentUser?.uid : this.studentId;
+        return recipientUid ? [recipientUid, senderUid] : ['all'];
+    }
+
+    // Students query only messages addressed to everyone or to them; the teacher sees everything.
+    // This is a delivery filter, not access control: the rules don't check `audience`.
+    filterByAudience(query) {
+        if (this.isTeacher) return query;
+        return query.where('audience', 'array-contains-any', ['all', this.studentId]);
+    }
+
+    // Listen for messages: the newest `messageWindow` messages, then every new one
     listenForMessages(callback) {
         if (!this.roomCode) return;
 
-        const messagesCollection = this.db.collection('rooms').doc(this.roomCode)
-                                         .collection('messages')
-                                         .orderBy('timestamp');
+        const messagesQuery = this.filterByAudience(this.db.collection('rooms').doc(this.roomCode)
+                                                           .collection('messages'))
+                                  .orderBy('timestamp')
+                                  .limitToLast(this.messageWindow);
+
+        let isFirstSnapshot = true;
+        this.hasOlderMessages = false;
+        this.olderMessagesCursor = null;
+        this.archiveBoundary = null;
+        this.archiveCursor = null;
+        this.archiveOldestEnd = null;
+        this.archivePending = [];
+        this.archiveExhausted = false;
+        this.loadedMessageIds = new Set(); // Live messages delivered so far
+
+        this.messagesListener = messagesQuery.onSnapshot(snapshot => {
+            if (isFirstSnapshot) {
+                isFirstSnapshot = false;
+                // A full window means earlier messages may exist (loadOlderMessages)
+                this.olderMessagesCursor = snapshot.docs[0] || null;
+                this.hasOlderMessages = snapshot.size >= this.messageWindow;
+                this.updateEarlierMessagesButton();
+            }
 
-        this.messagesListener = messagesCollection.onSnapshot(snapshot => {
+            // Messages pushed out of the window by new ones arrive as "removed" and stay on screen
             const newMessages = [];
             snapshot.docChanges().forEach(change => {
                 if (change.type === "added") {
-                    const msg = change.doc.data();
-                    const currentUserId = this.isTeacher ? this.auth.currentUser?.uid : this.studentId;
-                    const isPrivate = msg.is_private === true;
-                    const isRecipient = msg.recipient_uid === currentUserId;
-                    const isSender = msg.sender_uid === currentUserId;
-
-                    if (!isPrivate || this.isTeacher || isRecipient || isSender) {
-                        newMessages.push(msg);
-                    }
+                    this.loadedMessageIds.add(change.doc.id);
+                    newMessages.push(change.doc.data());
                 }
             });
 
@@ -208,6 +269,69 @@ class ClassroomSDK {
         });
     }
 
+    // The page of messages before the oldest one loaded so far, oldest first ([] when there are none).
+    // Pages come from the live collection, then from the archive written by the compactMessages function.
+    async loadOlderMessages() {
+        if (!this.roomCode || !this.hasOlderMessages) return [];
+        const roomRef = this.db.collection('rooms').doc(this.roomCode);
+
+        if (!this.archiveBoundary) {
+            const page = await this.filterByAudience(roomRef.collection('messages'))
+                                   .orderBy('timestamp')
+                                   .endBefore(this.olderMessagesCursor)
+                                   .limitToLast(this.messagePageSize)
+                                   .get();
+            if (page.size > 0) {
+                this.olderMessagesCursor = page.docs[0];
+            }
+            if (page.size < this.messagePageSize) {
+                this.archiveBoundary = this.olderMessagesCursor.get('timestamp');
+            }
+            if (page.size > 0) {
+                page.docs.forEach(doc => this.loadedMessageIds.add(doc.id));
+                return page.docs.map(doc => doc.data());
+            }
+        }
+
+        // Archive chunks hold one audience each, so chunks overlap in time. They are read newest end
+        // first, and a message is returned once no unread chunk can hold a later one.
+        const isSafe = msg => this.archiveExhausted || msg.timestamp.toMillis() > this.archiveOldestEnd.toMillis();
+        while (!this.archiveExhausted &&
+               (!this.archiveOldestEnd || this.archivePending.filter(isSafe).length < this.messagePageSize)) {
+            let archiveQuery = this.filterByAudience(roomRef.collection('messageArchive')).orderBy('to');
+            if (this.archiveCursor) {
+                archiveQuery = archiveQuery.endBefore(this.archiveCursor);
+            }
+            const chunks = await archiveQuery.limitToLast(this.archiveChunksPerRead).get();
+            this.archiveExhausted = chunks.size < this.archiveChunksPerRead;
+            if (chunks.empty) break;
+
+            // Messages still in (or already loaded from) the live collection are skipped. Timestamps
+            // can tie with the boundary, so ties are told apart by id; chunks archived before messages
+            // kept their id only take what is strictly older.
+            const boundary = this.archiveBoundary.toMillis();
+            chunks.docs.forEach(chunk => {
+                (chunk.get('messages') || []).forEach(msg => {
+                    const time = msg.timestamp.toMillis();
+                    const isOlder = msg.id ? time <= boundary && !this.loadedMessageIds.has(msg.id) : time < boundary;
+                    if (isOlder) this.archivePending.push(msg);
+                });
+            });
+            this.archivePending.sort((a, b) => a.timestamp.toMillis() - b.timestamp.toMillis());
+            this.archiveCursor = chunks.docs[0];
+            this.archiveOldestEnd = chunks.docs[0].get('to');
+        }
+
+        const safe = this.archivePending.filter(isSafe);
+        const page = safe.slice(-this.messagePageSize);
+        this.archivePending = this.archivePending.slice(0, this.archivePending.length - page.length);
+        if (this.archiveExhausted && this.archivePending.length === 0) {
+            this.hasOlderMessages = false;
+            this.updateEarlierMessagesButton();
+        }
+        return page;
+    }
+
     // Listen for room updates (commands, AI, etc.)
     listenForRoomUpdates(callback) {
         if (!this.roomCode) return;
@@ -235,7 +359,8 @@ class ClassroomSDK {
                 sender_uid: this.isTeacher ? this.auth.currentUser?.uid : this.studentId,
                 content: content,
                 timestamp: firebase.firestore.FieldValue.serverTimestamp(),
-                is_teacher: this.isTeacher
+                is_teacher: this.isTeacher,
+                audience: this.messageAudience()
             });
         } catch (error) {
             console.error('🔥 Error sending message:', error);
@@ -360,6 +485,12 @@ class ClassroomSDK {
         this.chatMessages.style.cssText = 'flex: 1; padding: 15px; overflow-y: auto; background: #f8f9fa;';
         this.chatMessages.innerHTML = '<div style="text-align: center; color: #999; font-style: italic;">No messages sent yet</div>';
         
+        this.chatEarlierButton = document.createElement('button');
+        this.chatEarlierButton.textContent = 'Load earlier messages';
+        this.chatEarlierButton.style.cssText = 'display: none; width: 100%; padding: 6px; border: none; border-bottom: 1px solid #eee; background: #f8f9fa; color: #007bff; font-size: 12px; cursor: pointer;';
+        this.chatEarlierButton.onclick = () => this.showEarlierMessages();
+        this.updateEarlierMessagesButton();
+
         const chatInputArea = document.createElement('div');
         chatInputArea.style.cssText = 'padding: 15px; border-top: 1px solid #eee; background: white;';
         
@@ -380,6 +511,7 @@ class ClassroomSDK {
         };
         
         chatInputArea.appendChild(this.chatInput);
+        chatContent.appendChild(this.chatEarlierButton);
         chatContent.appendChild(this.chatMessages);
         chatContent.appendChild(chatInputArea);
         this.chatContainer.appendChild(chatContent);
@@ -416,7 +548,26 @@ class ClassroomSDK {
         }
     }
 
-    addChatMessage(sender, content, messageObj) {
+    updateEarlierMessagesButton() {
+        if (this.chatEarlierButton) {
+            this.chatEarlierButton.style.display = this.hasOlderMessages ? 'block' : 'none';
+        }
+    }
+
+    async showEarlierMessages() {
+        this.chatEarlierButton.disabled = true;
+        try {
+            const messages = await this.loadOlderMessages();
+            // Newest first, each above the previous one, so the page ends up in order
+            messages.slice().reverse().forEach(msg => this.addChatMessage(msg.sender, msg.content, msg, { prepend: true }));
+        } catch (error) {
+            console.error('🔥 Error loading earlier messages:', error);
+        } finally {
+            this.chatEarlierButton.disabled = false;
+        }
+    }
+
+    addChatMessage(sender, content, messageObj, options = {}) {
         if (!this.chatMessages) return;
         
         const messageDiv = document.createElement('div');
@@ -439,8 +590,12 @@ class ClassroomSDK {
             this.chatMessages.innerHTML = '';
         }
         
-        this.chatMessages.appendChild(messageDiv);
-        this.chatMessages.scrollTop = this.chatMessages.scrollHeight;
+        if (options.prepend) {
+            this.chatMessages.insertBefore(messageDiv, this.chatMessages.firstChild);
+        } else {
+            this.chatMessages.appendChild(messageDiv);
+            this.chatMessages.scrollTop = this.chatMessages.scrollHeight;
+        }
     }
 
     // ========== AI INTERFACE ==========
@@ -649,7 +804,8 @@ class ClassroomSDK {
                 content: content,
                 timestamp: firebase.firestore.FieldValue.serverTimestamp(),
                 is_teacher: this.isTeacher,
-                is_private: true
+                is_private: true,
+                audience: this.messageAudience(recipientUid)
             });
         } catch (error) {
             console.error('🔥 Error sending private message:', error);
@@ -723,7 +879,8 @@ class ClassroomSDK {
         console.log("✅ Poll stopped successfully");
     }
 
-    async submitPollAnswer(answer) {
+    // options.responseStore: the poll's responseStore, so sharded polls skip the room transaction
+    async submitPollAnswer(answer, options = {}) {
         if (!this.functions) {
             console.error("Firebase Functions is not initialized.");
             return;
@@ -734,7 +891,8 @@ class ClassroomSDK {
                 roomCode: this.roomCode,
                 studentId: this.studentId,
                 playerName: this.playerName,
-                answer: answer
+                answer: answer,
+                responseStore: options.responseStore || 'room'
             });
             console.log("✅ Poll answer successfully sent via Cloud Function.");
         } catch (error) {
@@ -742,6 +900,15 @@ class ClassroomSDK {
         }
     }
 
+    // Sharded polls: merges the pollShards documents into the room's currentPoll (teacher only).
+    // `final` is for a closing poll: the per-student responses are merged too, for questionHistory.
+    async aggregatePollResponses(reset = false, final = false) {
+        if (!this.isTeacher || !this.functions) return null;
+        const aggregateFunction = this.functions.httpsCallable('aggregatePollResponses');
+        const result = await aggregateFunction({ roomCode: this.roomCode, reset: reset, final: final });
+        return result.data;
+    }
+
     listenForPollUpdates(callback) {
         this.roomListener_Polls = this.db.collection('rooms').doc(this.roomCode)
             .onSnapshot(doc => {
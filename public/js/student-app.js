@@ -151,7 +151,7 @@ const App = {
                 const submitBtn = event.currentTarget;
 
                 if (answer) {
-                    this.classroom.submitPollAnswer(answer);
+                    this.classroom.submitPollAnswer(answer, { responseStore: pollData.responseStore });
                     answerInput.value = '';
                     submitBtn.textContent = '✅ Answer Sent!';
                     submitBtn.disabled = true;
@@ -174,7 +174,7 @@ const App = {
                 button.textContent = labels[i-1];
                 button.style.cssText = 'flex-grow: 1; padding: 12px; border: 1px solid #ccc; background: #f0f0f0; border-radius: 6px; cursor: pointer;';
                 button.onclick = () => {
-                    this.classroom.submitPollAnswer(i);
+                    this.classroom.submitPollAnswer(i, { responseStore: pollData.responseStore });
                     pollContentArea.innerHTML = '<p style="text-align:center; font-weight: bold; color: #28a745;">Thank you for your answer!</p>';
                 };
                 buttonsWrapper.appendChild(button);
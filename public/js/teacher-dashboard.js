@@ -13,7 +13,8 @@ class TeacherDashboard {
     constructor() {
         console.log('🟢 TRACE: TeacherDashboard constructor called');
         this.sdk = null;
-        this.students = [];
+        this.studentsById = new Map(); // studentId -> student data
+        this.studentElements = new Map(); // studentId -> .student-item element in #studentsList
         this.activities = [];
         this.isAiActive = false; // Track AI status
         this.isAiActiveForStudents = false; // Add new variable for tracking
@@ -22,6 +23,13 @@ class TeacherDashboard {
         this.config = {}; // 🎯 Change here
         this.debugMode = false;
         this.currentQuestionResponses = {}; // Stores { studentName: [answers] }
+        // 'room' keeps answers on the room document; 'shards' spreads them over
+        // pollShards documents that are merged back every pollAggregationInterval ms.
+        // config.json's pollResponseStore overrides it.
+        this.pollResponseStore = 'shards';
+        this.pollAggregationInterval = 2000;
+        this.pollAggregationTimer = null;
+        this.currentPoll = null; // settings.currentPoll from the latest room snapshot
         
         // 🔧 English locale fix - set locale
         this.locale = 'en-US';
@@ -81,17 +89,31 @@ class TeacherDashboard {
             this.initializeTeacherAI();
             
             // המשך כרגיל...
-            this.sdk.listenForStudents(this.updateStudentsList.bind(this));
+            this.sdk.listenForStudents(this.applyStudentChanges.bind(this), { delta: true });
             this.sdk.listenForMessages((messages) => {
                 if (messages && messages.length > 0) {
                     this.addMessage(messages);
                 }
+                this.updateLoadEarlierButton();
             });
+            const loadEarlierButton = document.getElementById('loadEarlierMessagesBtn');
+            if (loadEarlierButton) {
+                loadEarlierButton.onclick = () => this.loadEarlierMessages();
+            }
             this.sdk.listenForRoomUpdates((roomData) => {
                 if (!roomData || !roomData.settings) return;
 
-                if (roomData.settings.currentPoll) {
-                    this.displayPollResults(roomData.settings.currentPoll);
+                this.currentPoll = roomData.settings.currentPoll || null;
+                if (this.currentPoll) {
+                    // Sharded answers are only merged while a timer runs: start one for an
+                    // open poll this tab didn't start, and stop it once the poll is closed
+                    const aggregating = this.isShardedPoll(this.currentPoll) && this.currentPoll.isActive;
+                    if (aggregating && !this.pollAggregationTimer) {
+                        this.startPollAggregation();
+                    } else if (!aggregating && this.pollAggregationTimer) {
+                        this.stopPollAggregation();
+                    }
+                    this.displayPollResults(this.currentPoll);
                 }
 
                 const aiIsActiveInDB = roomData.settings.ai_active === true;
@@ -528,45 +550,98 @@ class TeacherDashboard {
         activitiesArea.scrollTop = activitiesArea.scrollHeight;
     }
 
+    // Full re-render from the whole student list (listenForStudents without { delta: true })
     updateStudentsList(studentsData) {
-        this.students = studentsData;
+        this.studentsById = new Map(studentsData.map(student => [student.uid, student]));
         const studentsListDiv = document.getElementById('studentsList');
         const studentsCountSpan = document.getElementById('studentsCount');
         if (!studentsListDiv || !studentsCountSpan) return;
 
         // Clear existing list
         studentsListDiv.innerHTML = '';
-        studentsCountSpan.textContent = this.students.length;
+        this.studentElements.clear();
+        studentsCountSpan.textContent = studentsData.length;
 
-        if (this.students.length === 0) {
+        if (studentsData.length === 0) {
             studentsListDiv.innerHTML = '<div class="no-students">No students connected currently</div>';
             return;
         }
-        
-        const template = document.getElementById('studentTemplate');
-        
+
         // Process ALL students in the array
-        this.students.forEach(student => {
-            const studentName = student.name || 'Unknown Student';
-            const studentElement = document.importNode(template.content, true);
-            
-            const nameSpan = studentElement.querySelector('.student-name');
-            if(nameSpan) nameSpan.textContent = studentName;
-
-            const actionsDiv = studentElement.querySelector('.student-actions');
-            if (actionsDiv) {
-                const privateMsgBtn = document.createElement('button');
-                privateMsgBtn.textContent = 'Private Message';
-                privateMsgBtn.className = 'private-message-btn';
-                privateMsgBtn.onclick = () => this.openPrivateMessageModal(student);
-                actionsDiv.appendChild(privateMsgBtn);
-            }
-            
+        studentsData.forEach(student => {
+            const studentElement = this.createStudentElement(student.uid);
+            this.studentElements.set(student.uid, studentElement);
             studentsListDiv.appendChild(studentElement);
         });
-        
-        this.addActivity(`Student list updated. ${this.students.length} students connected.`);
-        console.log(`✅ Updated student list: ${this.students.length} students displayed`);
+
+        this.addActivity(`Student list updated. ${studentsData.length} students connected.`);
+        console.log(`✅ Updated student list: ${studentsData.length} students displayed`);
+    }
+
+    // Incremental update from listenForStudents({ delta: true }): only the changed rows are touched
+    applyStudentChanges(changes, studentsById) {
+        const wasEmpty = this.studentElements.size === 0;
+        this.studentsById = studentsById;
+        const studentsListDiv = document.getElementById('studentsList');
+        const studentsCountSpan = document.getElementById('studentsCount');
+        if (!studentsListDiv || !studentsCountSpan) return;
+
+        if (wasEmpty && studentsById.size > 0) {
+            studentsListDiv.innerHTML = ''; // Drop the "no students" placeholder
+        }
+
+        let joined = 0;
+        let left = 0;
+        // Changes come in Firestore's order, so each index is valid once the previous change is applied
+        changes.forEach(change => {
+            let element = this.studentElements.get(change.id);
+            if (change.type === 'removed') {
+                if (element) element.remove();
+                this.studentElements.delete(change.id);
+                left++;
+                return;
+            }
+            if (!element) {
+                element = this.createStudentElement(change.id);
+                this.studentElements.set(change.id, element);
+                joined++;
+            } else {
+                const nameSpan = element.querySelector('.student-name');
+                if (nameSpan) nameSpan.textContent = change.data.name || 'Unknown Student';
+                if (change.oldIndex === change.newIndex) return;
+                // Out of the list first, so newIndex counts the same children in both directions
+                element.remove();
+            }
+            studentsListDiv.insertBefore(element, studentsListDiv.children[change.newIndex] || null);
+        });
+
+        studentsCountSpan.textContent = studentsById.size;
+        if (studentsById.size === 0) {
+            studentsListDiv.innerHTML = '<div class="no-students">No students connected currently</div>';
+        }
+        if (joined || left) {
+            this.addActivity(`${joined} joined, ${left} left. ${studentsById.size} students connected.`);
+        }
+    }
+
+    createStudentElement(studentId) {
+        const student = this.studentsById.get(studentId);
+        const template = document.getElementById('studentTemplate');
+        const studentElement = document.importNode(template.content, true).firstElementChild;
+
+        const nameSpan = studentElement.querySelector('.student-name');
+        if (nameSpan) nameSpan.textContent = student.name || 'Unknown Student';
+
+        const actionsDiv = studentElement.querySelector('.student-actions');
+        if (actionsDiv) {
+            const privateMsgBtn = document.createElement('button');
+            privateMsgBtn.textContent = 'Private Message';
+            privateMsgBtn.className = 'private-message-btn';
+            // Looked up on click, so the modal gets the student's latest data
+            privateMsgBtn.onclick = () => this.openPrivateMessageModal(this.studentsById.get(studentId) || student);
+            actionsDiv.appendChild(privateMsgBtn);
+        }
+        return studentElement;
     }
 
     // 🔧 Fix #1: undefined messages - complete and fixed function
@@ -581,7 +656,30 @@ class TeacherDashboard {
         this.addSingleMessage(messages);
     }
 
-    addSingleMessage(message) {
+    // The SDK keeps only the newest messages live; earlier ones are loaded a page at a time
+    async loadEarlierMessages() {
+        const button = document.getElementById('loadEarlierMessagesBtn');
+        if (button) button.disabled = true;
+        try {
+            const messages = await this.sdk.loadOlderMessages();
+            // Newest first, each above the previous one, so the page ends up in order
+            messages.slice().reverse().forEach(message => this.addSingleMessage(message, { prepend: true }));
+        } catch (error) {
+            console.error('❌ Error loading earlier messages:', error);
+        } finally {
+            if (button) button.disabled = false;
+            this.updateLoadEarlierButton();
+        }
+    }
+
+    updateLoadEarlierButton() {
+        const button = document.getElementById('loadEarlierMessagesBtn');
+        if (button) {
+            button.style.display = this.sdk && this.sdk.hasOlderMessages ? 'block' : 'none';
+        }
+    }
+
+    addSingleMessage(message, options = {}) {
         const messagesArea = document.getElementById('messagesArea');
         const messagesCountSpan = document.getElementById('messagesCount');
         if (!messagesArea) return;
@@ -653,8 +751,12 @@ class TeacherDashboard {
             messageDiv.style.background = '#fff9c4';
         }
 
-        messagesArea.appendChild(messageDiv);
-        messagesArea.scrollTop = messagesArea.scrollHeight;
+        if (options.prepend) {
+            messagesArea.insertBefore(messageDiv, messagesArea.firstChild);
+        } else {
+            messagesArea.appendChild(messageDiv);
+            messagesArea.scrollTop = messagesArea.scrollHeight;
+        }
 
         console.log(`✅ Message added: ${content.substring(0, 30)}...`);
     }
@@ -963,6 +1065,7 @@ class TeacherDashboard {
 
         try {
             // שלב 1: בדיקה וארכוב של הסקר הפעיל הקודם (אם קיים)
+            await this.finishPollAggregation();
             const roomRef = this.sdk.db.collection('rooms').doc(this.sdk.roomCode);
             const roomDoc = await roomRef.get();
             const existingPoll = roomDoc.data()?.settings?.currentPoll;
@@ -987,6 +1090,7 @@ class TeacherDashboard {
                 options: pollOptions[pollType],
                 isActive: true,
                 createdAt: firebase.firestore.FieldValue.serverTimestamp(),
+                responseStore: this.config.pollResponseStore || this.pollResponseStore,
                 responses: {} // התחלה עם מאגר נקי
             };
 
@@ -994,6 +1098,9 @@ class TeacherDashboard {
             await roomRef.update({
                 'settings.currentPoll': newPoll
             });
+            if (newPoll.responseStore === 'shards') {
+                this.startPollAggregation();
+            }
 
             // שלב 4: עדכון ממשק המשתמש בהתאם לסוג הסקר החדש
             if (pollType === 'open_text') {
@@ -1014,13 +1121,47 @@ class TeacherDashboard {
         }
     }
 
-    stopPoll() {
+    async stopPoll() {
         this.debugLog("📊 Stopping poll");
+        await this.finishPollAggregation();
         this.sdk.stopPoll();
         document.getElementById('poll-section').style.display = 'none';
         this.addActivity(`⏹️ Poll ended`);
     }
 
+    // Sharded polls: pull the answers from the shards into the room document periodically
+    startPollAggregation() {
+        this.stopPollAggregation();
+        this.pollAggregationTimer = setInterval(() => {
+            this.sdk.aggregatePollResponses().catch(error => {
+                console.error("🔥 Error aggregating poll responses:", error);
+            });
+        }, this.pollAggregationInterval);
+    }
+
+    stopPollAggregation() {
+        if (this.pollAggregationTimer) {
+            clearInterval(this.pollAggregationTimer);
+            this.pollAggregationTimer = null;
+        }
+    }
+
+    isShardedPoll(poll) {
+        return poll?.responseStore === 'shards';
+    }
+
+    // Stops the timer and runs one last aggregation, so nothing answered is left out and the
+    // per-student answers reach questionHistory. Decided by the poll, not by this tab's timer.
+    async finishPollAggregation() {
+        this.stopPollAggregation();
+        if (!this.isShardedPoll(this.currentPoll)) return;
+        try {
+            await this.sdk.aggregatePollResponses(false, true);
+        } catch (error) {
+            console.error("🔥 Error aggregating poll responses:", error);
+        }
+    }
+
     displayPollResults(pollData) {
         // Handle Open Text Polls
         if (pollData && pollData.type === 'open_text' && pollData.isActive) {
@@ -1056,18 +1197,20 @@ class TeacherDashboard {
             container.innerHTML = '';
 
             const responses = pollData.responses || {};
-            const totalVotes = Object.keys(responses).length;
             const voteCounts = {};
 
-            // Count votes for each option
+            // Count votes for each option (sharded polls arrive already tallied)
             for (let i = 1; i <= pollData.options; i++) {
-                voteCounts[i] = 0;
+                voteCounts[i] = (pollData.tallies && pollData.tallies[i]) || 0;
             }
-            Object.values(responses).forEach(vote => {
-                if (voteCounts[vote] !== undefined) {
-                    voteCounts[vote]++;
-                }
-            });
+            if (!pollData.tallies) {
+                Object.values(responses).forEach(vote => {
+                    if (voteCounts[vote] !== undefined) {
+                        voteCounts[vote]++;
+                    }
+                });
+            }
+            const totalVotes = pollData.tallies ? (pollData.responseCount || 0) : Object.keys(responses).length;
 
             // Display results
             for (let i = 1; i <= pollData.options; i++) {
@@ -1124,8 +1267,12 @@ class TeacherDashboard {
 
         // 5. Reset responses in Firestore for a new round
         try {
-            const roomRef = this.sdk.db.collection('rooms').doc(this.sdk.getRoomCode());
-            await roomRef.update({ 'settings.currentPoll.responses': {} });
+            if (this.isShardedPoll(this.currentPoll)) {
+                await this.sdk.aggregatePollResponses(true);
+            } else {
+                const roomRef = this.sdk.db.collection('rooms').doc(this.sdk.getRoomCode());
+                await roomRef.update({ 'settings.currentPoll.responses': {} });
+            }
             this.addActivity(`🔄 Response repository in Firestore reset and ready for next round.`);
         } catch (error) {
             console.error("Error resetting poll responses:", error);
@@ -1212,6 +1359,7 @@ class TeacherDashboard {
     async closeOpenEndedQuestion() {
         if (!this.sdk) return;
         try {
+            await this.finishPollAggregation();
             const roomRef = this.sdk.db.collection('rooms').doc(this.sdk.getRoomCode());
             const roomDoc = await roomRef.get();
             const currentPoll = roomDoc.data()?.settings?.currentPoll;
@@ -1294,7 +1442,7 @@ function exportData() {
     if (!window.teacherDashboard) return;
     
     const data = {
-        students: window.teacherDashboard.students,
+        students: Array.from(window.teacherDashboard.studentsById.values()),
         activities: window.teacherDashboard.activities,
         timestamp: new Date().toISOString(),
         roomCode: window.teacherDashboard.sdk?.getRoomCode()
@@ -1409,7 +1557,7 @@ function debugClassroom() {
     
     const debug = {
         'Room': window.teacherDashboard.sdk?.getRoomCode(),
-        'Students': window.teacherDashboard.students.length,
+        'Students': window.teacherDashboard.studentsById.size,
         'AI Active': window.teacherDashboard.isAiActive,
         'AI Model': window.teacherDashboard.currentAiModel,
         'SDK Connected': !!window.teacherDashboard.sdk,
@@ -0,0 +1,60 @@
+// Node side of tools/ai_cache_benchmark.py (run that instead).
+//
+// Sends a schedule of prompts to a fake provider, either straight through (as
+// the AI functions did) or through functions/aiCache.js, and reports each
+// request's latency and whether it was a miss, a hit or coalesced.
+//
+// stdin:  {"providerUrl": ..., "cache": true, "ttlMs": ..., "requests": [{"at": ms, "model": ..., "prompt": ...}]}
+// stdout: {"results": [[latencyMs, source], ...], "stats": {...} | null}
+
+const fs = require("fs");
+const http = require("http");
+const path = require("path");
+
+const {AiResponseCache} = require(path.join(__dirname, "..", "functions", "aiCache.js"));
+
+// Same request and response shape as callChatGPT in functions/index.js
+function callProvider(providerUrl, model, prompt) {
+  const requestBody = JSON.stringify({model, messages: [{role: "user", content: prompt}], max_tokens: 1000});
+  return new Promise((resolve, reject) => {
+    const req = http.request(providerUrl, {method: "POST", headers: {"Content-Type": "application/json"}}, (res) => {
+      let responseBody = "";
+      res.on("data", (chunk) => responseBody += chunk);
+      res.on("end", () => {
+        try {
+          const text = JSON.parse(responseBody).choices[0].message.content;
+          resolve({text, modelName: model});
+        } catch (e) {
+          reject(new Error(`Bad provider response: ${responseBody.slice(0, 200)}`));
+        }
+      });
+    });
+    req.on("error", reject);
+    req.write(requestBody);
+    req.end();
+  });
+}
+
+async function main() {
+  const input = JSON.parse(fs.readFileSync(0, "utf8"));
+  const cache = input.cache ? new AiResponseCache({ttlMs: input.ttlMs}) : null;
+  const start = performance.now();
+
+  const results = await Promise.all(input.requests.map((request) => new Promise((resolve) => {
+    setTimeout(async () => {
+      const sent = performance.now();
+      const fetcher = () => callProvider(input.providerUrl, request.model, request.prompt);
+      try {
+        const source = cache ? (await cache.get(request.model, request.prompt, fetcher)).source :
+          (await fetcher(), "miss");
+        resolve([performance.now() - sent, source]);
+      } catch (error) {
+        resolve([performance.now() - sent, "error"]);
+      }
+    }, Math.max(0, request.at - (performance.now() - start)));
+  })));
+
+  process.stdout.write(JSON.stringify({results, stats: cache ? cache.stats() : null}));
+}
+
+main();
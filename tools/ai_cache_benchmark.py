@@ -0,0 +1,182 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from load_test import percentile
+
+# ==============================================================================
+#  Benchmark: AI response cache and request coalescing
+#
+#  Starts a local fake AI provider (fixed latency, counts every call) and
+#  replays a class asking the same few prompts - every student at almost the
+#  same moment, over several rounds - through functions/aiCache.js under node,
+#  once without the cache (every prompt goes upstream, as before) and once
+#  with it. Students' copies of a prompt differ in spacing, as typed.
+#
+#  Reported: upstream calls, p50/p95/max latency, hits, coalesced and misses.
+#
+#  Usage:
+#    python tools/ai_cache_benchmark.py
+#    python tools/ai_cache_benchmark.py --students 100 --prompts 5 --latency 2
+# ==============================================================================
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+DRIVER = os.path.join(TOOLS_DIR, 'ai_cache_benchmark.js')
+PROMPTS = [
+    "Summarize the class's answers to the poll",
+    "Explain photosynthesis in two sentences",
+    "What is the difference between a virus and a bacterium?",
+    "Give me three practice questions about fractions",
+    "Translate 'good morning' to French",
+    "Why is the sky blue?",
+    "What caused the First World War?",
+    "How do I solve 2x + 3 = 11?",
+]
+MODELS = ['chatgpt', 'claude', 'gemini']
+
+class FakeProvider:
+    """An OpenAI-style chat completions endpoint that sleeps `latency` seconds per call."""
+
+    def __init__(self, latency, jitter):
+        self.calls = 0
+        self._lock = threading.Lock()
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def read_body(self):
+                if self.headers.get('Transfer-Encoding', '').lower() != 'chunked':
+                    return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                # Node sends the functions' request bodies chunked
+                body = b''
+                while True:
+                    size = int(self.rfile.readline().split(b';')[0], 16)
+                    if size == 0:
+                        self.rfile.readline()
+                        return body
+                    body += self.rfile.read(size)
+                    self.rfile.readline()
+
+            def do_POST(self):
+                body = json.loads(self.read_body())
+                with provider._lock:
+                    provider.calls += 1
+                time.sleep(max(0.0, latency * (1 + random.uniform(-jitter, jitter))))
+                prompt = body['messages'][0]['content']
+                response = json.dumps({'choices': [{'message': {'content': f"Answer to: {prompt}"}}]}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/chat/completions"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+def typed(prompt, rng):
+    """The prompt as one student might type it."""
+    variants = [prompt, prompt + ' ', '  ' + prompt, prompt.replace(' ', '  ', 1), prompt.replace(' ', '\t', 1)]
+    return rng.choice(variants)
+
+def schedule(students, prompts, rounds, round_interval, spread, model, seed=0):
+    """Each round every student sends one of `prompts` prompts within `spread` seconds."""
+    rng = random.Random(seed)
+    requests = []
+    for round_number in range(rounds):
+        for _ in range(students):
+            requests.append({
+                'at': (round_number * round_interval + rng.uniform(0, spread)) * 1000,
+                'model': model,
+                'prompt': typed(PROMPTS[rng.randrange(prompts)], rng)
+            })
+    return requests
+
+def run(node, provider, requests, cache, ttl):
+    calls_before = provider.calls
+    payload = {'providerUrl': provider.url, 'cache': cache, 'ttlMs': ttl * 1000, 'requests': requests}
+    result = subprocess.run([node, DRIVER], input=json.dumps(payload), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark driver failed:\n{result.stderr.strip()}")
+    output = json.loads(result.stdout)
+    latencies = sorted(latency for latency, source in output['results'] if source != 'error')
+    sources = {}
+    for _, source in output['results']:
+        sources[source] = sources.get(source, 0) + 1
+    return {
+        'cache': cache,
+        'requests': len(requests),
+        'upstream_calls': provider.calls - calls_before,
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'max_ms': latencies[-1] if latencies else 0.0,
+        'sources': sources,
+        'stats': output['stats']
+    }
+
+def print_table(results):
+    print("\n" + "="*92)
+    print(f"  {'cache':<6} {'requests':>8} {'upstream':>9} {'p50':>9} {'p95':>9} {'max':>9} "
+          f"{'hits':>6} {'coalesced':>10} {'misses':>7} {'errors':>7}")
+    for result in results:
+        sources = result['sources']
+        print(f"  {'on' if result['cache'] else 'off':<6} {result['requests']:>8} {result['upstream_calls']:>9} "
+              f"{result['p50_ms']:>7.0f}ms {result['p95_ms']:>7.0f}ms {result['max_ms']:>7.0f}ms "
+              f"{sources.get('hit', 0):>6} {sources.get('coalesced', 0):>10} {sources.get('miss', 0):>7} "
+              f"{sources.get('error', 0):>7}")
+    print("="*92)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the AI response cache against a local fake provider.")
+    parser.add_argument('--students', type=int, default=30, help="Students asking each round (default: 30).")
+    parser.add_argument('--prompts', type=int, default=3, choices=range(1, len(PROMPTS) + 1), metavar='N',
+                        help=f"Distinct prompts the class asks, 1-{len(PROMPTS)} (default: 3).")
+    parser.add_argument('--rounds', type=int, default=3, help="Rounds of questions (default: 3).")
+    parser.add_argument('--round-interval', type=float, default=2.0, help="Seconds between rounds (default: 2).")
+    parser.add_argument('--spread', type=float, default=0.3,
+                        help="Seconds over which a round's prompts arrive (default: 0.3).")
+    parser.add_argument('--latency', type=float, default=1.0, help="Provider latency in seconds (default: 1).")
+    parser.add_argument('--jitter', type=float, default=0.2, help="Provider latency jitter, as a fraction (default: 0.2).")
+    parser.add_argument('--ttl', type=float, default=600, help="Cache TTL in seconds (default: 600, as deployed).")
+    parser.add_argument('--model', choices=MODELS, default='chatgpt')
+    parser.add_argument('--json', metavar='FILE', help="Also write the results to FILE as JSON.")
+    args = parser.parse_args()
+
+    node = shutil.which('node')
+    if not node:
+        print("❌ node was not found on PATH; the benchmark runs functions/aiCache.js under Node.js.")
+        sys.exit(1)
+
+    provider = FakeProvider(args.latency, args.jitter)
+    requests = schedule(args.students, args.prompts, args.rounds, args.round_interval, args.spread, args.model)
+    results = []
+    try:
+        for cache in (False, True):
+            print(f"--- {len(requests)} requests, cache {'on' if cache else 'off'}... ---")
+            results.append(run(node, provider, requests, cache, args.ttl))
+    finally:
+        provider.close()
+    print_table(results)
+    if results[-1]['stats']:
+        print(f"  Cache counters: {json.dumps(results[-1]['stats'])}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"📈 Results written to '{args.json}'")
+
+if __name__ == "__main__":
+    main()
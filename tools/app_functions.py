@@ -0,0 +1,364 @@
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import firestore_standin
+
+# ==============================================================================
+#  Python ports of the Cloud Functions in functions/index.js
+#
+#  The same reads and writes as the Node functions, run against
+#  firestore_standin so the load and benchmark tools can exercise them without
+#  the emulators. Keep these in step with functions/index.js.
+#
+#  Usage:
+#    import app_functions
+#    attempts = app_functions.submit_poll_answer(db, '1234', student_id, 'Dana', 'A')
+#    app_functions.aggregate_poll_responses(db, '1234')
+#    app_functions.cleanup_old_classrooms(db)
+#    app_functions.compact_room_messages(db, '1234')
+# ==============================================================================
+
+# POLL_RESPONSE_SHARDS in functions/index.js
+POLL_RESPONSE_SHARDS = 10
+
+# The CLEANUP_* constants in functions/index.js
+CLEANUP_MAX_AGE_DAYS = 7
+CLEANUP_PAGE_SIZE = 100
+CLEANUP_BATCH_SIZE = 400
+CLEANUP_CONCURRENCY = 4
+CLEANUP_TIME_BUDGET = 480
+CLEANUP_CHECKPOINT = 'maintenance/cleanupOldClassrooms'
+
+# The MESSAGE_* constants in functions/index.js
+MESSAGE_LIVE_KEEP = 200
+MESSAGE_COMPACT_THRESHOLD = 300
+MESSAGE_ARCHIVE_CHUNK = 100
+MESSAGE_ARCHIVE_MAX_BYTES = 512 * 1024
+
+def shard_for(key):
+    """pollShardFor() in functions/index.js: FNV-1a over the UTF-16 code units."""
+    units = key.encode('utf-16-le')
+    hash_value = 0x811c9dc5
+    for index in range(0, len(units), 2):
+        hash_value ^= units[index] | units[index + 1] << 8
+        hash_value = (hash_value * 0x01000193) & 0xffffffff
+    return hash_value % POLL_RESPONSE_SHARDS
+
+def sanitize_player_name(player_name):
+    return re.sub(r'[.#$\[\]]', '_', player_name)
+
+def submit_poll_answer(db, room_code, student_id, player_name, answer, response_store='room'):
+    """submitPollAnswer: returns the number of attempts it took."""
+    room_ref = db.collection('rooms').document(room_code)
+
+    if response_store == 'shards':
+        room = room_ref.get()
+        if not room.exists:
+            raise firestore_standin.NotFound(f"Room {room_code} does not exist.")
+        if not room.get('settings'):
+            raise firestore_standin.FailedPrecondition(f"Room {room_code} has no settings.")
+        active_poll = room.get('settings.currentPoll')
+        if not active_poll or not active_poll.get('isActive'):
+            return 1
+        if active_poll.get('responseStore') == 'shards':
+            is_open_text = active_poll.get('type') == 'open_text'
+            key = sanitize_player_name(player_name) if is_open_text else student_id
+            value = firestore_standin.ArrayUnion([answer]) if is_open_text else answer
+            room_ref.collection('pollShards').document(f"{active_poll['id']}_{shard_for(key)}").set({
+                'pollId': active_poll['id'],
+                'responses': {key: value},
+                'answeredAt': {key: firestore_standin.SERVER_TIMESTAMP},
+                'updatedAt': firestore_standin.SERVER_TIMESTAMP
+            }, merge=True)
+            return 1
+
+    attempts = 0
+
+    def update(transaction):
+        nonlocal attempts
+        attempts += 1
+        room = transaction.get(room_ref)
+        if not room.exists:
+            raise firestore_standin.NotFound(f"Room {room_code} does not exist.")
+        if not room.get('settings'):
+            raise firestore_standin.FailedPrecondition(f"Room {room_code} has no settings.")
+        current_poll = room.get('settings.currentPoll')
+        if not current_poll or not current_poll.get('isActive'):
+            return
+        update_data = {'settings.last_poll_activity': firestore_standin.SERVER_TIMESTAMP}
+        key = student_id
+        if current_poll.get('type') == 'open_text':
+            key = sanitize_player_name(player_name)
+            update_data[f"settings.currentPoll.responses.{key}"] = firestore_standin.ArrayUnion([answer])
+        else:
+            update_data[f"settings.currentPoll.responses.{key}"] = answer
+        update_data[f"settings.currentPoll.answeredAt.{key}"] = firestore_standin.SERVER_TIMESTAMP
+        transaction.update(room_ref, update_data)
+
+    db.run_transaction(update)
+    return attempts
+
+def aggregate_poll_responses(db, room_code, reset=False, final=False):
+    """aggregatePollResponses (the auth checks are left out): returns the function's result."""
+    room_ref = db.collection('rooms').document(room_code)
+    room = room_ref.get()
+    if not room.exists:
+        raise firestore_standin.NotFound(f"Room {room_code} does not exist.")
+    if not room.get('settings'):
+        raise firestore_standin.FailedPrecondition(f"Room {room_code} has no settings.")
+    current_poll = room.get('settings.currentPoll')
+    if not current_poll or current_poll.get('responseStore') != 'shards':
+        return {'aggregated': False}
+
+    shards = room_ref.collection('pollShards').where('pollId', '==', current_poll['id']).get()
+
+    if reset:
+        batch = db.batch()
+        for doc in shards:
+            batch.delete(doc.reference)
+        batch.update(room_ref, {
+            'settings.currentPoll.responses': {},
+            'settings.currentPoll.tallies': {},
+            'settings.currentPoll.responseCount': 0,
+            'settings.currentPoll.aggregatedAt': firestore_standin.SERVER_TIMESTAMP,
+            'settings.currentPoll.aggregatedThrough': firestore_standin.DELETE_FIELD
+        })
+        batch.commit()
+        return {'aggregated': True, 'responseCount': 0}
+
+    # The newest shard write read so far; a shard written during this run is newer
+    last_aggregated = current_poll.get('aggregatedThrough') or 0
+    aggregated_through = max([last_aggregated] + [doc.get('updatedAt') or 0 for doc in shards])
+    changed = any(not doc.get('updatedAt') or doc.get('updatedAt') > last_aggregated for doc in shards)
+    if not changed and not final:
+        return {'aggregated': False, 'responseCount': current_poll.get('responseCount') or 0}
+
+    responses, answered_at = {}, {}
+    for doc in shards:
+        responses.update(doc.get('responses') or {})
+        answered_at.update(doc.get('answeredAt') or {})
+    tallies = {}
+    for value in responses.values():
+        if not isinstance(value, list):
+            tallies[value] = tallies.get(value, 0) + 1
+
+    update_data = {
+        'settings.currentPoll.tallies': tallies,
+        'settings.currentPoll.responseCount': len(responses),
+        'settings.currentPoll.aggregatedAt': firestore_standin.SERVER_TIMESTAMP,
+        'settings.currentPoll.aggregatedThrough': aggregated_through
+    }
+    if current_poll.get('type') == 'open_text' or final:
+        update_data['settings.currentPoll.responses'] = responses
+    if final:
+        update_data['settings.currentPoll.answeredAt'] = answered_at
+    room_ref.update(update_data)
+    return {'aggregated': True, 'responseCount': len(responses)}
+
+class BatchDeleter:
+    """BatchDeleter: deletes in batches, at most CLEANUP_CONCURRENCY of them committing at once."""
+
+    def __init__(self, db):
+        self.db = db
+        self.refs = []
+        self.deleted = 0
+        self.error = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(CLEANUP_CONCURRENCY)
+        self._executor = ThreadPoolExecutor(max_workers=CLEANUP_CONCURRENCY)
+
+    def delete(self, reference):
+        with self._lock:
+            self.refs.append(reference)
+            full = len(self.refs) >= CLEANUP_BATCH_SIZE
+        if full:
+            self.flush()
+
+    def flush(self, partial=False):
+        self._slots.acquire()
+        with self._lock:
+            error = self.error
+            refs = []
+            if not error and self.refs and (partial or len(self.refs) >= CLEANUP_BATCH_SIZE):
+                refs = self.refs[:CLEANUP_BATCH_SIZE]
+                del self.refs[:CLEANUP_BATCH_SIZE]
+        if not refs:
+            self._slots.release()
+            if error:
+                raise error
+            return
+        self._executor.submit(self._commit, refs)
+
+    def _commit(self, refs):
+        try:
+            batch = self.db.batch()
+            for reference in refs:
+                batch.delete(reference)
+            batch.commit()
+            with self._lock:
+                self.deleted += len(refs)
+        except Exception as e:
+            with self._lock:
+                self.error = self.error or e
+        finally:
+            self._slots.release()
+
+    def drain(self):
+        while self.refs and not self.error:
+            self.flush(partial=True)
+        # Holding every slot means no batch is still committing
+        for _ in range(CLEANUP_CONCURRENCY):
+            self._slots.acquire()
+        for _ in range(CLEANUP_CONCURRENCY):
+            self._slots.release()
+        if self.error:
+            raise self.error
+
+    def close(self):
+        self._executor.shutdown()
+
+def delete_room_subcollections(room_ref, deleter):
+    for collection in room_ref.collections():
+        last = None
+        while True:
+            query = collection.select([]).limit(CLEANUP_BATCH_SIZE)
+            if last:
+                query = query.start_after(last)
+            page = query.get()
+            for doc in page:
+                deleter.delete(doc.reference)
+            if len(page) < CLEANUP_BATCH_SIZE:
+                break
+            last = page[-1]
+
+def cleanup_old_classrooms(db, time_budget=CLEANUP_TIME_BUDGET):
+    """cleanupOldClassrooms: returns the function's result."""
+    started = time.monotonic()
+    checkpoint_ref = db.document(CLEANUP_CHECKPOINT)
+    checkpoint = checkpoint_ref.get()
+
+    if checkpoint.exists:
+        state = checkpoint.to_dict()
+        cutoff, cursor = state['cutoff'], state['cursor']
+        deleted_rooms, deleted_documents = state['deletedRooms'], state['deletedDocuments']
+    else:
+        cutoff = db.now() - CLEANUP_MAX_AGE_DAYS * 24 * 3600
+        cursor = None
+        deleted_rooms = deleted_documents = 0
+
+    deleter = BatchDeleter(db)
+    readers = ThreadPoolExecutor(max_workers=CLEANUP_CONCURRENCY)
+    try:
+        while True:
+            query = (db.collection('rooms')
+                     .where('last_activity', '<', cutoff)
+                     .order_by('last_activity')
+                     .select(['last_activity'])
+                     .limit(CLEANUP_PAGE_SIZE))
+            if cursor:
+                query = query.start_after({'last_activity': cursor['lastActivity'],
+                                           firestore_standin.DOCUMENT_ID: cursor['roomId']})
+            page = query.get()
+            if not page:
+                break
+
+            list(readers.map(lambda doc: delete_room_subcollections(doc.reference, deleter), page))
+            deleter.drain()
+            for doc in page:
+                deleter.delete(doc.reference)
+            deleter.drain()
+
+            cursor = {'lastActivity': page[-1].get('last_activity'), 'roomId': page[-1].id}
+            deleted_rooms += len(page)
+            checkpoint_ref.set({
+                'cutoff': cutoff,
+                'cursor': cursor,
+                'deletedRooms': deleted_rooms,
+                'deletedDocuments': deleted_documents + deleter.deleted,
+                'updatedAt': firestore_standin.SERVER_TIMESTAMP
+            })
+
+            if len(page) < CLEANUP_PAGE_SIZE:
+                break
+            if time_budget is not None and time.monotonic() - started > time_budget:
+                return {'deletedRooms': deleted_rooms, 'deletedDocuments': deleted_documents + deleter.deleted,
+                        'finished': False}
+    finally:
+        readers.shutdown()
+        deleter.close()
+
+    deleted_documents += deleter.deleted
+    if checkpoint.exists or deleted_rooms:
+        checkpoint_ref.delete()
+    return {'deletedRooms': deleted_rooms, 'deletedDocuments': deleted_documents, 'finished': True}
+
+def message_audience(message):
+    """messageAudience() in functions/index.js."""
+    if isinstance(message.get('audience'), list):
+        return message['audience']
+    return [message.get('recipient_uid'), message.get('sender_uid')] if message.get('is_private') else ['all']
+
+def write_archive_chunk(db, room_ref, chunk):
+    """writeArchiveChunk() in functions/index.js."""
+    messages = []
+    for doc in chunk['docs']:
+        message = doc.to_dict()
+        message.pop('audience', None)
+        message['id'] = doc.id
+        messages.append(message)
+    batch = db.batch()
+    batch.set(room_ref.collection('messageArchive').document(), {
+        'audience': chunk['audience'],
+        'from': messages[0]['timestamp'],
+        'to': messages[-1]['timestamp'],
+        'count': len(messages),
+        'messages': messages
+    })
+    for doc in chunk['docs']:
+        batch.delete(doc.reference)
+    batch.commit()
+
+def compact_room_messages(db, room_code):
+    """compactRoomMessages, the per-room step of compactMessages: returns the number of messages archived."""
+    room_ref = db.collection('rooms').document(room_code)
+    messages = room_ref.collection('messages')
+    live_count = messages.count().get()[0][0].value
+    if live_count <= MESSAGE_COMPACT_THRESHOLD:
+        return 0
+
+    remaining = live_count - MESSAGE_LIVE_KEEP
+    archived = 0
+    last = None
+    open_chunks = {}
+    while remaining > 0:
+        query = messages.order_by('timestamp').limit(min(remaining, MESSAGE_ARCHIVE_CHUNK))
+        if last:
+            query = query.start_after(last)
+        page = query.get()
+        if not page:
+            break
+
+        for doc in page:
+            audience = message_audience(doc.to_dict())
+            size = len(json.dumps(doc.to_dict(), default=str))
+            chunk = open_chunks.get(tuple(audience))
+            if chunk and (len(chunk['docs']) >= MESSAGE_ARCHIVE_CHUNK
+                          or chunk['bytes'] + size > MESSAGE_ARCHIVE_MAX_BYTES):
+                write_archive_chunk(db, room_ref, chunk)
+                archived += len(chunk['docs'])
+                chunk = None
+            if chunk is None:
+                chunk = {'audience': audience, 'docs': [], 'bytes': 0}
+                open_chunks[tuple(audience)] = chunk
+            chunk['docs'].append(doc)
+            chunk['bytes'] += size
+        remaining -= len(page)
+        last = page[-1]
+
+    for chunk in open_chunks.values():
+        write_archive_chunk(db, room_ref, chunk)
+        archived += len(chunk['docs'])
+    return archived
@@ -0,0 +1,165 @@
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import app_functions
+import firestore_standin
+
+# ==============================================================================
+#  Offline replay of cleanupOldClassrooms
+#
+#  Seeds the in-memory stand-in with rooms (and their students, messages and
+#  questionHistory), some older than a week, then runs cleanupOldClassrooms as
+#  ported in app_functions.py and reports cleanup time, peak memory (Python
+#  heap allocated during the cleanup), writes per second, and whether any old
+#  room or orphaned subcollection document is left.
+#
+#  --legacy runs the previous version too: one query for every old room and
+#  one delete per room document, all at once.
+#  --time-budget makes each run stop early, to exercise the checkpoint: runs
+#  repeat, as the daily schedule would, until one finishes.
+#
+#  Usage:
+#    python tools/cleanup_replay.py
+#    python tools/cleanup_replay.py --rooms 10000 --legacy
+#    python tools/cleanup_replay.py --rooms 20000 --time-budget 1
+# ==============================================================================
+
+DEFAULT_ROOMS = 100000
+DEFAULT_OLD_FRACTION = 0.5
+SUBCOLLECTION_DOCS = {'students': 2, 'messages': 2, 'questionHistory': 1}
+SEED_BATCH_SIZE = 500
+DAY = 24 * 3600
+# Promise.all over every room; threads stand in for the unbounded fan-out
+LEGACY_CONCURRENCY = 64
+
+def seed(db, rooms, old_fraction, rng):
+    """Rooms with last_activity spread over the last 30 days; returns the IDs of the old ones."""
+    now = db.now()
+    cutoff = now - app_functions.CLEANUP_MAX_AGE_DAYS * DAY
+    old_rooms = set()
+    batch = db.batch()
+    pending = 0
+    for index in range(rooms):
+        room_code = f"{index:06d}"
+        if rng.random() < old_fraction:
+            last_activity = cutoff - rng.uniform(1, 23 * DAY)
+            old_rooms.add(room_code)
+        else:
+            last_activity = cutoff + rng.uniform(1, 7 * DAY - 1)
+        room_ref = db.collection('rooms').document(room_code)
+        batch.set(room_ref, {
+            'room_code': room_code,
+            'teacher_uid': f"teacher_{index % 500}",
+            'last_activity': last_activity,
+            'settings': {'ai_active': False, 'ai_model': 'chatgpt', 'currentPoll': {'isActive': False}}
+        })
+        for collection_id, count in SUBCOLLECTION_DOCS.items():
+            for number in range(count):
+                batch.set(room_ref.collection(collection_id).document(f"{collection_id}_{number}"),
+                          {'room': room_code, 'number': number})
+        pending += 1 + sum(SUBCOLLECTION_DOCS.values())
+        if pending >= SEED_BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+    batch.commit()
+    return old_rooms
+
+def legacy_cleanup(db):
+    """The previous cleanupOldClassrooms: every old room in one query, room documents only."""
+    cutoff = db.now() - app_functions.CLEANUP_MAX_AGE_DAYS * DAY
+    old_rooms = db.collection('rooms').where('last_activity', '<', cutoff).get()
+    with ThreadPoolExecutor(max_workers=LEGACY_CONCURRENCY) as executor:
+        list(executor.map(lambda doc: doc.reference.delete(), old_rooms))
+    return {'deletedRooms': len(old_rooms), 'finished': True}
+
+def leftovers(db, old_rooms):
+    """(old rooms still present, subcollection documents of old rooms still present)."""
+    rooms = sum(1 for room_code in old_rooms if db.collection('rooms').document(room_code).get().exists)
+    orphans = 0
+    for room_code in old_rooms:
+        room_ref = db.collection('rooms').document(room_code)
+        for collection in room_ref.collections():
+            orphans += len(collection.select([]).get())
+    return rooms, orphans
+
+def replay(name, rooms, old_fraction, cleanup, contention, seed_value):
+    rng = random.Random(seed_value)
+    db = firestore_standin.Client()
+    print(f"--- {name}: seeding {rooms:,} rooms... ---")
+    old_rooms = seed(db, rooms, old_fraction, rng)
+    db.contention = contention
+    db.stats.reset()
+
+    print(f"--- {name}: cleaning up {len(old_rooms):,} old rooms... ---")
+    tracemalloc.start()
+    start = time.perf_counter()
+    runs = 0
+    while True:
+        runs += 1
+        result = cleanup(db)
+        if result['finished']:
+            break
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    writes = db.stats.counters.get('writes', 0)
+    remaining_rooms, orphans = leftovers(db, old_rooms)
+    recent_kept = sum(1 for _ in db.collection('rooms').select([]).get()) == rooms - len(old_rooms)
+    return {
+        'name': name,
+        'runs': runs,
+        'seconds': duration,
+        'peak_mb': peak / (1024 * 1024),
+        'writes': writes,
+        'writes_per_second': writes / duration if duration else 0.0,
+        'remaining_rooms': remaining_rooms,
+        'orphans': orphans,
+        'recent_kept': recent_kept
+    }
+
+def print_table(results):
+    print("\n" + "="*96)
+    print(f"  {'cleanup':<10} {'runs':>4} {'time':>9} {'peak heap':>10} {'writes':>9} {'writes/s':>9} "
+          f"{'old rooms left':>14} {'orphaned docs':>13} {'recent kept':>11}")
+    for result in results:
+        print(f"  {result['name']:<10} {result['runs']:>4} {result['seconds']:>8.2f}s {result['peak_mb']:>7.1f} MB "
+              f"{result['writes']:>9,} {result['writes_per_second']:>9,.0f} {result['remaining_rooms']:>14,} "
+              f"{result['orphans']:>13,} {'✅' if result['recent_kept'] else '❌':>10}")
+    print("="*96)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay cleanupOldClassrooms against a seeded in-memory Firestore.")
+    parser.add_argument('--rooms', type=int, default=DEFAULT_ROOMS, help=f"Rooms to seed (default: {DEFAULT_ROOMS:,}).")
+    parser.add_argument('--old-fraction', type=float, default=DEFAULT_OLD_FRACTION,
+                        help=f"Share of rooms older than a week (default: {DEFAULT_OLD_FRACTION}).")
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help="Seconds each cleanup run may take before it checkpoints and stops "
+                             f"(default: {app_functions.CLEANUP_TIME_BUDGET}, as deployed).")
+    parser.add_argument('--legacy', action='store_true', help="Also replay the previous, single-query cleanup.")
+    parser.add_argument('--commit-latency', type=float, default=0.002,
+                        help="Seconds each commit takes (default: 0.002).")
+    parser.add_argument('--seed', type=int, default=1, help="Random seed for the room ages (default: 1).")
+    args = parser.parse_args()
+
+    time_budget = args.time_budget if args.time_budget is not None else app_functions.CLEANUP_TIME_BUDGET
+    cleanups = [('paginated', lambda db: app_functions.cleanup_old_classrooms(db, time_budget))]
+    if args.legacy:
+        cleanups.insert(0, ('legacy', legacy_cleanup))
+
+    results = []
+    for name, cleanup in cleanups:
+        contention = firestore_standin.ContentionModel(commit_latency=args.commit_latency)
+        results.append(replay(name, args.rooms, args.old_fraction, cleanup, contention, args.seed))
+    print_table(results)
+    clean = all(result['remaining_rooms'] == 0 and result['orphans'] == 0 and result['recent_kept']
+                for result in results if result['name'] != 'legacy')
+    sys.exit(0 if clean else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+// Node side of tools/dashboard_render_benchmark.py (run that instead).
+//
+// Opens the dashboard in headless Chromium with Playwright, serves
+// dashboard_render_stub.js in place of the Firebase SDK, waits for
+// TeacherDashboard.init() to create its room, and replays each synthetic class
+// through window.__benchmark.replay(). Heap size (after a forced GC) and DOM
+// counters come from the Chrome DevTools Protocol, before and after the replay.
+//
+// stdin:  {"url": ..., "settleMs": ..., "runs": [{"students": N, "events": [...]}]}
+// stdout: [{"students": N, "replay": {...}, "heap": {...}, "dom": {...}}, ...]
+
+const fs = require('fs');
+const path = require('path');
+
+const STUB = fs.readFileSync(path.join(__dirname, 'dashboard_render_stub.js'), 'utf8');
+const FIREBASE_SDK = /^https:\/\/www\.gstatic\.com\/firebasejs\//;
+const INIT_TIMEOUT_MS = 30000;
+// TeacherDashboard.init() finishes its AI button setup 2 seconds after the room exists
+const INIT_SETTLE_MS = 2500;
+
+function loadPlaywright() {
+    try {
+        return require('playwright');
+    } catch (error) {
+        process.stderr.write("Playwright is not installed: run 'npm install' and 'npx playwright install chromium' " +
+                             'in the repository root.\n');
+        process.exit(3);
+    }
+}
+
+async function measureMemory(cdp) {
+    await cdp.send('HeapProfiler.collectGarbage');
+    const heap = await cdp.send('Runtime.getHeapUsage');
+    const dom = await cdp.send('Memory.getDOMCounters');
+    return { heapUsed: heap.usedSize, nodes: dom.nodes, listeners: dom.jsEventListeners };
+}
+
+async function runClass(browser, input, run) {
+    const context = await browser.newContext({ viewport: { width: 1366, height: 900 } });
+    const page = await context.newPage();
+    const consoleErrors = [];
+    page.on('pageerror', error => consoleErrors.push(String(error)));
+
+    const origin = new URL(input.url).origin;
+    await page.route('**/*', route => {
+        const url = route.request().url();
+        if (FIREBASE_SDK.test(url)) {
+            // The stub defines window.firebase; the other compat scripts would only extend it
+            const body = url.includes('firebase-app-compat') ? STUB : '';
+            return route.fulfill({ status: 200, contentType: 'application/javascript', body });
+        }
+        if (!url.startsWith(origin)) {
+            return route.abort(); // QR codes and anything else off the local server
+        }
+        return route.continue();
+    });
+
+    await page.goto(input.url);
+    await page.waitForFunction(() => window.teacherDashboard && window.teacherDashboard.sdk &&
+                                     window.teacherDashboard.sdk.roomCode && window.__benchmark,
+                               null, { timeout: INIT_TIMEOUT_MS });
+    await page.waitForTimeout(INIT_SETTLE_MS);
+
+    const cdp = await context.newCDPSession(page);
+    const before = await measureMemory(cdp);
+    const replay = await page.evaluate(({ events, settleMs }) => window.__benchmark.replay(events, settleMs),
+                                       { events: run.events, settleMs: input.settleMs });
+    const after = await measureMemory(cdp);
+    await context.close();
+
+    return {
+        students: run.students,
+        replay,
+        heap: { before: before.heapUsed, after: after.heapUsed, growth: after.heapUsed - before.heapUsed },
+        dom: { nodesBefore: before.nodes, nodesAfter: after.nodes, listenersAfter: after.listeners },
+        pageErrors: consoleErrors
+    };
+}
+
+async function main() {
+    const input = JSON.parse(fs.readFileSync(0, 'utf8'));
+    const { chromium } = loadPlaywright();
+    const browser = await chromium.launch({ headless: true, args: ['--enable-precise-memory-info'] });
+    const results = [];
+    try {
+        for (const run of input.runs) {
+            results.push(await runClass(browser, input, run));
+        }
+    } finally {
+        await browser.close();
+    }
+    process.stdout.write(JSON.stringify(results));
+}
+
+main().catch(error => {
+    process.stderr.write(`${error.stack || error}\n`);
+    process.exit(1);
+});
@@ -0,0 +1,258 @@
+import argparse
+import functools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from load_test import percentile
+
+# ==============================================================================
+#  Benchmark: teacher dashboard render cost in headless Chromium
+#
+#  Serves a built dashboard (BUILD/ by default) from a local server, opens
+#  index.html in headless Chromium through Playwright with Firebase replaced by
+#  an in-memory stub (dashboard_render_stub.js), and replays a synthetic class
+#  into the stub at controlled rates, once per class size:
+#    - join:     students join one by one (--join-rate per second)
+#    - activity: student heartbeats (--update-rate) and chat messages
+#                (--message-rate) for --duration seconds
+#    - poll:     a multiple-choice poll that every student answers over
+#                --poll-seconds
+#    - leave:    a tenth of the class leaves
+#
+#  Reported per phase: listener callback time (the dashboard's own work per
+#  snapshot), frame times from requestAnimationFrame, and long tasks; per
+#  class: JS heap growth after a forced GC and DOM node counts.
+#  --json writes everything; --baseline compares with an earlier --json run,
+#  e.g. of BUILD-OLD.
+#
+#  Needs Node.js and the repository's Playwright (npm install, then
+#  npx playwright install chromium).
+#
+#  Usage:
+#    python tools/dashboard_render_benchmark.py
+#    python tools/dashboard_render_benchmark.py --build BUILD-OLD --json old.json
+#    python tools/dashboard_render_benchmark.py --students 30,300 --baseline old.json
+# ==============================================================================
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(TOOLS_DIR)
+DRIVER = os.path.join(TOOLS_DIR, 'dashboard_render_benchmark.js')
+DEFAULT_CLASS_SIZES = '10,30,100,300'
+LEAVE_FRACTION = 0.1
+SLOW_FRAME_MS = 50  # Three missed frames at 60 Hz
+PHASES = ['join', 'activity', 'poll', 'leave']
+SERVER_TIMESTAMP = {'$serverTimestamp': True}
+
+def event(at, phase, op, path, data=None):
+    return {'at': round(at, 1), 'phase': phase, 'op': op, 'path': path, 'data': data}
+
+def synthetic_class(students, join_rate, duration, update_rate, message_rate, poll_seconds, seed=0):
+    """Events for one class, in time order ("{room}" stands for the dashboard's room code)."""
+    rng = random.Random(seed)
+    ids = [f"student_{rng.getrandbits(48):012x}" for _ in range(students)]
+    events = []
+    now = 0.0
+
+    for index, student_id in enumerate(ids):
+        events.append(event(now, 'join', 'set', f"rooms/{{room}}/students/{student_id}",
+                            {'uid': student_id, 'name': f"Student {index + 1}", 'joined_at': SERVER_TIMESTAMP}))
+        now += 1000 / join_rate
+
+    activity = []
+    for number in range(int(duration * update_rate)):
+        student_id = rng.choice(ids)
+        activity.append(event(now + number * 1000 / update_rate, 'activity', 'update',
+                              f"rooms/{{room}}/students/{student_id}", {'last_seen': SERVER_TIMESTAMP}))
+    for number in range(int(duration * message_rate)):
+        index = rng.randrange(students)
+        activity.append(event(now + number * 1000 / message_rate, 'activity', 'set',
+                              f"rooms/{{room}}/messages/message_{number:06d}", {
+                                  'sender': f"Student {index + 1}",
+                                  'sender_uid': ids[index],
+                                  'content': f"Message {number} " + 'x' * rng.randint(10, 80),
+                                  'timestamp': SERVER_TIMESTAMP,
+                                  'is_teacher': False,
+                                  'audience': ['all']
+                              }))
+    events.extend(sorted(activity, key=lambda item: item['at']))
+    now += duration * 1000
+
+    poll_id = f"poll_benchmark_{seed}"
+    events.append(event(now, 'poll', 'update', 'rooms/{room}', {'settings.currentPoll': {
+        'id': poll_id, 'type': 'multiple_choice', 'question': '', 'options': 4, 'isActive': True,
+        'createdAt': SERVER_TIMESTAMP, 'responseStore': 'room', 'responses': {}
+    }}))
+    for student_id in ids:
+        events.append(event(now + rng.uniform(0, poll_seconds * 1000), 'poll', 'update', 'rooms/{room}',
+                            {f"settings.currentPoll.responses.{student_id}": rng.randint(1, 4)}))
+    events.sort(key=lambda item: (PHASES.index(item['phase']), item['at']))
+    now += poll_seconds * 1000
+
+    for number, student_id in enumerate(rng.sample(ids, int(students * LEAVE_FRACTION))):
+        events.append(event(now + number * 1000 / join_rate, 'leave', 'delete', f"rooms/{{room}}/students/{student_id}"))
+    return events
+
+class StaticServer:
+    """The build directory over HTTP, as hosting would serve it."""
+
+    def __init__(self, directory):
+        class Handler(SimpleHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(Handler, directory=directory))
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/index.html"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+def in_window(start, window):
+    return window['from'] <= start < window['to']
+
+def summarize(result):
+    replay = result['replay']
+    summary = {
+        'students': result['students'],
+        'heap_growth_kb': result['heap']['growth'] / 1024,
+        'dom_nodes_before': result['dom']['nodesBefore'],
+        'dom_nodes_after': result['dom']['nodesAfter'],
+        'live_nodes': replay['liveNodes'],
+        'students_shown': replay['students'],
+        'messages_shown': replay['messages'],
+        'page_errors': result['pageErrors'],
+        'phases': {}
+    }
+    for window in replay['phases']:
+        handlers = [handler for handler in replay['handlers'] if in_window(handler[0], window)]
+        handler_ms = sorted(handler[1] for handler in handlers)
+        frames = sorted(frame[1] for frame in replay['frames'] if in_window(frame[0], window))
+        long_tasks = [task for task in replay['longTasks'] if in_window(task[0], window)]
+        summary['phases'][window['name']] = {
+            'seconds': (window['to'] - window['from']) / 1000,
+            'snapshots': len(handlers),
+            'handler_total_ms': sum(handler_ms),
+            'handler_p95_ms': percentile(handler_ms, 0.95),
+            'handler_max_ms': handler_ms[-1] if handler_ms else 0.0,
+            'frames': len(frames),
+            'frame_p50_ms': percentile(frames, 0.50),
+            'frame_p95_ms': percentile(frames, 0.95),
+            'frame_max_ms': frames[-1] if frames else 0.0,
+            'slow_frames': sum(1 for frame in frames if frame >= SLOW_FRAME_MS),
+            'long_tasks': len(long_tasks),
+            'long_task_ms': sum(task[1] for task in long_tasks)
+        }
+    return summary
+
+def print_table(summaries):
+    print("\n" + "="*118)
+    print(f"  {'students':>8} {'phase':<9} {'snapshots':>9} {'handler total':>13} {'p95':>8} {'max':>8} "
+          f"{'frame p50':>9} {'p95':>8} {'max':>8} {'slow':>5} {'long tasks':>10} {'total':>8}")
+    for summary in summaries:
+        for phase, numbers in summary['phases'].items():
+            print(f"  {summary['students']:>8} {phase:<9} {numbers['snapshots']:>9} "
+                  f"{numbers['handler_total_ms']:>11.1f}ms {numbers['handler_p95_ms']:>6.1f}ms "
+                  f"{numbers['handler_max_ms']:>6.1f}ms {numbers['frame_p50_ms']:>7.1f}ms "
+                  f"{numbers['frame_p95_ms']:>6.1f}ms {numbers['frame_max_ms']:>6.1f}ms {numbers['slow_frames']:>5} "
+                  f"{numbers['long_tasks']:>10} {numbers['long_task_ms']:>6.0f}ms")
+        print(f"  {'':>8} heap +{summary['heap_growth_kb']:,.0f} KB, DOM nodes {summary['dom_nodes_before']:,} -> "
+              f"{summary['dom_nodes_after']:,} ({summary['live_nodes']:,} in the document), "
+              f"{summary['students_shown']} students and {summary['messages_shown']} messages shown"
+              + (f", {len(summary['page_errors'])} page errors" if summary['page_errors'] else ""))
+    print("="*118)
+
+def totals(summary):
+    """Whole-run numbers compared against a baseline."""
+    phases = summary['phases'].values()
+    return {
+        'handler ms': sum(phase['handler_total_ms'] for phase in phases),
+        'frame p95 ms': max((phase['frame_p95_ms'] for phase in phases), default=0.0),
+        'slow frames': sum(phase['slow_frames'] for phase in phases),
+        'long task ms': sum(phase['long_task_ms'] for phase in phases),
+        'heap KB': summary['heap_growth_kb'],
+        'DOM nodes': summary['dom_nodes_after']
+    }
+
+def print_comparison(baseline, summaries):
+    by_size = {summary['students']: summary for summary in baseline}
+    print(f"\n  Compared with the baseline (baseline -> this run):")
+    for summary in summaries:
+        if summary['students'] not in by_size:
+            continue
+        old, new = totals(by_size[summary['students']]), totals(summary)
+        parts = []
+        for name in new:
+            change = f" ({(new[name] - old[name]) / old[name]:+.0%})" if old[name] else ""
+            parts.append(f"{name} {old[name]:,.1f} -> {new[name]:,.1f}{change}")
+        print(f"  {summary['students']:>5} students: " + ", ".join(parts))
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the teacher dashboard's render cost in headless Chromium.")
+    parser.add_argument('--build', default=os.path.join(ROOT_DIR, 'BUILD'),
+                        help="Built site to serve (default: BUILD).")
+    parser.add_argument('--students', default=DEFAULT_CLASS_SIZES,
+                        help=f"Comma-separated class sizes (default: {DEFAULT_CLASS_SIZES}).")
+    parser.add_argument('--join-rate', type=float, default=20.0, help="Students joining per second (default: 20).")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds of activity (default: 10).")
+    parser.add_argument('--update-rate', type=float, default=10.0,
+                        help="Student document updates per second during activity (default: 10).")
+    parser.add_argument('--message-rate', type=float, default=2.0,
+                        help="Chat messages per second during activity (default: 2).")
+    parser.add_argument('--poll-seconds', type=float, default=5.0,
+                        help="Seconds over which the class answers the poll (default: 5).")
+    parser.add_argument('--settle', type=float, default=1.0,
+                        help="Seconds to keep measuring after the last event (default: 1).")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', metavar='FILE', help="Also write the results to FILE as JSON.")
+    parser.add_argument('--baseline', metavar='FILE', help="Compare with the results of an earlier --json run.")
+    args = parser.parse_args()
+
+    node = shutil.which('node')
+    if not node:
+        print("❌ node was not found on PATH; the benchmark drives Chromium through Playwright under Node.js.")
+        sys.exit(1)
+    if not os.path.isfile(os.path.join(args.build, 'index.html')):
+        print(f"❌ No index.html in '{args.build}'; run build.py first or pass --build.")
+        sys.exit(1)
+    try:
+        sizes = [int(size) for size in args.students.split(',')]
+    except ValueError:
+        print(f"❌ --students must be comma-separated numbers, got '{args.students}'")
+        sys.exit(2)
+
+    runs = [{'students': size, 'events': synthetic_class(size, args.join_rate, args.duration, args.update_rate,
+                                                          args.message_rate, args.poll_seconds, args.seed)}
+            for size in sizes]
+    server = StaticServer(args.build)
+    try:
+        print(f"--- Replaying {len(runs)} classes ({args.students} students) against {args.build}... ---")
+        payload = {'url': server.url, 'settleMs': args.settle * 1000, 'runs': runs}
+        result = subprocess.run([node, DRIVER], input=json.dumps(payload), capture_output=True, text=True,
+                                cwd=ROOT_DIR)
+    finally:
+        server.close()
+    if result.returncode != 0:
+        print(f"❌ Benchmark driver failed:\n{result.stderr.strip()}")
+        sys.exit(1)
+
+    summaries = [summarize(output) for output in json.loads(result.stdout)]
+    print_table(summaries)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            print_comparison(json.load(f)['results'], summaries)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'build': os.path.abspath(args.build), 'settings': vars(args), 'results': summaries}, f, indent=2)
+        print(f"📈 Results written to '{args.json}'")
+    sys.exit(0 if all(not summary['page_errors'] for summary in summaries) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,540 @@
+// Browser side of tools/dashboard_render_benchmark.py (run that instead).
+//
+// Served in place of firebase-app-compat.js (the other Firebase scripts are
+// served empty): an in-memory stand-in for the parts of the Firebase compat SDK
+// the dashboard uses - Firestore documents, queries and snapshot listeners,
+// anonymous auth, and callable functions that resolve with empty data.
+//
+// Listener callbacks are timed, and window.__benchmark.replay(events) writes a
+// synthetic class's events into the store on schedule while recording frames
+// and long tasks.
+
+(function () {
+    'use strict';
+
+    // --- Values ---
+
+    class Timestamp {
+        constructor(seconds, nanoseconds) {
+            this.seconds = seconds;
+            this.nanoseconds = nanoseconds;
+        }
+        static fromMillis(ms) { return new Timestamp(Math.floor(ms / 1000), Math.round((ms % 1000) * 1e6)); }
+        static fromDate(date) { return Timestamp.fromMillis(date.getTime()); }
+        static now() { return Timestamp.fromMillis(Date.now()); }
+        toMillis() { return this.seconds * 1000 + this.nanoseconds / 1e6; }
+        toDate() { return new Date(this.toMillis()); }
+        isEqual(other) { return other instanceof Timestamp && other.toMillis() === this.toMillis(); }
+        valueOf() { return this.toMillis(); }
+    }
+
+    const FieldValue = {
+        serverTimestamp: () => ({ __op: 'serverTimestamp' }),
+        arrayUnion: (...values) => ({ __op: 'arrayUnion', values }),
+        arrayRemove: (...values) => ({ __op: 'arrayRemove', values }),
+        increment: n => ({ __op: 'increment', n }),
+        delete: () => ({ __op: 'delete' })
+    };
+
+    const DELETE = Symbol('delete');
+
+    function isPlainObject(value) {
+        return value !== null && typeof value === 'object' && !Array.isArray(value) && !(value instanceof Timestamp);
+    }
+
+    function clone(value) {
+        if (Array.isArray(value)) return value.map(clone);
+        if (isPlainObject(value)) {
+            const copy = {};
+            Object.keys(value).forEach(key => { copy[key] = clone(value[key]); });
+            return copy;
+        }
+        return value;
+    }
+
+    function resolve(value, current) {
+        if (value && value.__op) {
+            switch (value.__op) {
+                case 'serverTimestamp': return Timestamp.now();
+                case 'arrayUnion': {
+                    const array = Array.isArray(current) ? current.slice() : [];
+                    value.values.forEach(item => { if (!array.includes(item)) array.push(item); });
+                    return array;
+                }
+                case 'arrayRemove':
+                    return Array.isArray(current) ? current.filter(item => !value.values.includes(item)) : [];
+                case 'increment': return (typeof current === 'number' ? current : 0) + value.n;
+                case 'delete': return DELETE;
+            }
+        }
+        if (isPlainObject(value)) {
+            const resolved = {};
+            Object.keys(value).forEach(key => {
+                const item = resolve(value[key], isPlainObject(current) ? current[key] : undefined);
+                if (item !== DELETE) resolved[key] = item;
+            });
+            return resolved;
+        }
+        return Array.isArray(value) ? value.map(item => resolve(item)) : value;
+    }
+
+    function getField(data, fieldPath) {
+        return fieldPath.split('.').reduce((value, key) => (isPlainObject(value) ? value[key] : undefined), data);
+    }
+
+    function setField(data, fieldPath, value) {
+        const keys = fieldPath.split('.');
+        let target = data;
+        keys.slice(0, -1).forEach(key => {
+            if (!isPlainObject(target[key])) target[key] = {};
+            target = target[key];
+        });
+        const last = keys[keys.length - 1];
+        const resolved = resolve(value, target[last]);
+        if (resolved === DELETE) {
+            delete target[last];
+        } else {
+            target[last] = resolved;
+        }
+    }
+
+    function merge(target, updates) {
+        Object.keys(updates).forEach(key => {
+            const value = updates[key];
+            if (isPlainObject(value) && !value.__op && isPlainObject(target[key])) {
+                merge(target[key], value);
+            } else {
+                const resolved = resolve(value, target[key]);
+                if (resolved === DELETE) {
+                    delete target[key];
+                } else {
+                    target[key] = resolved;
+                }
+            }
+        });
+    }
+
+    function compare(a, b) {
+        if (a instanceof Timestamp) a = a.toMillis();
+        if (b instanceof Timestamp) b = b.toMillis();
+        if (a === b) return 0;
+        if (a === undefined || a === null) return -1;
+        if (b === undefined || b === null) return 1;
+        return a < b ? -1 : 1;
+    }
+
+    // --- Store ---
+
+    const documents = new Map(); // path -> data
+    const versions = new Map(); // path -> write count, to tell modified documents apart
+    const collections = new Map(); // collection path -> Set of document paths
+    const listeners = new Set();
+    const handlerLog = []; // [start, ms, target, changes]
+    let flushScheduled = false;
+    let autoId = 0;
+
+    function parentPath(path) {
+        return path.slice(0, path.lastIndexOf('/'));
+    }
+
+    function write(path, data) {
+        const collectionPath = parentPath(path);
+        if (data === undefined) {
+            documents.delete(path);
+            if (collections.has(collectionPath)) collections.get(collectionPath).delete(path);
+        } else {
+            documents.set(path, data);
+            if (!collections.has(collectionPath)) collections.set(collectionPath, new Set());
+            collections.get(collectionPath).add(path);
+        }
+        versions.set(path, (versions.get(path) || 0) + 1);
+        listeners.forEach(listener => {
+            if (listener.target.path === path || listener.target.collectionPath === collectionPath) {
+                listener.dirty = true;
+            }
+        });
+        if (!flushScheduled) {
+            flushScheduled = true;
+            // Writes in the same task reach listeners as one snapshot, as with Firestore
+            setTimeout(flush, 0);
+        }
+    }
+
+    function flush() {
+        flushScheduled = false;
+        listeners.forEach(listener => {
+            if (listener.dirty) {
+                listener.dirty = false;
+                listener.deliver();
+            }
+        });
+    }
+
+    function timed(callback, snapshot, target, changes) {
+        const start = performance.now();
+        try {
+            callback(snapshot);
+        } finally {
+            handlerLog.push([start, performance.now() - start, target, changes]);
+        }
+    }
+
+    class DocumentSnapshot {
+        constructor(ref, data) {
+            this.ref = ref;
+            this.id = ref.id;
+            this._data = data;
+            this.exists = data !== undefined;
+            this.metadata = { hasPendingWrites: false, fromCache: false };
+        }
+        data() { return this._data === undefined ? undefined : clone(this._data); }
+        get(fieldPath) { return clone(getField(this._data, fieldPath)); }
+    }
+
+    class QuerySnapshot {
+        constructor(docs, changes) {
+            this.docs = docs;
+            this.size = docs.length;
+            this.empty = docs.length === 0;
+            this._changes = changes;
+            this.metadata = { hasPendingWrites: false, fromCache: false };
+        }
+        forEach(callback) { this.docs.forEach(callback); }
+        docChanges() { return this._changes; }
+    }
+
+    class Query {
+        constructor(collectionPath, constraints = {}) {
+            this.collectionPath = collectionPath;
+            this._c = Object.assign({ filters: [], orders: [], limit: null, limitToLast: false,
+                                      startAfter: null, endBefore: null }, constraints);
+        }
+        _with(changes) { return new Query(this.collectionPath, Object.assign({}, this._c, changes)); }
+        where(field, op, value) { return this._with({ filters: this._c.filters.concat([[field, op, value]]) }); }
+        orderBy(field, direction = 'asc') { return this._with({ orders: this._c.orders.concat([[field, direction]]) }); }
+        limit(n) { return this._with({ limit: n, limitToLast: false }); }
+        limitToLast(n) { return this._with({ limit: n, limitToLast: true }); }
+        startAfter(...values) { return this._with({ startAfter: values }); }
+        endBefore(...values) { return this._with({ endBefore: values }); }
+        select() { return this; }
+
+        _cursor(values) {
+            if (values.length === 1 && values[0] instanceof DocumentSnapshot) {
+                const snapshot = values[0];
+                return { values: this._c.orders.map(([field]) => getField(snapshot._data, field)), id: snapshot.id };
+            }
+            return { values, id: null };
+        }
+
+        _compareToCursor(doc, cursor) {
+            for (let i = 0; i < cursor.values.length && i < this._c.orders.length; i++) {
+                const [field, direction] = this._c.orders[i];
+                const order = compare(getField(doc._data, field), cursor.values[i]);
+                if (order !== 0) return direction === 'desc' ? -order : order;
+            }
+            return cursor.id === null ? 0 : compare(doc.id, cursor.id);
+        }
+
+        _run() {
+            const paths = collections.get(this.collectionPath) || new Set();
+            let docs = [];
+            paths.forEach(path => {
+                const data = documents.get(path);
+                const matches = this._c.filters.every(([field, op, value]) => {
+                    const actual = getField(data, field);
+                    switch (op) {
+                        case '==': return compare(actual, value) === 0;
+                        case '!=': return compare(actual, value) !== 0;
+                        case '<': return actual !== undefined && compare(actual, value) < 0;
+                        case '<=': return actual !== undefined && compare(actual, value) <= 0;
+                        case '>': return actual !== undefined && compare(actual, value) > 0;
+                        case '>=': return actual !== undefined && compare(actual, value) >= 0;
+                        case 'in': return value.includes(actual);
+                        case 'array-contains': return Array.isArray(actual) && actual.includes(value);
+                        case 'array-contains-any': return Array.isArray(actual) && value.some(item => actual.includes(item));
+                        default: throw new Error(`Unsupported operator in the benchmark stub: ${op}`);
+                    }
+                });
+                const ordered = this._c.orders.every(([field]) => getField(data, field) !== undefined);
+                if (matches && ordered) docs.push(new DocumentSnapshot(new DocumentReference(path), data));
+            });
+            docs.sort((a, b) => {
+                for (const [field, direction] of this._c.orders) {
+                    const order = compare(getField(a._data, field), getField(b._data, field));
+                    if (order !== 0) return direction === 'desc' ? -order : order;
+                }
+                return compare(a.id, b.id);
+            });
+            if (this._c.startAfter) {
+                const cursor = this._cursor(this._c.startAfter);
+                docs = docs.filter(doc => this._compareToCursor(doc, cursor) > 0);
+            }
+            if (this._c.endBefore) {
+                const cursor = this._cursor(this._c.endBefore);
+                docs = docs.filter(doc => this._compareToCursor(doc, cursor) < 0);
+            }
+            if (this._c.limit !== null) {
+                docs = this._c.limitToLast ? docs.slice(-this._c.limit) : docs.slice(0, this._c.limit);
+            }
+            return docs;
+        }
+
+        async get() {
+            return new QuerySnapshot(this._run(), []);
+        }
+
+        onSnapshot(callback, onError) {
+            const query = this;
+            let previous = [];
+            let previousVersions = new Map();
+            const listener = {
+                target: this,
+                dirty: false,
+                deliver() {
+                    const docs = query._run();
+                    const oldIndex = new Map(previous.map((doc, index) => [doc.ref.path, index]));
+                    const newIndex = new Map(docs.map((doc, index) => [doc.ref.path, index]));
+                    const changes = [];
+                    previous.forEach((doc, index) => {
+                        if (!newIndex.has(doc.ref.path)) changes.push({ type: 'removed', doc, oldIndex: index, newIndex: -1 });
+                    });
+                    docs.forEach((doc, index) => {
+                        const path = doc.ref.path;
+                        if (!oldIndex.has(path)) {
+                            changes.push({ type: 'added', doc, oldIndex: -1, newIndex: index });
+                        } else if (previousVersions.get(path) !== versions.get(path)) {
+                            changes.push({ type: 'modified', doc, oldIndex: oldIndex.get(path), newIndex: index });
+                        }
+                    });
+                    previous = docs;
+                    previousVersions = new Map(docs.map(doc => [doc.ref.path, versions.get(doc.ref.path)]));
+                    if (changes.length > 0 || this.first) {
+                        this.first = false;
+                        timed(callback, new QuerySnapshot(docs, changes), query.collectionPath.split('/').pop(),
+                              changes.length);
+                    }
+                },
+                first: true
+            };
+            listeners.add(listener);
+            setTimeout(() => listener.deliver(), 0);
+            return () => listeners.delete(listener);
+        }
+    }
+
+    class CollectionReference extends Query {
+        constructor(path) {
+            super(path);
+            this.path = path;
+            this.id = path.split('/').pop();
+        }
+        doc(id) {
+            return new DocumentReference(`${this.path}/${id || `auto${(++autoId).toString(36).padStart(8, '0')}`}`);
+        }
+        async add(data) {
+            const ref = this.doc();
+            await ref.set(data);
+            return ref;
+        }
+    }
+
+    class DocumentReference {
+        constructor(path) {
+            this.path = path;
+            this.id = path.split('/').pop();
+        }
+        get parent() { return new CollectionReference(parentPath(this.path)); }
+        collection(id) { return new CollectionReference(`${this.path}/${id}`); }
+        async get() { return new DocumentSnapshot(this, documents.get(this.path)); }
+        async set(data, options = {}) { applySet(this.path, data, options); }
+        async update(fields, ...rest) { applyUpdate(this.path, fields, rest); }
+        async delete() { write(this.path, undefined); }
+        onSnapshot(callback, onError) {
+            const ref = this;
+            const listener = {
+                target: this,
+                dirty: false,
+                deliver() {
+                    timed(callback, new DocumentSnapshot(ref, documents.get(ref.path)), 'room', 1);
+                }
+            };
+            listeners.add(listener);
+            setTimeout(() => listener.deliver(), 0);
+            return () => listeners.delete(listener);
+        }
+    }
+
+    function applySet(path, data, options) {
+        if (options.merge && documents.has(path)) {
+            const merged = clone(documents.get(path));
+            merge(merged, data);
+            write(path, merged);
+        } else {
+            write(path, resolve(data));
+        }
+    }
+
+    function applyUpdate(path, fields, rest) {
+        if (!documents.has(path)) {
+            throw Object.assign(new Error(`No document to update: ${path}`), { code: 'not-found' });
+        }
+        if (typeof fields === 'string') {
+            const pairs = [fields].concat(rest);
+            fields = {};
+            for (let i = 0; i < pairs.length; i += 2) fields[pairs[i]] = pairs[i + 1];
+        }
+        const updated = clone(documents.get(path));
+        Object.keys(fields).forEach(fieldPath => setField(updated, fieldPath, fields[fieldPath]));
+        write(path, updated);
+    }
+
+    class WriteBatch {
+        constructor() { this.writes = []; }
+        set(ref, data, options = {}) { this.writes.push(() => applySet(ref.path, data, options)); return this; }
+        update(ref, fields, ...rest) { this.writes.push(() => applyUpdate(ref.path, fields, rest)); return this; }
+        delete(ref) { this.writes.push(() => write(ref.path, undefined)); return this; }
+        async commit() { this.writes.forEach(apply => apply()); }
+    }
+
+    const firestore = {
+        collection: path => new CollectionReference(path),
+        doc: path => new DocumentReference(path),
+        batch: () => new WriteBatch(),
+        async runTransaction(updateFunction) {
+            const transaction = new WriteBatch();
+            transaction.get = ref => ref.get();
+            const result = await updateFunction(transaction);
+            await transaction.commit();
+            return result;
+        },
+        settings() {},
+        enablePersistence: async () => {}
+    };
+
+    // --- Auth, functions, app ---
+
+    const authListeners = [];
+    const auth = {
+        currentUser: null,
+        async signInAnonymously() {
+            auth.currentUser = { uid: 'benchmark-teacher', isAnonymous: true };
+            authListeners.forEach(callback => setTimeout(() => callback(auth.currentUser), 0));
+            return { user: auth.currentUser };
+        },
+        onAuthStateChanged(callback) {
+            authListeners.push(callback);
+            setTimeout(() => callback(auth.currentUser), 0);
+            return () => authListeners.splice(authListeners.indexOf(callback), 1);
+        },
+        async signOut() { auth.currentUser = null; }
+    };
+
+    const functions = {
+        httpsCallable: () => async () => ({ data: {} }),
+        useEmulator() {}
+    };
+
+    const app = { name: '[DEFAULT]', options: {}, functions: () => functions, firestore: () => firestore, auth: () => auth };
+
+    const firebase = {
+        apps: [app],
+        initializeApp(options) { app.options = options || {}; return app; },
+        app: () => app,
+        firestore: () => firestore,
+        auth: () => auth,
+        functions: () => functions
+    };
+    firebase.firestore.FieldValue = FieldValue;
+    firebase.firestore.Timestamp = Timestamp;
+    firebase.firestore.FieldPath = { documentId: () => '__name__' };
+    window.firebase = firebase;
+
+    // --- Replay ---
+
+    function decode(value) {
+        if (Array.isArray(value)) return value.map(decode);
+        if (isPlainObject(value)) {
+            if (value.$serverTimestamp) return FieldValue.serverTimestamp();
+            if (value.$arrayUnion) return FieldValue.arrayUnion(...value.$arrayUnion);
+            const decoded = {};
+            Object.keys(value).forEach(key => { decoded[key] = decode(value[key]); });
+            return decoded;
+        }
+        return value;
+    }
+
+    function apply(event, roomCode) {
+        const path = event.path.replace('{room}', roomCode);
+        const data = decode(event.data);
+        if (event.op === 'set') {
+            applySet(path, data, { merge: !!event.merge });
+        } else if (event.op === 'update') {
+            applyUpdate(path, data, []);
+        } else if (event.op === 'delete') {
+            write(path, undefined);
+        }
+    }
+
+    window.__benchmark = {
+        // events: [{at (ms from the start), phase, op: "set" | "update" | "delete", path ("{room}" is replaced), data, merge}]
+        replay(events, settleMs) {
+            const roomCode = window.teacherDashboard.sdk.roomCode;
+            const longTasks = [];
+            const observer = new PerformanceObserver(list => {
+                list.getEntries().forEach(entry => longTasks.push([entry.startTime, entry.duration]));
+            });
+            observer.observe({ type: 'longtask' });
+
+            const frames = [];
+            let running = true;
+            let lastFrame = null;
+            const onFrame = now => {
+                if (lastFrame !== null) frames.push([now, now - lastFrame]);
+                lastFrame = now;
+                if (running) requestAnimationFrame(onFrame);
+            };
+            requestAnimationFrame(onFrame);
+
+            handlerLog.length = 0;
+            const start = performance.now();
+            const phases = [];
+            return new Promise(done => {
+                let next = 0;
+                const tick = () => {
+                    const elapsed = performance.now() - start;
+                    while (next < events.length && events[next].at <= elapsed) {
+                        const event = events[next++];
+                        if (!phases.length || phases[phases.length - 1].name !== event.phase) {
+                            phases.push({ name: event.phase, from: start + event.at });
+                        }
+                        apply(event, roomCode);
+                    }
+                    if (next < events.length) {
+                        setTimeout(tick, Math.max(0, events[next].at - (performance.now() - start)));
+                    } else {
+                        setTimeout(finish, settleMs);
+                    }
+                };
+                const finish = () => {
+                    running = false;
+                    observer.disconnect();
+                    phases.forEach((phase, index) => {
+                        phase.to = index + 1 < phases.length ? phases[index + 1].from : performance.now();
+                    });
+                    done({
+                        start,
+                        end: performance.now(),
+                        phases,
+                        frames,
+                        longTasks,
+                        handlers: handlerLog.slice(),
+                        liveNodes: document.getElementsByTagName('*').length,
+                        students: document.querySelectorAll('#studentsList .student-item').length,
+                        messages: document.querySelectorAll('#messagesArea .message-item').length
+                    });
+                };
+                tick();
+            });
+        }
+    };
+})();
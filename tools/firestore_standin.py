@@ -0,0 +1,823 @@
+import bisect
+import copy
+import itertools
+import random
+import threading
+import time
+import uuid
+
+# ==============================================================================
+#  In-memory Firestore stand-in for offline benchmarks
+#
+#  Implements the part of Firestore the app uses, with the Python client's
+#  names: documents and subcollections, set/update (dotted field paths),
+#  SERVER_TIMESTAMP, ArrayUnion, Increment and DELETE_FIELD, batched writes,
+#  transactions with document locks, where/order_by/limit/limit_to_last
+#  queries with cursors, count() aggregations, and on_snapshot listeners that
+#  receive document changes.
+#
+#  A ContentionModel adds commit latency and serializes writes to the same
+#  document, so a hotspot such as the single room document shows up as queueing
+#  and lock waits, with no emulator, Java or network.
+#
+#  Usage:
+#    from firestore_standin import Client, ContentionModel, SERVER_TIMESTAMP
+#    db = Client(ContentionModel())
+#    db.collection('rooms').document('1234').set({'settings': {}})
+#    db.run_transaction(lambda transaction: ...)
+#    print(db.stats.summary())
+# ==============================================================================
+
+# Collections the app uses (see firestore.rules and ClassroomSDK.js); with
+# strict=True any other path raises, so typos in a benchmark fail loudly.
+LAYOUT = {
+    'rooms': {'students': {}, 'messages': {}, 'messageArchive': {}, 'questionHistory': {}, 'pollShards': {}},
+    'maintenance': {}
+}
+
+# FieldPath.document_id() in the Python client
+DOCUMENT_ID = '__name__'
+
+MAX_TRANSACTION_ATTEMPTS = 5
+# Retries back off exponentially with full jitter, as in the Firestore SDKs:
+# the n-th retry waits up to RETRY_BACKOFF * RETRY_BACKOFF_FACTOR ** (n - 1)
+RETRY_BACKOFF = 0.01
+RETRY_BACKOFF_FACTOR = 2.0
+# Like the server client libraries, transactions lock the documents they read
+# until they commit; a transaction that waits longer than this for a lock is aborted
+LOCK_TIMEOUT = 5.0
+
+class StandinError(Exception):
+    """Base class; `code` matches the Firestore error status."""
+    code = 'UNKNOWN'
+
+class NotFound(StandinError):
+    code = 'NOT_FOUND'
+
+class Aborted(StandinError):
+    """A transaction's reads changed before it could commit (after all retries)."""
+    code = 'ABORTED'
+
+class InvalidArgument(StandinError):
+    code = 'INVALID_ARGUMENT'
+
+class FailedPrecondition(StandinError):
+    code = 'FAILED_PRECONDITION'
+
+# --- Field values and sentinels ---
+
+class _Sentinel:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+SERVER_TIMESTAMP = _Sentinel('SERVER_TIMESTAMP')
+DELETE_FIELD = _Sentinel('DELETE_FIELD')
+
+class ArrayUnion:
+    def __init__(self, values):
+        self.values = list(values)
+
+class ArrayRemove:
+    def __init__(self, values):
+        self.values = list(values)
+
+class Increment:
+    def __init__(self, value):
+        self.value = value
+
+def get_field(data, field_path):
+    """Value at a dotted field path, or None if any part is missing."""
+    value = data
+    for part in field_path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+def _has_field(data, field_path):
+    value = data
+    for part in field_path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return False
+        value = value[part]
+    return True
+
+def _resolve(value, current, now):
+    """Applies a sentinel/transform against the field's current value."""
+    if value is SERVER_TIMESTAMP:
+        return now
+    if isinstance(value, ArrayUnion):
+        result = list(current) if isinstance(current, list) else []
+        result += [item for item in value.values if item not in result]
+        return result
+    if isinstance(value, ArrayRemove):
+        return [item for item in (current if isinstance(current, list) else []) if item not in value.values]
+    if isinstance(value, Increment):
+        return (current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0) + value.value
+    if isinstance(value, dict):
+        existing = current if isinstance(current, dict) else {}
+        return {key: _resolve(item, existing.get(key), now) for key, item in value.items()
+                if item is not DELETE_FIELD}
+    return copy.deepcopy(value)
+
+def _merge(target, updates, now):
+    """set(..., merge=True): nested maps are merged, everything else replaced."""
+    for key, value in updates.items():
+        if value is DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value, now)
+        else:
+            target[key] = _resolve(value, target.get(key), now)
+
+def _apply_update(data, field_updates, now):
+    """update(): each key is a dotted field path; intermediate maps are created."""
+    for field_path, value in field_updates.items():
+        parts = field_path.split('.')
+        target = data
+        for part in parts[:-1]:
+            if not isinstance(target.get(part), dict):
+                target[part] = {}
+            target = target[part]
+        if value is DELETE_FIELD:
+            target.pop(parts[-1], None)
+        else:
+            target[parts[-1]] = _resolve(value, target.get(parts[-1]), now)
+
+# --- Snapshots ---
+
+class DocumentSnapshot:
+    def __init__(self, reference, data, update_time=None, create_time=None):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.update_time = update_time
+        self.create_time = create_time
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        return copy.deepcopy(get_field(self._data or {}, field_path))
+
+class DocumentChange:
+    ADDED = 'ADDED'
+    MODIFIED = 'MODIFIED'
+    REMOVED = 'REMOVED'
+
+    def __init__(self, type, document, old_index, new_index):
+        self.type = type
+        self.document = document
+        self.old_index = old_index
+        self.new_index = new_index
+
+class AggregationResult:
+    def __init__(self, alias, value, read_time):
+        self.alias = alias
+        self.value = value
+        self.read_time = read_time
+
+class QuerySnapshot:
+    def __init__(self, docs, changes, read_time):
+        self.docs = docs
+        self.changes = changes
+        self.read_time = read_time
+
+    def __iter__(self):
+        return iter(self.docs)
+
+    def __len__(self):
+        return len(self.docs)
+
+# --- References and queries ---
+
+_OPERATORS = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a is not None and a < b,
+    '<=': lambda a, b: a is not None and a <= b,
+    '>': lambda a, b: a is not None and a > b,
+    '>=': lambda a, b: a is not None and a >= b,
+    'in': lambda a, b: a in b,
+    'not-in': lambda a, b: a not in b,
+    'array_contains': lambda a, b: isinstance(a, list) and b in a,
+    'array_contains_any': lambda a, b: isinstance(a, list) and any(item in a for item in b),
+}
+
+_RANGE_OPERATORS = {'<', '<=', '>', '>=', '=='}
+# Sorts after every document ID in an index key
+_ID_MAX = '\uffff'
+
+class Query:
+    ASCENDING = 'ASCENDING'
+    DESCENDING = 'DESCENDING'
+
+    def __init__(self, client, path, filters=(), orders=(), limit_count=None, limit_to_last=False, cursor=None,
+                 end_cursor=None, projection=None):
+        self._client = client
+        self._path = path
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit_count
+        self._limit_to_last = limit_to_last
+        self._cursor = cursor
+        self._end_cursor = end_cursor
+        self._projection = projection
+
+    def _copy(self, **changes):
+        values = dict(filters=self._filters, orders=self._orders, limit_count=self._limit,
+                      limit_to_last=self._limit_to_last, cursor=self._cursor, end_cursor=self._end_cursor,
+                      projection=self._projection)
+        values.update(changes)
+        return Query(self._client, self._path, **values)
+
+    def select(self, field_paths):
+        """Returns only these fields; select([]) returns references without data."""
+        return self._copy(projection=tuple(field_paths))
+
+    def where(self, field_path, op_string, value):
+        if op_string not in _OPERATORS:
+            raise InvalidArgument(f"Unsupported operator: {op_string}")
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction=ASCENDING):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit_count=count, limit_to_last=False)
+
+    def limit_to_last(self, count):
+        """The last `count` results, still in query order."""
+        return self._copy(limit_count=count, limit_to_last=True)
+
+    def _cursor_from(self, document_or_values):
+        if isinstance(document_or_values, DocumentSnapshot):
+            values, document_id = document_or_values._data or {}, document_or_values.id
+        else:
+            values, document_id = document_or_values, document_or_values.get(DOCUMENT_ID)
+        return tuple(get_field(values, field) for field, _ in self._orders), document_id
+
+    def start_after(self, document_or_values):
+        """
+        Cursor: a DocumentSnapshot (its order_by values, then its document ID, as in
+        Firestore) or a dict of the order_by field values, with the document ID
+        under DOCUMENT_ID to break ties.
+        """
+        return self._copy(cursor=self._cursor_from(document_or_values))
+
+    def end_before(self, document_or_values):
+        """Cursor, as for start_after: results stop before this position."""
+        return self._copy(end_cursor=self._cursor_from(document_or_values))
+
+    def count(self, alias='count'):
+        """Aggregation query: get() returns [[AggregationResult]], as in the Python client."""
+        return AggregationQuery(self, alias)
+
+    def _run(self):
+        """Matching snapshots, read under the client's lock."""
+        matches = self._run_indexed()
+        if matches is not None:
+            return [self._client._snapshot(path, entry, self._projection) for path, entry in matches]
+
+        matches = []
+        for path, entry in self._client._children(self._path):
+            data = entry['data']
+            if not all(_OPERATORS[op](get_field(data, field), value) for field, op, value in self._filters):
+                continue
+            # Like Firestore, order_by leaves out documents without the field
+            if not all(_has_field(data, field) for field, _ in self._orders):
+                continue
+            matches.append((path, entry))
+
+        # Document ID order, then the order_by fields (sorts are stable)
+        matches.sort(key=lambda match: match[0])
+        for field, direction in reversed(self._orders):
+            matches.sort(key=lambda match, field=field: get_field(match[1]['data'], field),
+                         reverse=direction == self.DESCENDING)
+        if self._cursor is not None:
+            matches = [match for match in matches if self._after_cursor(*match)]
+        if self._end_cursor is not None:
+            matches = [match for match in matches if self._before_cursor(*match)]
+        if self._limit is not None:
+            matches = matches[-self._limit:] if self._limit_to_last else matches[:self._limit]
+        return [self._client._snapshot(path, entry, self._projection) for path, entry in matches]
+
+    def _run_indexed(self):
+        """
+        Pages of one ascending order_by with range filters on the same field (the
+        cleanup and pagination queries) read from a single-field index, like
+        Firestore, instead of scanning the collection. None when it doesn't apply.
+        """
+        if self._limit is None or len(self._orders) != 1 or self._orders[0][1] != self.ASCENDING:
+            return None
+        if self._limit_to_last or self._end_cursor is not None:
+            return None
+        field = self._orders[0][0]
+        if any(filter_field != field or op not in _RANGE_OPERATORS for filter_field, op, _ in self._filters):
+            return None
+        index = self._client._field_index(self._path, field)
+        if index is None:
+            return None
+
+        start = 0
+        try:
+            for _, op, value in self._filters:
+                if op in ('>', '>='):
+                    start = max(start, bisect.bisect_right(index, (value, _ID_MAX)) if op == '>'
+                                else bisect.bisect_left(index, (value,)))
+                elif op == '==':
+                    start = max(start, bisect.bisect_left(index, (value,)))
+            if self._cursor is not None:
+                cursor_value, cursor_id = self._cursor[0][0], self._cursor[1]
+                start = max(start, bisect.bisect_right(index, (cursor_value, cursor_id if cursor_id is not None
+                                                                else _ID_MAX)))
+        except TypeError:
+            return None
+
+        matches = []
+        documents = self._client._documents
+        for value, document_id in itertools.islice(index, start, None):
+            if not all(_OPERATORS[op](value, bound) for _, op, bound in self._filters):
+                break  # Sorted: nothing further matches the upper bound either
+            path = f"{self._path}/{document_id}"
+            matches.append((path, documents[path]))
+            if len(matches) == self._limit:
+                break
+        return matches
+
+    def _after_cursor(self, path, entry):
+        cursor_values, cursor_id = self._cursor
+        for (field, direction), cursor_value in zip(self._orders, cursor_values):
+            value = get_field(entry['data'], field)
+            if value == cursor_value:
+                continue
+            return value > cursor_value if direction == self.ASCENDING else value < cursor_value
+        return cursor_id is not None and path.rsplit('/', 1)[-1] > cursor_id
+
+    def _before_cursor(self, path, entry):
+        cursor_values, cursor_id = self._end_cursor
+        for (field, direction), cursor_value in zip(self._orders, cursor_values):
+            value = get_field(entry['data'], field)
+            if value == cursor_value:
+                continue
+            return value < cursor_value if direction == self.ASCENDING else value > cursor_value
+        return cursor_id is not None and path.rsplit('/', 1)[-1] < cursor_id
+
+    def get(self):
+        with self._client._lock:
+            docs = self._run()
+        self._client.stats.count('reads', max(1, len(docs)))
+        return docs
+
+    def stream(self):
+        return iter(self.get())
+
+    def on_snapshot(self, callback):
+        """Calls callback(QuerySnapshot) now and after every commit that touches the collection."""
+        return self._client._listen(self, callback)
+
+class AggregationQuery:
+    def __init__(self, query, alias):
+        self._query = query
+        self._alias = alias
+
+    def get(self):
+        client = self._query._client
+        with client._lock:
+            matches = len(self._query._run())
+        # Firestore bills one read per 1,000 index entries counted
+        client.stats.count('reads', max(1, -(-matches // 1000)))
+        return [[AggregationResult(self._alias, matches, client._clock)]]
+
+class CollectionReference(Query):
+    def __init__(self, client, path):
+        super().__init__(client, path)
+        self.id = path.rsplit('/', 1)[-1]
+        self.path = path
+
+    def document(self, document_id=None):
+        return DocumentReference(self._client, f"{self.path}/{document_id or uuid.uuid4().hex[:20]}")
+
+    def add(self, data):
+        reference = self.document()
+        reference.set(data)
+        return reference
+
+    def list_documents(self):
+        with self._client._lock:
+            return [DocumentReference(self._client, path) for path, _ in self._client._children(self.path)]
+
+class DocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+
+    @property
+    def parent(self):
+        return CollectionReference(self._client, self.path.rsplit('/', 1)[0])
+
+    def collection(self, collection_id):
+        return CollectionReference(self._client, f"{self.path}/{collection_id}")
+
+    def collections(self):
+        """Subcollections that currently hold documents."""
+        with self._client._lock:
+            names = [name for name in self._client._subcollections.get(self.path, ())
+                     if self._client._collections.get(f"{self.path}/{name}")]
+        return [self.collection(name) for name in sorted(names)]
+
+    def get(self, transaction=None):
+        if transaction is not None:
+            return transaction.get(self)
+        with self._client._lock:
+            snapshot = self._client._snapshot(self.path, self._client._documents.get(self.path))
+        self._client.stats.count('reads')
+        return snapshot
+
+    def set(self, data, merge=False):
+        self._client._commit([('set', self.path, data, merge)])
+
+    def update(self, field_updates):
+        self._client._commit([('update', self.path, field_updates, False)])
+
+    def delete(self):
+        self._client._commit([('delete', self.path, None, False)])
+
+    def on_snapshot(self, callback):
+        """Calls callback(DocumentSnapshot) now and after every commit that writes this document."""
+        return self._client._listen(self, callback)
+
+# --- Writes ---
+
+class WriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, data, merge=False):
+        self._writes.append(('set', reference.path, data, merge))
+
+    def update(self, reference, field_updates):
+        self._writes.append(('update', reference.path, field_updates, False))
+
+    def delete(self, reference):
+        self._writes.append(('delete', reference.path, None, False))
+
+    def commit(self):
+        self._client._commit(self._writes)
+        self._writes = []
+
+class Transaction(WriteBatch):
+    """
+    Reads lock the document until the transaction ends (see release) and record
+    the version they saw; commit fails if a write outside the transaction
+    changed one of them since.
+    """
+
+    def __init__(self, client, attempt):
+        super().__init__(client)
+        self.attempt = attempt
+        self._read_versions = {}
+        self._locks = []
+
+    def get(self, reference):
+        if self._writes:
+            raise InvalidArgument("Transactions require all reads to be executed before all writes.")
+        if reference.path not in self._read_versions:
+            lock = self._client._document_lock(reference.path)
+            start = time.monotonic()
+            if not lock.acquire(timeout=LOCK_TIMEOUT):
+                raise Aborted(f"Timed out waiting for the lock on {reference.path}.")
+            self._client.stats.record_lock_wait(time.monotonic() - start)
+            self._locks.append(lock)
+        with self._client._lock:
+            entry = self._client._documents.get(reference.path)
+            snapshot = self._client._snapshot(reference.path, entry)
+        self._read_versions[reference.path] = entry['version'] if entry else 0
+        self._client.stats.count('reads')
+        return snapshot
+
+    def commit(self):
+        self._client._commit(self._writes, self._read_versions)
+
+    def release(self):
+        while self._locks:
+            self._locks.pop().release()
+
+# --- Contention model ---
+
+class ContentionModel:
+    """
+    Adds `commit_latency` to every commit and lets each document take one write
+    per `document_interval` seconds; writes to a busy document queue behind it.
+    A transaction whose reads change while it waits is retried, as in Firestore.
+    """
+
+    def __init__(self, commit_latency=0.002, document_interval=0.002, jitter=0.2):
+        self.commit_latency = commit_latency
+        self.document_interval = document_interval
+        self.jitter = jitter
+        self._next_free = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, paths):
+        """Seconds this commit has to wait before it lands."""
+        now = time.monotonic()
+        wait = 0.0
+        with self._lock:
+            for path in paths:
+                start = max(now, self._next_free.get(path, 0.0))
+                self._next_free[path] = start + self.document_interval
+                wait = max(wait, start - now)
+        latency = self.commit_latency * (1 + random.uniform(-self.jitter, self.jitter))
+        return wait + max(0.0, latency)
+
+class Stats:
+    """Operation counters, including per-document writes and time spent queueing or waiting for locks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counters = {}
+        self.document_writes = {}
+        self.queue_seconds = 0.0
+        self.lock_wait_seconds = 0.0
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_lock_wait(self, waited):
+        with self._lock:
+            self.lock_wait_seconds += waited
+
+    def record_commit(self, paths, waited):
+        with self._lock:
+            self.queue_seconds += waited
+            for path in paths:
+                self.document_writes[path] = self.document_writes.get(path, 0) + 1
+
+    def hottest(self, count=5):
+        with self._lock:
+            return sorted(self.document_writes.items(), key=lambda item: item[1], reverse=True)[:count]
+
+    def summary(self):
+        with self._lock:
+            counters = dict(self.counters)
+        parts = [f"{name}: {value}" for name, value in sorted(counters.items())]
+        parts.append(f"commit queueing: {self.queue_seconds:.2f}s")
+        parts.append(f"lock waits: {self.lock_wait_seconds:.2f}s")
+        return ', '.join(parts)
+
+# --- Client ---
+
+class Client:
+    """One in-memory database. Safe to use from many threads."""
+
+    def __init__(self, contention=None, strict=True):
+        self.contention = contention
+        self.strict = strict
+        self.stats = Stats()
+        self._documents = {}
+        self._collections = {}     # collection path -> {document path: None}, in insertion order
+        self._subcollections = {}  # document path -> IDs of collections created under it
+        self._field_indexes = {}   # (collection path, field) -> sorted [(value, document ID)], built on first use
+        self._lock = threading.RLock()
+        self._listeners = {}
+        self._listener_ids = itertools.count(1)
+        self._clock = 0.0
+        self._document_locks = {}
+
+    def collection(self, collection_id):
+        self._check_path(collection_id)
+        return CollectionReference(self, collection_id)
+
+    def document(self, path):
+        return DocumentReference(self, path)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def transaction(self, attempt=1):
+        """A bare transaction; call its release() when done. run_transaction does both."""
+        return Transaction(self, attempt)
+
+    def run_transaction(self, function, max_attempts=MAX_TRANSACTION_ATTEMPTS):
+        """
+        Calls function(transaction) and commits its writes, retrying from scratch
+        after a lock timeout or a stale read, like runTransaction() in the
+        Firestore SDKs.
+        """
+        for attempt in range(1, max_attempts + 1):
+            transaction = Transaction(self, attempt)
+            self.stats.count('transaction_attempts')
+            try:
+                result = function(transaction)
+                transaction.commit()
+                return result
+            except Aborted:
+                self.stats.count('transaction_retries')
+            finally:
+                transaction.release()
+            if attempt < max_attempts:
+                time.sleep(random.uniform(0, RETRY_BACKOFF * RETRY_BACKOFF_FACTOR ** (attempt - 1)))
+        self.stats.count('transaction_failures')
+        raise Aborted(f"Transaction failed after {max_attempts} attempts (too much contention).")
+
+    def _document_lock(self, path):
+        with self._lock:
+            return self._document_locks.setdefault(path, threading.Lock())
+
+    def now(self):
+        """Server timestamp: wall-clock seconds, strictly increasing."""
+        with self._lock:
+            self._clock = max(time.time(), self._clock + 1e-6)
+            return self._clock
+
+    def _check_path(self, path):
+        if not self.strict:
+            return
+        layout = LAYOUT
+        for index, part in enumerate(path.split('/')):
+            if index % 2 == 1:
+                continue
+            if part not in layout:
+                raise InvalidArgument(f"Collection '{part}' is not part of the app's layout ({path}).")
+            layout = layout[part]
+
+    def _children(self, collection_path):
+        """(path, entry) for the documents directly in a collection."""
+        return [(path, self._documents[path]) for path in self._collections.get(collection_path, ())]
+
+    def _snapshot(self, path, entry, projection=None):
+        reference = DocumentReference(self, path)
+        if entry is None:
+            return DocumentSnapshot(reference, None)
+        if projection is None:
+            data = copy.deepcopy(entry['data'])
+        else:
+            data = {}
+            for field in projection:
+                if _has_field(entry['data'], field):
+                    _apply_update(data, {field: get_field(entry['data'], field)}, None)
+        return DocumentSnapshot(reference, data, entry['update_time'], entry['create_time'])
+
+    def _field_index(self, collection_path, field):
+        """The sorted index for an ordered query, or None if the field's values don't compare."""
+        key = (collection_path, field)
+        if key not in self._field_indexes:
+            index = [(get_field(self._documents[path]['data'], field), path.rsplit('/', 1)[-1])
+                     for path in self._collections.get(collection_path, ())
+                     if _has_field(self._documents[path]['data'], field)]
+            try:
+                index.sort()
+            except TypeError:
+                index = None
+            self._field_indexes[key] = index
+        return self._field_indexes[key]
+
+    def _update_field_indexes(self, path, old_entry, new_entry):
+        collection_path, document_id = path.rsplit('/', 1)
+        for (indexed_collection, field), index in self._field_indexes.items():
+            if indexed_collection != collection_path or index is None:
+                continue
+            try:
+                if old_entry and _has_field(old_entry['data'], field):
+                    old_key = (get_field(old_entry['data'], field), document_id)
+                    position = bisect.bisect_left(index, old_key)
+                    if position < len(index) and index[position] == old_key:
+                        del index[position]
+                if new_entry and _has_field(new_entry['data'], field):
+                    bisect.insort(index, (get_field(new_entry['data'], field), document_id))
+            except TypeError:
+                self._field_indexes[(indexed_collection, field)] = None
+
+    def _index(self, path, exists):
+        collection_path, _ = path.rsplit('/', 1)
+        documents = self._collections.get(collection_path)
+        if exists:
+            if documents is None:
+                documents = self._collections[collection_path] = {}
+                if '/' in collection_path:
+                    parent, collection_id = collection_path.rsplit('/', 1)
+                    self._subcollections.setdefault(parent, set()).add(collection_id)
+            documents[path] = None
+        elif documents is not None:
+            documents.pop(path, None)
+
+    def _commit(self, writes, read_versions=None):
+        paths = [path for _, path, _, _ in writes]
+        for path in paths:
+            self._check_path(path)
+        waited = self.contention.reserve(paths) if (self.contention and paths) else 0.0
+        if waited:
+            time.sleep(waited)
+
+        with self._lock:
+            for path, version in (read_versions or {}).items():
+                entry = self._documents.get(path)
+                if (entry['version'] if entry else 0) != version:
+                    self.stats.count('aborted_commits')
+                    raise Aborted(f"Document {path} changed during the transaction.")
+
+            now = self.now()
+            staged = {}
+            for kind, path, data, merge in writes:
+                entry = staged.get(path, self._documents.get(path))
+                if kind == 'delete':
+                    staged[path] = None
+                    continue
+                if kind == 'update' and entry is None:
+                    raise NotFound(f"No document to update: {path}")
+                if kind == 'set' and not merge:
+                    new_data = _resolve(data, None, now)
+                else:
+                    new_data = copy.deepcopy(entry['data']) if entry else {}
+                    if kind == 'update':
+                        _apply_update(new_data, data, now)
+                    else:
+                        _merge(new_data, data, now)
+                staged[path] = {
+                    'data': new_data,
+                    'version': (entry['version'] if entry else 0) + 1,
+                    'create_time': entry['create_time'] if entry else now,
+                    'update_time': now
+                }
+
+            for path, entry in staged.items():
+                self._update_field_indexes(path, self._documents.get(path), entry)
+                if entry is None:
+                    self._documents.pop(path, None)
+                else:
+                    self._documents[path] = entry
+                self._index(path, entry is not None)
+            notifications = self._collect_notifications(set(staged))
+
+        self.stats.count('writes', len(writes))
+        self.stats.record_commit(paths, waited)
+        for callback, snapshot in notifications:
+            callback(snapshot)
+
+    # --- Listeners ---
+
+    def _listen(self, target, callback):
+        listener_id = next(self._listener_ids)
+        with self._lock:
+            state = {'target': target, 'callback': callback, 'docs': []}
+            self._listeners[listener_id] = state
+            snapshot = self._listener_snapshot(state)
+        callback(snapshot)
+
+        def unsubscribe():
+            with self._lock:
+                self._listeners.pop(listener_id, None)
+        return unsubscribe
+
+    def _collect_notifications(self, changed_paths):
+        """Snapshots for the listeners a commit affects; delivered after the lock is released."""
+        notifications = []
+        for state in list(self._listeners.values()):
+            target = state['target']
+            if isinstance(target, DocumentReference):
+                affected = target.path in changed_paths
+            else:
+                prefix = target._path + '/'
+                depth = target._path.count('/') + 1
+                affected = any(path.startswith(prefix) and path.count('/') == depth for path in changed_paths)
+            if affected:
+                notifications.append((state['callback'], self._listener_snapshot(state, changed_paths)))
+        return notifications
+
+    def _listener_snapshot(self, state, changed_paths=()):
+        target = state['target']
+        if isinstance(target, DocumentReference):
+            self.stats.count('listener_reads')
+            return self._snapshot(target.path, self._documents.get(target.path))
+
+        docs = target._run()
+        old_index = {doc.reference.path: index for index, doc in enumerate(state['docs'])}
+        new_index = {doc.reference.path: index for index, doc in enumerate(docs)}
+        changes = []
+        for index, doc in enumerate(state['docs']):
+            if doc.reference.path not in new_index:
+                changes.append(DocumentChange(DocumentChange.REMOVED, doc, index, -1))
+        for index, doc in enumerate(docs):
+            path = doc.reference.path
+            if path not in old_index:
+                changes.append(DocumentChange(DocumentChange.ADDED, doc, -1, index))
+            elif path in changed_paths:
+                changes.append(DocumentChange(DocumentChange.MODIFIED, doc, old_index[path], index))
+        state['docs'] = docs
+        # Firestore bills listeners for the documents that changed, not the whole result
+        self.stats.count('listener_reads', max(1, len(changes)))
+        return QuerySnapshot(docs, changes, self._clock)
@@ -0,0 +1,403 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import app_functions
+import firestore_standin
+
+# ==============================================================================
+#  Load generator for the student join and poll-answer paths
+#
+#  Simulates N students in each of M rooms against the Firebase emulators:
+#  every student joins (rooms/{code}/students/{id}, as ClassroomSDK.joinRoom
+#  does) and then answers the active poll through the submitPollAnswer
+#  function, which runs a transaction on the room document.
+#
+#  Usage:
+#    - Start the emulators:   firebase emulators:start --only firestore,functions
+#    - 40 students, 1 room:   python tools/load_test.py
+#    - 5 rooms of 40, 10s ramp-up: python tools/load_test.py --rooms 5 --students 40 --ramp-up 10
+#    - Open-text poll:        python tools/load_test.py --poll-type open_text
+#    - No emulators (in-memory stand-in with a contention model):
+#                             python tools/load_test.py --backend standin --students 200
+# ==============================================================================
+
+DEFAULT_FIRESTORE_HOST = os.environ.get('FIRESTORE_EMULATOR_HOST', 'localhost:8080')
+DEFAULT_FUNCTIONS_HOST = 'localhost:5001'
+DEFAULT_REGION = 'us-central1'  # DEPLOY_REGION in functions/index.js
+FIREBASERC_FILE = '.firebaserc'
+# The emulator treats this token as an admin, so security rules don't apply
+EMULATOR_ADMIN_TOKEN = 'Bearer owner'
+REQUEST_TIMEOUT = 30
+DEFAULT_MAX_CONNECTIONS = 200
+POLL_OPTIONS = ['A', 'B', 'C', 'D']
+
+def default_project():
+    """The default project from .firebaserc, as the Firebase CLI would pick it."""
+    try:
+        with open(FIREBASERC_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)['projects']['default']
+    except (OSError, ValueError, KeyError):
+        return 'demo-fireclass'
+
+# --- Minimal asyncio HTTP/1.1 client (stdlib only) ---
+
+class RequestError(Exception):
+    """A request that failed; `kind` is what the report groups errors by."""
+
+    def __init__(self, kind, message):
+        super().__init__(message)
+        self.kind = kind
+
+async def http_request(method, url, body=None, headers=None, timeout=REQUEST_TIMEOUT):
+    """Sends one request on a fresh connection. Returns (status, parsed JSON body or None)."""
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else '')
+    payload = json.dumps(body).encode('utf-8') if body is not None else b''
+    lines = [f"{method} {path} HTTP/1.1", f"Host: {parts.netloc}", "Connection: close",
+             f"Content-Length: {len(payload)}"]
+    if body is not None:
+        lines.append("Content-Type: application/json")
+    lines += [f"{key}: {value}" for key, value in (headers or {}).items()]
+
+    async def exchange():
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        try:
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + payload)
+            await writer.drain()
+            return await reader.read()
+        finally:
+            writer.close()
+
+    try:
+        raw = await asyncio.wait_for(exchange(), timeout)
+    except asyncio.TimeoutError:
+        raise RequestError('timeout', f"{method} {url} timed out after {timeout}s")
+    except OSError as e:
+        raise RequestError('connection', f"{method} {url}: {e}")
+
+    head, _, content = raw.partition(b'\r\n\r\n')
+    header_lines = head.decode('latin-1').split('\r\n')
+    status = int(header_lines[0].split()[1])
+    response_headers = {k.strip().lower(): v.strip() for k, _, v in (line.partition(':') for line in header_lines[1:])}
+    if response_headers.get('transfer-encoding') == 'chunked':
+        content = decode_chunked(content)
+    try:
+        return status, json.loads(content) if content else None
+    except ValueError:
+        return status, None
+
+def decode_chunked(data):
+    body = b''
+    while data:
+        size_line, _, data = data.partition(b'\r\n')
+        size = int(size_line.split(b';')[0], 16)
+        if size == 0:
+            break
+        body += data[:size]
+        data = data[size + 2:]
+    return body
+
+# --- Firestore REST values ---
+
+def to_value(value):
+    """Python value -> Firestore REST Value."""
+    if value is None:
+        return {'nullValue': None}
+    if isinstance(value, bool):
+        return {'booleanValue': value}
+    if isinstance(value, int):
+        return {'integerValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    if isinstance(value, dict):
+        return {'mapValue': {'fields': {k: to_value(v) for k, v in value.items()}}}
+    if isinstance(value, (list, tuple)):
+        return {'arrayValue': {'values': [to_value(v) for v in value]}}
+    return {'stringValue': str(value)}
+
+def from_value(value):
+    """Firestore REST Value -> Python value."""
+    kind, inner = next(iter(value.items()))
+    if kind == 'integerValue':
+        return int(inner)
+    if kind == 'mapValue':
+        return {k: from_value(v) for k, v in inner.get('fields', {}).items()}
+    if kind == 'arrayValue':
+        return [from_value(v) for v in inner.get('values', [])]
+    return inner
+
+class EmulatorBackend:
+    """Talks to the Firestore and Functions emulators the way the app does."""
+
+    def __init__(self, project, firestore_host, functions_host, region, timeout=REQUEST_TIMEOUT):
+        self.project = project
+        self.database = f"projects/{project}/databases/(default)/documents"
+        self.firestore_url = f"http://{firestore_host}/v1/{self.database}"
+        self.functions_url = f"http://{functions_host}/{project}/{region}"
+        self.timeout = timeout
+
+    async def _firestore(self, method, path, body=None):
+        status, data = await http_request(method, f"{self.firestore_url}{path}", body,
+                                          {'Authorization': EMULATOR_ADMIN_TOKEN}, self.timeout)
+        if status != 200:
+            error = (data or {}).get('error', {}) if isinstance(data, dict) else {}
+            raise RequestError(error.get('status', f"HTTP {status}"), error.get('message', f"HTTP {status}"))
+        return data
+
+    async def create_room(self, room_code, poll_type):
+        """Same shape as ClassroomSDK.initializeRoom, with a poll already running."""
+        room = {
+            'room_code': room_code,
+            'teacher_uid': 'load-test-teacher',
+            'settings': {
+                'ai_active': False,
+                'ai_model': 'chatgpt',
+                'current_command': None,
+                'currentPoll': {'isActive': True, 'id': f"poll_{room_code}", 'type': poll_type,
+                                'question': 'Load test question', 'options': POLL_OPTIONS, 'responses': {}}
+            }
+        }
+        await self._firestore('PATCH', f"/rooms/{room_code}", {'fields': to_value(room)['mapValue']['fields']})
+
+    async def join(self, room_code, student_id, player_name):
+        """ClassroomSDK.joinRoom: set students/{id} with a server timestamp."""
+        write = {
+            'update': {'name': f"{self.database}/rooms/{room_code}/students/{student_id}",
+                       'fields': {'uid': to_value(student_id), 'name': to_value(player_name)}},
+            'updateTransforms': [{'fieldPath': 'joined_at', 'setToServerValue': 'REQUEST_TIME'}]
+        }
+        await self._firestore('POST', ':commit', {'writes': [write]})
+
+    async def submit_answer(self, room_code, student_id, player_name, answer):
+        """Calls submitPollAnswer. Returns the number of transaction attempts it reports."""
+        body = {'data': {'roomCode': room_code, 'studentId': student_id,
+                         'playerName': player_name, 'answer': answer}}
+        status, data = await http_request('POST', f"{self.functions_url}/submitPollAnswer", body,
+                                          timeout=self.timeout)
+        if status != 200 or not isinstance(data, dict) or 'result' not in data:
+            error = data.get('error', {}) if isinstance(data, dict) else {}
+            raise RequestError(error.get('status', f"HTTP {status}"), error.get('message', f"HTTP {status}"))
+        # Functions that predate the attempts count report 1
+        return data['result'].get('attempts', 1)
+
+    async def read_responses(self, room_code):
+        document = await self._firestore('GET', f"/rooms/{room_code}")
+        room = from_value({'mapValue': {'fields': document.get('fields', {})}})
+        return room.get('settings', {}).get('currentPoll', {}).get('responses', {})
+
+    def print_details(self):
+        pass
+
+    async def close(self):
+        pass
+
+class StandinBackend:
+    """
+    Runs the same operations against firestore_standin in this process: the
+    join write, and submitPollAnswer as ported in app_functions.
+    Calls run on a thread pool so they overlap and contend like real clients.
+    """
+
+    def __init__(self, contention, workers=DEFAULT_MAX_CONNECTIONS):
+        self.db = firestore_standin.Client(contention)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    async def _call(self, function, *args):
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+        except firestore_standin.StandinError as e:
+            raise RequestError(e.code, str(e))
+
+    def _room(self, room_code):
+        return self.db.collection('rooms').document(room_code)
+
+    async def create_room(self, room_code, poll_type):
+        room = {
+            'room_code': room_code,
+            'created_at': firestore_standin.SERVER_TIMESTAMP,
+            'teacher_uid': 'load-test-teacher',
+            'settings': {
+                'ai_active': False,
+                'ai_model': 'chatgpt',
+                'current_command': None,
+                'currentPoll': {'isActive': True, 'id': f"poll_{room_code}", 'type': poll_type,
+                                'question': 'Load test question', 'options': POLL_OPTIONS, 'responses': {}}
+            }
+        }
+        await self._call(self._room(room_code).set, room)
+
+    async def join(self, room_code, student_id, player_name):
+        await self._call(self._room(room_code).collection('students').document(student_id).set,
+                         {'uid': student_id, 'name': player_name, 'joined_at': firestore_standin.SERVER_TIMESTAMP})
+
+    async def submit_answer(self, room_code, student_id, player_name, answer):
+        return await self._call(app_functions.submit_poll_answer, self.db, room_code, student_id, player_name, answer)
+
+    async def read_responses(self, room_code):
+        room = await self._call(self._room(room_code).get)
+        return room.get('settings.currentPoll.responses') or {}
+
+    def print_details(self):
+        print(f"  Stand-in: {self.db.stats.summary()}")
+        for path, writes in self.db.stats.hottest(3):
+            print(f"    🔥 {path}: {writes} writes")
+
+    async def close(self):
+        self.executor.shutdown()
+
+# --- Load run ---
+
+class Stats:
+    """Latencies and errors for one operation."""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = {}
+        self.first_start = None
+        self.last_end = None
+
+    def add(self, start, end, error=None):
+        self.first_start = start if self.first_start is None else min(self.first_start, start)
+        self.last_end = end if self.last_end is None else max(self.last_end, end)
+        if error:
+            self.errors[error] = self.errors.get(error, 0) + 1
+        else:
+            self.latencies.append(end - start)
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+async def run_student(backend, room_code, index, start_delay, think_time, poll_type, limiter, stats, attempts):
+    student_id = f"student_{uuid.uuid4().hex[:12]}"
+    player_name = f"Student {index + 1}"
+    await asyncio.sleep(start_delay)
+
+    async def timed(operation, call):
+        async with limiter:
+            start = time.perf_counter()
+            try:
+                result = await call()
+            except RequestError as e:
+                stats[operation].add(start, time.perf_counter(), e.kind)
+                return None, False
+            stats[operation].add(start, time.perf_counter())
+            return result, True
+
+    _, joined = await timed('join', lambda: backend.join(room_code, student_id, player_name))
+    if not joined:
+        return
+    if think_time:
+        await asyncio.sleep(random.uniform(0, think_time))
+    answer = random.choice(POLL_OPTIONS) if poll_type != 'open_text' else f"Answer from {player_name}"
+    result, answered = await timed('answer', lambda: backend.submit_answer(room_code, student_id, player_name, answer))
+    if answered:
+        attempts.append(result)
+
+async def run_load(backend, rooms, students, ramp_up, think_time, poll_type, max_connections):
+    """Runs one load test. Returns (stats by operation, attempts list, expected/recorded answers)."""
+    room_codes = [f"L{uuid.uuid4().hex[:5].upper()}" for _ in range(rooms)]
+    print(f"--- Creating {rooms} room(s) with an active '{poll_type}' poll... ---")
+    await asyncio.gather(*(backend.create_room(code, poll_type) for code in room_codes))
+
+    total = rooms * students
+    print(f"--- Starting {total} students ({students} per room), ramp-up {ramp_up:g}s... ---")
+    stats = {'join': Stats('join'), 'answer': Stats('answer')}
+    attempts = []
+    limiter = asyncio.Semaphore(max_connections)
+    tasks = []
+    for index in range(students):
+        for room_number, code in enumerate(room_codes):
+            # Students are spread evenly over the ramp-up, interleaved across rooms
+            order = index * rooms + room_number
+            delay = ramp_up * order / total if total else 0
+            tasks.append(run_student(backend, code, index, delay, think_time, poll_type, limiter, stats, attempts))
+    await asyncio.gather(*tasks)
+
+    recorded = 0
+    for code in room_codes:
+        recorded += len(await backend.read_responses(code))
+    return stats, attempts, recorded
+
+def print_report(stats, attempts, recorded, expected):
+    print("\n" + "="*70)
+    print(f"  {'operation':<10} {'ok':>6} {'errors':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'ops/s':>8}")
+    for op in stats.values():
+        latencies = sorted(op.latencies)
+        duration = (op.last_end - op.first_start) if op.first_start is not None else 0
+        throughput = len(latencies) / duration if duration else 0
+        errors = sum(op.errors.values())
+        cells = [f"{percentile(latencies, q) * 1000:>7.1f}ms" for q in (0.50, 0.95, 0.99)]
+        cells.append(f"{(latencies[-1] if latencies else 0) * 1000:>7.1f}ms")
+        print(f"  {op.name:<10} {len(latencies):>6} {errors:>6} {' '.join(cells)} {throughput:>8.1f}")
+        for kind, count in sorted(op.errors.items()):
+            print(f"    ❌ {kind}: {count}")
+
+    retries = sum(count - 1 for count in attempts)
+    contended = sum(1 for count in attempts if count > 1)
+    print(f"\n  Transaction attempts: {sum(attempts)} for {len(attempts)} successful answers "
+          f"({retries} retries; {contended} answers contended, max {max(attempts, default=0)} attempts)")
+    status = '✅' if recorded == expected else '⚠️ '
+    print(f"  {status} Responses recorded in the room documents: {recorded} of {expected} answered")
+    print("="*70)
+
+async def main_async(args):
+    if args.backend == 'standin':
+        contention = firestore_standin.ContentionModel(args.commit_latency, args.document_interval)
+        backend = StandinBackend(contention, args.max_connections)
+    else:
+        backend = EmulatorBackend(args.project, args.firestore_host, args.functions_host, args.region, args.timeout)
+    start = time.perf_counter()
+    try:
+        stats, attempts, recorded = await run_load(backend, args.rooms, args.students, args.ramp_up,
+                                                   args.think_time, args.poll_type, args.max_connections)
+    finally:
+        await backend.close()
+    print(f"\n⏱️  Finished in {time.perf_counter() - start:.2f}s")
+    print_report(stats, attempts, recorded, len(attempts))
+    backend.print_details()
+    return 0 if not any(op.errors for op in stats.values()) else 1
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the student join and poll-answer paths on the Firebase emulators.")
+    parser.add_argument('--rooms', type=int, default=1, help="Number of rooms (default: 1).")
+    parser.add_argument('--students', type=int, default=40, help="Students per room (default: 40).")
+    parser.add_argument('--ramp-up', type=float, default=0,
+                        help="Seconds over which students start; 0 starts them all at once (default: 0).")
+    parser.add_argument('--think-time', type=float, default=0,
+                        help="Each student waits up to this many seconds between joining and answering (default: 0).")
+    parser.add_argument('--poll-type', choices=['multiple_choice', 'open_text'], default='multiple_choice')
+    parser.add_argument('--max-connections', type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help=f"Requests in flight at once (default: {DEFAULT_MAX_CONNECTIONS}).")
+    parser.add_argument('--backend', choices=['emulator', 'standin'], default='emulator',
+                        help="'emulator' talks to the Firebase emulators (default); 'standin' runs against "
+                             "the in-memory Firestore stand-in in tools/firestore_standin.py.")
+    parser.add_argument('--commit-latency', type=float, default=0.002,
+                        help="Stand-in only: seconds each commit takes (default: 0.002).")
+    parser.add_argument('--document-interval', type=float, default=0.002,
+                        help="Stand-in only: minimum seconds between writes to one document (default: 0.002).")
+    parser.add_argument('--project', default=default_project(), help="Project ID (default: from .firebaserc).")
+    parser.add_argument('--firestore-host', default=DEFAULT_FIRESTORE_HOST,
+                        help=f"Firestore emulator host:port (default: {DEFAULT_FIRESTORE_HOST}).")
+    parser.add_argument('--functions-host', default=DEFAULT_FUNCTIONS_HOST,
+                        help=f"Functions emulator host:port (default: {DEFAULT_FUNCTIONS_HOST}).")
+    parser.add_argument('--region', default=DEFAULT_REGION, help=f"Functions region (default: {DEFAULT_REGION}).")
+    parser.add_argument('--timeout', type=float, default=REQUEST_TIMEOUT,
+                        help=f"Per-request timeout in seconds (default: {REQUEST_TIMEOUT}).")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import argparse
+import json
+import random
+import sys
+import time
+
+import app_functions
+import firestore_standin
+
+# ==============================================================================
+#  Benchmark: joining a room's chat with a long message history
+#
+#  Seeds the in-memory stand-in with a room of 100, 1,000 and 10,000 messages
+#  (some of them private, teacher to one student) and measures what a student
+#  and the teacher download when they join, and then to scroll back through
+#  the whole history, in three ways:
+#    - legacy:    the whole messages collection, private messages filtered
+#                 out on the client (listenForMessages before the live window)
+#    - window:    the newest 50 messages the reader may see, then pages of 50
+#                 (listenForMessages + loadOlderMessages in ClassroomSDK.js)
+#    - compacted: the same after compactMessages has rolled all but the newest
+#                 messages into archive documents
+#
+#  Bytes are the documents' JSON plus a fixed per-document overhead, so they
+#  are approximate; latency is the stand-in's query time plus a round trip and
+#  the transfer time at --bandwidth. Every reader must end up with exactly the
+#  messages addressed to it, once each.
+#
+#  Usage:
+#    python tools/message_window_benchmark.py
+#    python tools/message_window_benchmark.py --messages 100,1000,10000,50000 --bandwidth 2
+# ==============================================================================
+
+DEFAULT_SIZES = '100,1000,10000'
+CLASS_SIZE = 30
+PRIVATE_FRACTION = 0.1
+TEACHER_FRACTION = 0.2
+# Share the previous message's timestamp, as messages in the same second of a busy room do
+SAME_TIMESTAMP_FRACTION = 0.2
+# messageWindow, messagePageSize and archiveChunksPerRead in ClassroomSDK.js
+MESSAGE_WINDOW = 50
+MESSAGE_PAGE_SIZE = 50
+ARCHIVE_CHUNKS_PER_READ = 2
+DOCUMENT_OVERHEAD = 100  # Bytes per document besides its fields: name, update time, framing
+SEED_BATCH_SIZE = 500
+MESSAGE_INTERVAL = 2.0  # Seconds between seeded messages
+ROOM_CODE = '1234'
+TEACHER_UID = 'teacher_uid'
+MODES = ['legacy', 'window', 'compacted']
+
+def seed(db, messages, rng):
+    """A room with `messages` messages; returns the students' IDs."""
+    students = [f"student_{index:02d}" for index in range(CLASS_SIZE)]
+    room_ref = db.collection('rooms').document(ROOM_CODE)
+    room_ref.set({'room_code': ROOM_CODE, 'teacher_uid': TEACHER_UID, 'settings': {}})
+    # Spread over the lesson: a batch's SERVER_TIMESTAMPs would all be the same
+    start = db.now() - messages * MESSAGE_INTERVAL
+    batch = db.batch()
+    timestamp = start
+    for number in range(messages):
+        if number and rng.random() >= SAME_TIMESTAMP_FRACTION:
+            timestamp = start + number * MESSAGE_INTERVAL
+        message = {'content': f"Message {number}: " + 'x' * rng.randint(10, 120), 'timestamp': timestamp}
+        if rng.random() < PRIVATE_FRACTION:
+            recipient = rng.choice(students)
+            message.update(sender='Teacher', sender_uid=TEACHER_UID, recipient_uid=recipient, is_teacher=True,
+                           is_private=True, audience=[recipient, TEACHER_UID])
+        elif rng.random() < TEACHER_FRACTION:
+            message.update(sender='Teacher', sender_uid=TEACHER_UID, is_teacher=True, audience=['all'])
+        else:
+            sender = rng.choice(students)
+            message.update(sender=f"Student {sender[-2:]}", sender_uid=sender, is_teacher=False, audience=['all'])
+        batch.set(room_ref.collection('messages').document(), message)
+        if (number + 1) % SEED_BATCH_SIZE == 0:
+            batch.commit()
+            batch = db.batch()
+    batch.commit()
+    return students
+
+def wire_bytes(docs):
+    return sum(len(json.dumps(doc.to_dict(), default=str)) + len(doc.reference.path) + DOCUMENT_OVERHEAD
+               for doc in docs)
+
+class Reader:
+    """The message reads of ClassroomSDK.js, for one student (or the teacher)."""
+
+    def __init__(self, db, uid, is_teacher):
+        self.db = db
+        self.uid = uid
+        self.is_teacher = is_teacher
+        self.room_ref = db.collection('rooms').document(ROOM_CODE)
+        self.requests = 0
+        self.has_older = False
+        self.cursor = None
+        self.archive_boundary = None
+        self.archive_cursor = None
+        self.archive_oldest_end = None
+        self.archive_pending = []
+        self.archive_exhausted = False
+        self.loaded_ids = set()
+
+    def get(self, query):
+        self.requests += 1
+        return query.get()
+
+    def filter_by_audience(self, query):
+        if self.is_teacher:
+            return query
+        return query.where('audience', 'array_contains_any', ['all', self.uid])
+
+    def legacy_join(self):
+        """The whole collection; private messages for others are dropped after the download."""
+        docs = self.get(self.room_ref.collection('messages').order_by('timestamp'))
+        messages = [doc.to_dict() for doc in docs]
+        visible = [message for message in messages if self.is_teacher or not message.get('is_private')
+                   or self.uid in (message.get('recipient_uid'), message.get('sender_uid'))]
+        return docs, visible
+
+    def join(self):
+        """listenForMessages: the first snapshot of the live window."""
+        docs = self.get(self.filter_by_audience(self.room_ref.collection('messages'))
+                        .order_by('timestamp').limit_to_last(MESSAGE_WINDOW))
+        self.cursor = docs[0] if docs else None
+        self.has_older = len(docs) >= MESSAGE_WINDOW
+        self.loaded_ids.update(doc.id for doc in docs)
+        return docs, [doc.to_dict() for doc in docs]
+
+    def load_older(self):
+        """loadOlderMessages: (documents downloaded, messages, oldest first)."""
+        if not self.has_older:
+            return [], []
+        if self.archive_boundary is None:
+            docs = self.get(self.filter_by_audience(self.room_ref.collection('messages'))
+                            .order_by('timestamp').end_before(self.cursor).limit_to_last(MESSAGE_PAGE_SIZE))
+            if docs:
+                self.cursor = docs[0]
+            if len(docs) < MESSAGE_PAGE_SIZE:
+                self.archive_boundary = self.cursor.get('timestamp')
+            if docs:
+                self.loaded_ids.update(doc.id for doc in docs)
+                return docs, [doc.to_dict() for doc in docs]
+
+        def is_older(message):
+            if 'id' not in message:
+                return message['timestamp'] < self.archive_boundary
+            return message['timestamp'] <= self.archive_boundary and message['id'] not in self.loaded_ids
+
+        def is_safe(message):
+            return self.archive_exhausted or message['timestamp'] > self.archive_oldest_end
+
+        docs = []
+        while not self.archive_exhausted and (self.archive_oldest_end is None or
+                                              sum(map(is_safe, self.archive_pending)) < MESSAGE_PAGE_SIZE):
+            query = self.filter_by_audience(self.room_ref.collection('messageArchive')).order_by('to')
+            if self.archive_cursor:
+                query = query.end_before(self.archive_cursor)
+            chunks = self.get(query.limit_to_last(ARCHIVE_CHUNKS_PER_READ))
+            self.archive_exhausted = len(chunks) < ARCHIVE_CHUNKS_PER_READ
+            if not chunks:
+                break
+            docs.extend(chunks)
+            for chunk in chunks:
+                self.archive_pending.extend(filter(is_older, chunk.get('messages')))
+            self.archive_pending.sort(key=lambda message: message['timestamp'])
+            self.archive_cursor = chunks[0]
+            self.archive_oldest_end = chunks[0].get('to')
+
+        safe = [message for message in self.archive_pending if is_safe(message)]
+        page = safe[-MESSAGE_PAGE_SIZE:]
+        self.archive_pending = self.archive_pending[:len(self.archive_pending) - len(page)]
+        if self.archive_exhausted and not self.archive_pending:
+            self.has_older = False
+        return docs, page
+
+def timed(reader, function, rtt, bandwidth):
+    """function() -> (docs, messages); returns them with the modelled latency in seconds."""
+    requests = reader.requests
+    start = time.perf_counter()
+    docs, messages = function()
+    query_seconds = time.perf_counter() - start
+    return docs, messages, query_seconds + (reader.requests - requests) * rtt + wire_bytes(docs) * 8 / (bandwidth * 1e6)
+
+def measure(reader, mode, expected, rtt, bandwidth):
+    join = reader.legacy_join if mode == 'legacy' else reader.join
+    docs, messages, join_latency = timed(reader, join, rtt, bandwidth)
+    result = {'join_docs': len(docs), 'join_bytes': wire_bytes(docs), 'join_ms': join_latency * 1000,
+              'history_loads': 0, 'history_requests': 0, 'history_docs': 0, 'history_bytes': 0, 'history_ms': 0.0}
+    requests = reader.requests
+    seen = messages
+
+    # "Load earlier messages" until there are none
+    while mode != 'legacy':
+        docs, older, latency = timed(reader, reader.load_older, rtt, bandwidth)
+        if not older:
+            break
+        result['history_loads'] += 1
+        result['history_docs'] += len(docs)
+        result['history_bytes'] += wire_bytes(docs)
+        result['history_ms'] += latency * 1000
+        seen = older + seen
+    result['history_requests'] = reader.requests - requests
+
+    contents = [message['content'] for message in seen]
+    timestamps = [message['timestamp'] for message in seen]
+    result['complete'] = len(contents) == len(set(contents)) and set(contents) == expected
+    result['in_order'] = timestamps == sorted(timestamps)
+    return result
+
+def run(messages, rtt, bandwidth, seed_value):
+    db = firestore_standin.Client()
+    students = seed(db, messages, random.Random(seed_value))
+    all_messages = [doc.to_dict() for doc in db.collection('rooms').document(ROOM_CODE).collection('messages').get()]
+    readers = {'student': (students[0], False), 'teacher': (TEACHER_UID, True)}
+    expected = {
+        'student': {message['content'] for message in all_messages
+                    if 'all' in message['audience'] or students[0] in message['audience']},
+        'teacher': {message['content'] for message in all_messages}
+    }
+
+    results = []
+    for mode in MODES:
+        if mode == 'compacted':
+            archived = app_functions.compact_room_messages(db, ROOM_CODE)
+            print(f"--- {messages:,} messages: compacted {archived:,} into the archive ---")
+        for role, (uid, is_teacher) in readers.items():
+            result = measure(Reader(db, uid, is_teacher), mode, expected[role], rtt, bandwidth)
+            result.update(messages=messages, mode=mode, role=role)
+            results.append(result)
+    return results
+
+def print_table(results):
+    print("\n" + "="*118)
+    print(f"  {'':<29} {'--------- join ---------':^30} {'------------ full history ------------':^46}")
+    print(f"  {'messages':>8} {'reader':<8} {'mode':<10} {'docs':>7} {'KB':>9} {'latency':>10} "
+          f"{'loads':>6} {'requests':>8} {'docs':>7} {'KB':>9} {'latency':>10} {'all, in order':>13}")
+    for result in results:
+        correct = result['complete'] and result['in_order']
+        print(f"  {result['messages']:>8,} {result['role']:<8} {result['mode']:<10} {result['join_docs']:>7,} "
+              f"{result['join_bytes'] / 1024:>9.1f} {result['join_ms']:>8.0f}ms {result['history_loads']:>6,} "
+              f"{result['history_requests']:>8,} {result['history_docs']:>7,} {result['history_bytes'] / 1024:>9.1f} "
+              f"{result['history_ms']:>8.0f}ms {'✅' if correct else '❌':>12}")
+    print("="*118)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure join-time and history reads for the chat's live window.")
+    parser.add_argument('--messages', default=DEFAULT_SIZES,
+                        help=f"Comma-separated history sizes (default: {DEFAULT_SIZES}).")
+    parser.add_argument('--rtt', type=float, default=0.05, help="Round trip per request, in seconds (default: 0.05).")
+    parser.add_argument('--bandwidth', type=float, default=10.0,
+                        help="Download bandwidth per client, in Mbit/s (default: 10).")
+    parser.add_argument('--seed', type=int, default=1, help="Random seed for the messages (default: 1).")
+    parser.add_argument('--json', metavar='FILE', help="Also write the results to FILE as JSON.")
+    args = parser.parse_args()
+
+    try:
+        sizes = [int(size) for size in args.messages.split(',')]
+    except ValueError:
+        print(f"❌ --messages must be comma-separated numbers, got '{args.messages}'")
+        sys.exit(2)
+
+    results = []
+    for messages in sizes:
+        print(f"--- {messages:,} messages... ---")
+        results.extend(run(messages, args.rtt, args.bandwidth, args.seed))
+    print_table(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"📈 Results written to '{args.json}'")
+    sys.exit(0 if all(result['complete'] and result['in_order'] for result in results) else 1)
+
+if __name__ == "__main__":
+    main()
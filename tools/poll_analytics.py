@@ -0,0 +1,517 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Optional: only needed to write Parquet
+    pyarrow = None
+
+import app_functions
+import firestore_standin
+
+# ==============================================================================
+#  Poll analytics for a term of lessons
+#
+#  Exports every room's questionHistory (with the students and, for sharded
+#  polls, the pollShards the responses live in) into columns of NumPy arrays,
+#  from the in-memory stand-in or from a JSON dump, and computes with
+#  vectorized operations:
+#    - per-poll tallies, respondents and participation (respondents / roster)
+#    - per-student answer tallies, polls answered and participation
+#    - response times (answeredAt - createdAt): percentiles by poll type, a
+#      histogram and each poll's median
+#
+#  Needs numpy (pip install numpy). The columns can be saved as a .npz file,
+#  or as Parquet tables with the optional 'pyarrow' package, and analyzed
+#  again later with --columns.
+#
+#  Polls saved before answeredAt was recorded have no response times; sharded
+#  polls closed before their responses were merged into the room, and whose
+#  shards were already cleaned up, only have their tallies.
+#
+#  JSON dumps hold each document's fields, with its subcollections under
+#  "__collections__": {"rooms": {"1234": {..., "__collections__": {"students":
+#  {...}, "questionHistory": {...}, "pollShards": {...}}}}}. Timestamps may be
+#  seconds, {"_seconds": ..., "_nanoseconds": ...} or ISO 8601 strings.
+#
+#  Usage:
+#    python tools/poll_analytics.py --synthetic 10000
+#    python tools/poll_analytics.py --synthetic 10000 --write-dump term.json --out term.npz --verify
+#    python tools/poll_analytics.py --dump term.json --out term-parquet/
+#    python tools/poll_analytics.py --columns term.npz
+# ==============================================================================
+
+# pollOptions in startPoll() (teacher-dashboard.js)
+POLL_OPTIONS = {'yes_no': 2, 'multiple_choice': 4, 'open_text': 0}
+OPEN_TEXT = 'open_text'
+COLLECTIONS_KEY = '__collections__'
+ANONYMOUS = -1  # Student code of responses only known from a poll's tallies
+NO_ANSWER = -1  # Answer code of open-text responses, which aren't tallied
+RESPONSE_TIME_PERCENTILES = (50, 90, 95, 99)
+RESPONSE_TIME_BINS = (0, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300, math.inf)
+ROOM_SUBCOLLECTIONS = ('students', 'questionHistory', 'pollShards')
+
+# --synthetic: a term of lessons of SYNTHETIC_POLLS_PER_ROOM polls each
+SYNTHETIC_POLLS_PER_ROOM = 25
+SYNTHETIC_CLASS_SIZE = 30
+SYNTHETIC_ANSWER_RATE = 0.85
+SYNTHETIC_SHARDED_FRACTION = 0.3
+SYNTHETIC_MEDIAN_RESPONSE_SECONDS = 20
+SEED_BATCH_SIZE = 500
+TERM_START = 1767225600.0  # 2026-01-01
+
+COLUMNS = {
+    'polls': ('room', 'poll_id', 'type', 'options', 'created_at', 'closed_at', 'roster'),
+    'responses': ('poll', 'student', 'answer', 'answers_given', 'answered_at'),
+    'members': ('room', 'student'),
+    'vocabulary': ('rooms', 'students', 'answers', 'types')
+}
+
+class Vocabulary:
+    """Dense integer codes for strings, in first-seen order."""
+
+    def __init__(self, values=()):
+        self.values = []
+        self.codes = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def array(self):
+        return np.array(self.values, dtype=str)
+
+def to_seconds(value):
+    """Seconds since the epoch from any timestamp form in the stand-in or a dump; NaN if missing."""
+    if value is None:
+        return math.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, dict):
+        seconds = value.get('_seconds', value.get('seconds', math.nan))
+        return seconds + value.get('_nanoseconds', value.get('nanoseconds', 0)) / 1e9
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    return math.nan
+
+# --- Sources: each yields (room code, room fields, {subcollection: {document ID: fields}}) ---
+
+def rooms_from_standin(db):
+    for room in db.collection('rooms').get():
+        subcollections = {name: {doc.id: doc.to_dict() for doc in room.reference.collection(name).get()}
+                          for name in ROOM_SUBCOLLECTIONS}
+        yield room.id, room.to_dict(), subcollections
+
+def rooms_from_dump(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        dump = json.load(f)
+    for room_code, room in dump.get('rooms', {}).items():
+        room = dict(room)
+        subcollections = room.pop(COLLECTIONS_KEY, {})
+        yield room_code, room, {name: subcollections.get(name, {}) for name in ROOM_SUBCOLLECTIONS}
+
+def write_dump(db, path):
+    """Writes the stand-in's rooms as a JSON dump that --dump reads."""
+    rooms = {}
+    for room_code, room, subcollections in rooms_from_standin(db):
+        rooms[room_code] = {**room, COLLECTIONS_KEY: subcollections}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'rooms': rooms}, f)
+
+# --- Export to columns ---
+
+def export_columns(rooms):
+    """
+    One pass over the rooms' documents into columns. Every (poll, responder)
+    is one row of 'responses'; polls only known from their tallies get one
+    ANONYMOUS row per counted answer.
+    """
+    vocabularies = {'rooms': Vocabulary(), 'students': Vocabulary(), 'answers': Vocabulary(),
+                    'types': Vocabulary(POLL_OPTIONS)}
+    polls = {name: [] for name in COLUMNS['polls']}
+    responses = {name: [] for name in COLUMNS['responses']}
+    members = {name: [] for name in COLUMNS['members']}
+
+    for room_code, _, subcollections in rooms:
+        room = vocabularies['rooms'].code(room_code)
+        # Open-text responses are keyed by the sanitized player name
+        by_name = {}
+        for student_id, student in subcollections['students'].items():
+            uid = student.get('uid') or student_id
+            by_name[app_functions.sanitize_player_name(student.get('name') or '')] = uid
+            members['room'].append(room)
+            members['student'].append(vocabularies['students'].code(uid))
+
+        shards = {}
+        for shard in subcollections['pollShards'].values():
+            merged = shards.setdefault(shard.get('pollId'), {'responses': {}, 'answeredAt': {}})
+            merged['responses'].update(shard.get('responses') or {})
+            merged['answeredAt'].update(shard.get('answeredAt') or {})
+
+        for poll_id, poll in subcollections['questionHistory'].items():
+            poll_type = poll.get('type') or OPEN_TEXT
+            index = len(polls['room'])
+            polls['room'].append(room)
+            polls['poll_id'].append(poll.get('id') or poll_id)
+            polls['type'].append(vocabularies['types'].code(poll_type))
+            polls['options'].append(poll.get('options') or 0)
+            polls['created_at'].append(to_seconds(poll.get('createdAt')))
+            polls['closed_at'].append(to_seconds(poll.get('closedAt')))
+            polls['roster'].append(len(subcollections['students']))
+
+            answers = dict(poll.get('responses') or {})
+            answered_at = dict(poll.get('answeredAt') or {})
+            shard = shards.get(poll.get('id') or poll_id)
+            if shard:
+                answers.update(shard['responses'])
+                answered_at.update(shard['answeredAt'])
+
+            if not answers:
+                for answer, count in (poll.get('tallies') or {}).items():
+                    code = vocabularies['answers'].code(str(answer))
+                    for column, value in (('poll', index), ('student', ANONYMOUS), ('answer', code),
+                                          ('answers_given', 1), ('answered_at', math.nan)):
+                        responses[column].extend([value] * count)
+                continue
+
+            for key, value in answers.items():
+                uid = by_name.get(key, key) if poll_type == OPEN_TEXT else key
+                responses['poll'].append(index)
+                responses['student'].append(vocabularies['students'].code(uid))
+                if isinstance(value, list):
+                    responses['answer'].append(NO_ANSWER)
+                    responses['answers_given'].append(len(value))
+                else:
+                    responses['answer'].append(vocabularies['answers'].code(str(value)))
+                    responses['answers_given'].append(1)
+                responses['answered_at'].append(to_seconds(answered_at.get(key)))
+
+    dtypes = {'room': np.int32, 'poll_id': str, 'type': np.int8, 'options': np.int16, 'created_at': np.float64,
+              'closed_at': np.float64, 'roster': np.int32, 'poll': np.int32, 'student': np.int32,
+              'answer': np.int32, 'answers_given': np.int32, 'answered_at': np.float64}
+    term = {}
+    for table, columns in (('polls', polls), ('responses', responses), ('members', members)):
+        term[table] = {name: np.array(values, dtype=dtypes[name]) for name, values in columns.items()}
+    term['vocabulary'] = {name: vocabulary.array() for name, vocabulary in vocabularies.items()}
+    return term
+
+def save_columns(term, path):
+    """A .npz file, or a directory of Parquet tables (needs pyarrow)."""
+    if path.endswith('.npz'):
+        np.savez_compressed(path, **{f"{table}.{name}": values
+                                     for table, columns in term.items() for name, values in columns.items()})
+        return
+    if pyarrow is None:
+        raise RuntimeError("Writing Parquet needs the 'pyarrow' package (pip install pyarrow); "
+                           "or pass a .npz path.")
+    os.makedirs(path, exist_ok=True)
+    for table, columns in term.items():
+        if table == 'vocabulary':
+            for name, values in columns.items():
+                pyarrow.parquet.write_table(pyarrow.table({'value': values}),
+                                            os.path.join(path, f"vocabulary.{name}.parquet"))
+        else:
+            pyarrow.parquet.write_table(pyarrow.table(columns), os.path.join(path, f"{table}.parquet"))
+
+def load_columns(path):
+    with np.load(path) as data:
+        term = {table: {} for table in COLUMNS}
+        for key in data.files:
+            table, name = key.split('.', 1)
+            term[table][name] = data[key]
+    return term
+
+# --- Analysis ---
+
+def group_medians(groups, values, count):
+    """Median of values per group (NaN for empty groups), with one sort instead of a loop."""
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    sizes = np.bincount(groups, minlength=count)
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    medians = np.full(count, np.nan)
+    present = sizes > 0
+    low = starts[present] + (sizes[present] - 1) // 2
+    high = starts[present] + sizes[present] // 2
+    medians[present] = (values[low] + values[high]) / 2
+    return medians
+
+def analyze(term):
+    """Tallies, participation and response times for a term, as arrays."""
+    polls, responses, members, vocabulary = term['polls'], term['responses'], term['members'], term['vocabulary']
+    poll_count = len(polls['room'])
+    student_count = len(vocabulary['students'])
+    answer_count = len(vocabulary['answers'])
+    room_count = len(vocabulary['rooms'])
+
+    poll = responses['poll']
+    student = responses['student']
+    answer = responses['answer']
+    tallied = answer >= 0
+    known = student >= 0
+
+    tallies = np.bincount(poll[tallied] * answer_count + answer[tallied],
+                          minlength=poll_count * answer_count).reshape(poll_count, answer_count)
+    respondents = np.bincount(poll, minlength=poll_count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        poll_participation = np.where(polls['roster'] > 0, respondents / polls['roster'], np.nan)
+
+    tallied_known = tallied & known
+    student_tallies = np.bincount(student[tallied_known] * answer_count + answer[tallied_known],
+                                  minlength=student_count * answer_count).reshape(student_count, answer_count)
+    answered = np.bincount(student[known], minlength=student_count)
+    polls_per_room = np.bincount(polls['room'], minlength=room_count)
+    offered = np.bincount(members['student'], weights=polls_per_room[members['room']],
+                          minlength=student_count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        student_participation = np.where(offered > 0, answered / offered, np.nan)
+
+    response_time = responses['answered_at'] - polls['created_at'][poll]
+    timed = np.isfinite(response_time) & (response_time >= 0)
+    timed_polls, timed_times = poll[timed], response_time[timed]
+    poll_types = polls['type'][timed_polls]
+    percentiles = {}
+    for code, name in enumerate(vocabulary['types']):
+        times = timed_times[poll_types == code]
+        if len(times):
+            percentiles[str(name)] = np.percentile(times, RESPONSE_TIME_PERCENTILES)
+    if len(timed_times):
+        percentiles['all'] = np.percentile(timed_times, RESPONSE_TIME_PERCENTILES)
+    histogram, _ = np.histogram(timed_times, bins=RESPONSE_TIME_BINS)
+    timed_students = known[timed]
+    student_times = np.bincount(student[timed][timed_students], weights=timed_times[timed_students],
+                                minlength=student_count)
+    student_timed = np.bincount(student[timed][timed_students], minlength=student_count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        student_mean_time = np.where(student_timed > 0, student_times / student_timed, np.nan)
+
+    return {
+        'tallies': tallies,
+        'leading_answer': np.where(tallies.sum(axis=1) > 0, tallies.argmax(axis=1), NO_ANSWER),
+        'respondents': respondents,
+        'poll_participation': poll_participation,
+        'poll_median_response_time': group_medians(timed_polls, timed_times, poll_count),
+        'student_tallies': student_tallies,
+        'student_answered': answered,
+        'student_offered': offered,
+        'student_participation': student_participation,
+        'student_mean_response_time': student_mean_time,
+        'response_time_percentiles': percentiles,
+        'response_time_histogram': histogram,
+        'timed_responses': int(timed.sum())
+    }
+
+def loop_tallies(term):
+    """analyze()'s poll tallies and respondents with plain Python loops, for --verify."""
+    poll_count = len(term['polls']['room'])
+    answer_count = len(term['vocabulary']['answers'])
+    tallies = [[0] * answer_count for _ in range(poll_count)]
+    respondents = [0] * poll_count
+    for poll, answer in zip(term['responses']['poll'].tolist(), term['responses']['answer'].tolist()):
+        respondents[poll] += 1
+        if answer >= 0:
+            tallies[poll][answer] += 1
+    return np.array(tallies, dtype=np.int64).reshape(poll_count, answer_count), np.array(respondents)
+
+# --- Synthetic term ---
+
+def seed_term(db, poll_total, seed):
+    """
+    Rooms of SYNTHETIC_CLASS_SIZE students with questionHistory as
+    saveQuestionToHistory leaves it; sharded polls also keep their responses in
+    pollShards, and their tallies on the poll. Returns the answers seeded.
+    """
+    rng = random.Random(seed)
+    rooms = math.ceil(poll_total / SYNTHETIC_POLLS_PER_ROOM)
+    seeded = 0
+    batch, pending = db.batch(), 0
+
+    def write(reference, data):
+        nonlocal batch, pending
+        batch.set(reference, data)
+        pending += 1
+        if pending >= SEED_BATCH_SIZE:
+            batch.commit()
+            batch, pending = db.batch(), 0
+
+    for room_number in range(rooms):
+        room_code = f"{room_number:05d}"
+        room_ref = db.collection('rooms').document(room_code)
+        write(room_ref, {'room_code': room_code, 'teacher_uid': 'teacher', 'settings': {}})
+        students = [(f"student_{room_number % 40:02d}_{index:02d}", f"Student {index}")
+                    for index in range(SYNTHETIC_CLASS_SIZE)]
+        for uid, name in students:
+            write(room_ref.collection('students').document(uid), {'uid': uid, 'name': name,
+                                                                  'joined_at': TERM_START})
+        lesson_start = TERM_START + room_number * 86400
+        polls_here = min(SYNTHETIC_POLLS_PER_ROOM, poll_total - room_number * SYNTHETIC_POLLS_PER_ROOM)
+        for poll_number in range(polls_here):
+            poll_type = rng.choice(list(POLL_OPTIONS))
+            poll_id = f"poll_{room_code}_{poll_number:02d}"
+            created_at = lesson_start + poll_number * 120
+            sharded = poll_type != OPEN_TEXT and rng.random() < SYNTHETIC_SHARDED_FRACTION
+            responses, answered_at, tallies = {}, {}, {}
+            for uid, name in students:
+                if rng.random() > SYNTHETIC_ANSWER_RATE:
+                    continue
+                key = app_functions.sanitize_player_name(name) if poll_type == OPEN_TEXT else uid
+                if poll_type == OPEN_TEXT:
+                    responses[key] = [f"Answer from {name}"] * rng.randint(1, 3)
+                else:
+                    responses[key] = rng.randint(1, POLL_OPTIONS[poll_type])
+                    tallies[str(responses[key])] = tallies.get(str(responses[key]), 0) + 1
+                answered_at[key] = created_at + rng.lognormvariate(math.log(SYNTHETIC_MEDIAN_RESPONSE_SECONDS), 0.6)
+                seeded += 1
+            poll = {'id': poll_id, 'type': poll_type, 'question': '', 'options': POLL_OPTIONS[poll_type],
+                    'isActive': True, 'createdAt': created_at, 'closedAt': created_at + 90,
+                    'responseStore': 'shards' if sharded else 'room'}
+            if sharded:
+                # What the final aggregatePollResponses merged into the room
+                poll.update(responses=responses, answeredAt=answered_at, tallies=tallies,
+                            responseCount=len(responses))
+                shards = {}
+                for key, value in responses.items():
+                    shard = shards.setdefault(app_functions.shard_for(key),
+                                              {'pollId': poll_id, 'responses': {}, 'answeredAt': {}})
+                    shard['responses'][key] = value
+                    shard['answeredAt'][key] = answered_at[key]
+                for number, shard in shards.items():
+                    write(room_ref.collection('pollShards').document(f"{poll_id}_{number}"), shard)
+            else:
+                poll.update(responses=responses, answeredAt=answered_at)
+            write(room_ref.collection('questionHistory').document(poll_id), poll)
+    batch.commit()
+    return seeded
+
+# --- Report ---
+
+def print_report(term, results, timings):
+    polls, vocabulary = term['polls'], term['vocabulary']
+    participation = results['poll_participation'][np.isfinite(results['poll_participation'])]
+    student_participation = results['student_participation'][np.isfinite(results['student_participation'])]
+
+    print("\n" + "="*78)
+    print(f"  {len(polls['room']):,} polls in {len(vocabulary['rooms']):,} rooms, "
+          f"{len(term['responses']['poll']):,} responses from {len(vocabulary['students']):,} students")
+    if len(participation):
+        print(f"  Poll participation:    mean {participation.mean():.0%}, "
+              f"p10 {np.percentile(participation, 10):.0%}, p50 {np.percentile(participation, 50):.0%}")
+    if len(student_participation):
+        print(f"  Student participation: mean {student_participation.mean():.0%}, "
+              f"{(student_participation < 0.5).sum():,} students answered under half of their polls")
+
+    print(f"\n  Response time (s, {results['timed_responses']:,} timed responses)")
+    print(f"  {'type':<16}" + "".join(f"{'p' + str(p):>9}" for p in RESPONSE_TIME_PERCENTILES))
+    for name, values in results['response_time_percentiles'].items():
+        print(f"  {name:<16}" + "".join(f"{value:>9.1f}" for value in values))
+    total = results['response_time_histogram'].sum()
+    if total:
+        print()
+        for low, high, count in zip(RESPONSE_TIME_BINS, RESPONSE_TIME_BINS[1:], results['response_time_histogram']):
+            label = f"{low:g}-{high:g}s" if math.isfinite(high) else f"{low:g}s+"
+            print(f"  {label:>10} {count:>9,} {'█' * round(40 * count / total)}")
+
+    answers = vocabulary['answers']
+    overall = results['tallies'].sum(axis=0)
+    if len(answers):
+        print("\n  Answers overall: " + ", ".join(f"{answers[code]}: {overall[code]:,}"
+                                                  for code in np.argsort(answers)))
+    print("\n  " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings))
+    print("="*78)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export poll history to columns and compute term analytics.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--synthetic', type=int, metavar='POLLS',
+                        help="Seed the in-memory stand-in with a term of this many polls and export it.")
+    source.add_argument('--dump', metavar='FILE', help="Export from a JSON dump of the rooms collection.")
+    source.add_argument('--columns', metavar='FILE', help="Analyze columns saved earlier with --out (.npz).")
+    parser.add_argument('--out', metavar='PATH',
+                        help="Save the columns: a .npz file, or a directory of Parquet tables (needs pyarrow).")
+    parser.add_argument('--write-dump', metavar='FILE', help="With --synthetic, also write the term as a JSON dump.")
+    parser.add_argument('--json', metavar='FILE', help="Write the per-poll and per-student results as JSON.")
+    parser.add_argument('--verify', action='store_true',
+                        help="Check the vectorized tallies against a plain Python count.")
+    parser.add_argument('--seed', type=int, default=1, help="Random seed for --synthetic (default: 1).")
+    args = parser.parse_args()
+
+    timings = []
+    if args.columns:
+        start = time.perf_counter()
+        term = load_columns(args.columns)
+        timings.append(('load', time.perf_counter() - start))
+    else:
+        if args.synthetic:
+            db = firestore_standin.Client()
+            start = time.perf_counter()
+            seeded = seed_term(db, args.synthetic, args.seed)
+            print(f"--- Seeded {args.synthetic:,} polls with {seeded:,} answers "
+                  f"in {time.perf_counter() - start:.1f}s ---")
+            if args.write_dump:
+                write_dump(db, args.write_dump)
+                print(f"💾 Dump written to '{args.write_dump}'")
+            rooms = rooms_from_standin(db)
+        else:
+            rooms = rooms_from_dump(args.dump)
+        start = time.perf_counter()
+        term = export_columns(rooms)
+        timings.append(('export', time.perf_counter() - start))
+
+    if args.out:
+        start = time.perf_counter()
+        try:
+            save_columns(term, args.out)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            sys.exit(2)
+        timings.append(('save', time.perf_counter() - start))
+        print(f"💾 Columns written to '{args.out}'")
+
+    start = time.perf_counter()
+    results = analyze(term)
+    timings.append(('analyze', time.perf_counter() - start))
+    print_report(term, results, timings)
+
+    if args.json:
+        polls, vocabulary = term['polls'], term['vocabulary']
+        report = {
+            'polls': [{'room': str(vocabulary['rooms'][room]), 'id': str(poll_id), 'type': str(vocabulary['types'][kind]),
+                       'respondents': int(respondents), 'participation': float(participation),
+                       'median_response_time': float(median),
+                       'tallies': {str(vocabulary['answers'][code]): int(count)
+                                   for code, count in enumerate(tallies) if count}}
+                      for room, poll_id, kind, respondents, participation, median, tallies in zip(
+                          polls['room'], polls['poll_id'], polls['type'], results['respondents'],
+                          results['poll_participation'], results['poll_median_response_time'], results['tallies'])],
+            'students': [{'id': str(student_id), 'answered': int(answered), 'offered': int(offered),
+                          'participation': float(participation), 'mean_response_time': float(mean_time)}
+                         for student_id, answered, offered, participation, mean_time in zip(
+                             vocabulary['students'], results['student_answered'], results['student_offered'],
+                             results['student_participation'], results['student_mean_response_time'])]
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)  # NaN for polls and students without data
+        print(f"📈 Results written to '{args.json}'")
+
+    if args.verify:
+        tallies, respondents = loop_tallies(term)
+        correct = np.array_equal(tallies, results['tallies']) and np.array_equal(respondents, results['respondents'])
+        print(f"{'✅' if correct else '❌'} Vectorized tallies {'match' if correct else 'differ from'} the loop count")
+        sys.exit(0 if correct else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import argparse
+import json
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import app_functions
+import firestore_standin
+from load_test import POLL_OPTIONS, percentile
+
+# ==============================================================================
+#  Benchmark: poll answers on the room document vs. sharded poll responses
+#
+#  For each class size, every student answers a running poll at once, first
+#  with responseStore 'room' (a transaction on the room document per answer)
+#  and then with 'shards' (a write to rooms/{code}/pollShards, merged into the
+#  room by aggregatePollResponses on the teacher's timer). Runs on the
+#  in-memory stand-in; the app code is ported in app_functions.py.
+#
+#  Reported per run: answers recorded out of those sent (failed answers are
+#  their own column, not folded into other figures), answers/s, p95 answer
+#  latency, transaction retries, writes to the room document, and the bytes
+#  that room listeners (every student plus the teacher) receive per recorded
+#  answer while the poll runs. The final aggregation of a sharded poll, which
+#  merges every student's answer into the room once, is reported separately.
+#
+#  Usage:
+#    python tools/poll_store_benchmark.py
+#    python tools/poll_store_benchmark.py --students 30,100 --poll-type open_text
+# ==============================================================================
+
+DEFAULT_CLASS_SIZES = '30,50,100,200'
+RESPONSE_STORES = ['room', 'shards']
+# pollAggregationInterval in teacher-dashboard.js is 2s; shorter runs need a faster timer
+DEFAULT_AGGREGATE_INTERVAL = 0.25
+
+def create_room(db, room_code, poll_type, response_store):
+    db.collection('rooms').document(room_code).set({
+        'room_code': room_code,
+        'teacher_uid': 'benchmark-teacher',
+        'settings': {
+            'currentPoll': {'isActive': True, 'id': f"poll_{room_code}", 'type': poll_type,
+                            'question': 'Benchmark question', 'options': len(POLL_OPTIONS),
+                            'responseStore': response_store, 'responses': {}}
+        }
+    })
+
+def listen_to_room(db, room_code, listeners):
+    """Room-document listeners, as each student and the teacher have; returns the byte counter."""
+    received = {'bytes': 0, 'snapshots': 0}
+    lock = threading.Lock()
+
+    def on_snapshot(snapshot):
+        size = len(json.dumps(snapshot.to_dict(), default=str))
+        with lock:
+            received['bytes'] += size
+            received['snapshots'] += 1
+
+    unsubscribes = [db.collection('rooms').document(room_code).on_snapshot(on_snapshot) for _ in range(listeners)]
+    return received, unsubscribes
+
+def recorded_answers(db, room_code, poll_type):
+    """Answers per option (or per student for open text) as the teacher's dashboard would see them."""
+    poll = db.collection('rooms').document(room_code).get().get('settings.currentPoll')
+    if poll_type == 'open_text':
+        return len(poll.get('responses') or {})
+    if 'tallies' in poll:
+        return poll['tallies']
+    tallies = {}
+    for answer in (poll.get('responses') or {}).values():
+        tallies[answer] = tallies.get(answer, 0) + 1
+    return tallies
+
+def run_once(students, response_store, poll_type, contention, aggregate_interval):
+    db = firestore_standin.Client(contention)
+    room_code = f"B{uuid.uuid4().hex[:5].upper()}"
+    room_path = f"rooms/{room_code}"
+    create_room(db, room_code, poll_type, response_store)
+    received, unsubscribes = listen_to_room(db, room_code, students + 1)
+    db.stats.reset()
+    received.update(bytes=0, snapshots=0)
+
+    answers = {}
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+
+    def answer(index):
+        nonlocal failures
+        student_id = f"student_{index:04d}"
+        player_name = f"Student {index + 1}"
+        value = POLL_OPTIONS[index % len(POLL_OPTIONS)] if poll_type != 'open_text' else f"Answer {index}"
+        start = time.perf_counter()
+        try:
+            app_functions.submit_poll_answer(db, room_code, student_id, player_name, value, response_store)
+        except firestore_standin.Aborted:
+            with lock:
+                failures += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - start)
+            answers[student_id] = value
+
+    done = threading.Event()
+
+    def aggregate():
+        # The teacher dashboard's timer while the poll runs
+        while not done.wait(aggregate_interval):
+            app_functions.aggregate_poll_responses(db, room_code)
+
+    aggregator = None
+    if response_store == 'shards':
+        aggregator = threading.Thread(target=aggregate, daemon=True)
+        aggregator.start()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=students) as executor:
+        list(executor.map(answer, range(students)))
+    duration = time.perf_counter() - start
+
+    running_bytes = received['bytes']
+    if aggregator:
+        done.set()
+        aggregator.join()
+        running_bytes = received['bytes']
+        # stopPoll() runs one last aggregation, which also saves the per-student answers
+        app_functions.aggregate_poll_responses(db, room_code, final=True)
+    final_bytes = received['bytes'] - running_bytes
+    for unsubscribe in unsubscribes:
+        unsubscribe()
+
+    if poll_type == 'open_text':
+        expected = len(answers)
+    else:
+        expected = {}
+        for value in answers.values():
+            expected[value] = expected.get(value, 0) + 1
+    counters = db.stats.counters
+    recorded = recorded_answers(db, room_code, poll_type)
+    recorded_count = recorded if poll_type == 'open_text' else sum(recorded.values())
+
+    return {
+        'students': students,
+        'store': response_store,
+        'recorded': recorded_count,
+        'failures': failures,
+        'answers_per_second': len(latencies) / duration if duration else 0.0,
+        'p95': percentile(sorted(latencies), 0.95),
+        'retries': counters.get('transaction_retries', 0),
+        'room_writes': db.stats.document_writes.get(room_path, 0),
+        'bytes_per_answer': running_bytes / recorded_count if recorded_count else 0.0,
+        'final_bytes': final_bytes,
+        'correct': recorded == expected
+    }
+
+def print_table(results):
+    print("\n" + "="*110)
+    print(f"  {'students':>8} {'store':<7} {'recorded':>8} {'failed':>7} {'answers/s':>10} {'p95':>9} "
+          f"{'retries':>8} {'room writes':>11} {'bytes/answer':>13} {'final merge':>12} {'tallies':>8}")
+    for result in results:
+        print(f"  {result['students']:>8} {result['store']:<7} {result['recorded']:>8} {result['failures']:>7} "
+              f"{result['answers_per_second']:>10.1f} {result['p95'] * 1000:>7.1f}ms {result['retries']:>8} "
+              f"{result['room_writes']:>11} {result['bytes_per_answer']:>13,.0f} {result['final_bytes']:>12,} "
+              f"{'✅' if result['correct'] else '❌':>7}")
+    print("="*110)
+    print("  bytes/answer: room-listener bytes while the poll ran, per recorded answer; "
+          "final merge: bytes of the closing aggregation")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare poll answers on the room document with sharded poll responses.")
+    parser.add_argument('--students', default=DEFAULT_CLASS_SIZES,
+                        help=f"Comma-separated class sizes to run (default: {DEFAULT_CLASS_SIZES}).")
+    parser.add_argument('--poll-type', choices=['multiple_choice', 'open_text'], default='multiple_choice')
+    parser.add_argument('--aggregate-interval', type=float, default=DEFAULT_AGGREGATE_INTERVAL,
+                        help=f"Seconds between aggregations of a sharded poll (default: {DEFAULT_AGGREGATE_INTERVAL}).")
+    parser.add_argument('--commit-latency', type=float, default=0.002,
+                        help="Seconds each commit takes (default: 0.002).")
+    parser.add_argument('--document-interval', type=float, default=0.002,
+                        help="Minimum seconds between writes to one document (default: 0.002).")
+    args = parser.parse_args()
+
+    try:
+        class_sizes = [int(size) for size in args.students.split(',')]
+    except ValueError:
+        print(f"❌ --students must be comma-separated numbers, got '{args.students}'")
+        sys.exit(2)
+
+    results = []
+    for students in class_sizes:
+        for response_store in RESPONSE_STORES:
+            print(f"--- {students} students, responseStore '{response_store}'... ---")
+            contention = firestore_standin.ContentionModel(args.commit_latency, args.document_interval)
+            results.append(run_once(students, response_store, args.poll_type, contention, args.aggregate_interval))
+    print_table(results)
+    sys.exit(0 if all(result['correct'] for result in results) else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+// Node side of tools/student_listener_replay.py (run that instead).
+//
+// Loads public/js/ClassroomSDK.js and public/js/teacher-dashboard.js into a VM
+// context with a fake Firestore and a minimal DOM, wires the teacher's students
+// listener the way TeacherDashboard.init() does, and times the listener on
+// every snapshot of a recorded change stream.
+//
+// stdin:  {"mode": "full" | "delta", "snapshots": [{"phase": ..., "changes": [{type, id, data}]}]}
+// stdout: {"events": [[phase, changes, nanoseconds, domNodesCreated], ...], "consistent": true}
+
+const fs = require('fs');
+const path = require('path');
+const vm = require('vm');
+
+const ROOT = path.join(__dirname, '..');
+const SCRIPTS = ['public/js/ClassroomSDK.js', 'public/js/teacher-dashboard.js'];
+
+const dom = { created: 0 };
+
+class FakeElement {
+    constructor(tagName) {
+        this.tagName = tagName;
+        this.children = [];
+        this.parentNode = null;
+        this.className = '';
+        this.style = {};
+        this._text = '';
+        dom.created++;
+    }
+
+    get firstElementChild() { return this.children[0] || null; }
+    get textContent() { return this._text; }
+    set textContent(value) { this._clear(); this._text = String(value); }
+    get innerHTML() { return this._text; }
+    set innerHTML(html) {
+        // Markup is not parsed; it counts as one node
+        this._clear();
+        this._text = html;
+        if (html) dom.created++;
+    }
+
+    _clear() {
+        this.children.forEach(child => { child.parentNode = null; });
+        this.children = [];
+    }
+
+    _detach(child) {
+        if (child.parentNode) {
+            const siblings = child.parentNode.children;
+            siblings.splice(siblings.indexOf(child), 1);
+            child.parentNode = null;
+        }
+    }
+
+    insertBefore(child, reference) {
+        const nodes = child.tagName === '#fragment' ? child.children.slice() : [child];
+        nodes.forEach(node => this._detach(node));
+        const index = reference ? this.children.indexOf(reference) : -1;
+        this.children.splice(index < 0 ? this.children.length : index, 0, ...nodes);
+        nodes.forEach(node => { node.parentNode = this; });
+        return child;
+    }
+
+    appendChild(child) { return this.insertBefore(child, null); }
+    remove() { this._detach(this); }
+
+    querySelector(selector) {
+        const className = selector.replace(/^\./, '');
+        for (const child of this.children) {
+            if (child.className.split(' ').includes(className)) return child;
+            const found = child.querySelector(selector);
+            if (found) return found;
+        }
+        return null;
+    }
+
+    cloneNode(deep) {
+        const copy = new FakeElement(this.tagName);
+        copy.className = this.className;
+        copy._text = this._text;
+        if (deep) this.children.forEach(child => copy.appendChild(child.cloneNode(true)));
+        return copy;
+    }
+}
+
+function element(tagName, className, children = []) {
+    const node = new FakeElement(tagName);
+    node.className = className;
+    children.forEach(child => node.appendChild(child));
+    return node;
+}
+
+function createDocument() {
+    // The parts of public/index.html the students list uses
+    const template = new FakeElement('template');
+    template.content = element('#fragment', '', [
+        element('div', 'student-item', [
+            element('div', 'student-info', [element('span', 'student-name'), element('div', 'student-actions')])
+        ])
+    ]);
+    const elements = {
+        studentsList: new FakeElement('div'),
+        studentsCount: new FakeElement('span'),
+        activitiesArea: new FakeElement('div'),
+        studentTemplate: template
+    };
+    return {
+        getElementById: id => elements[id] || null,
+        createElement: tagName => new FakeElement(tagName),
+        importNode: (node, deep) => node.cloneNode(deep),
+        querySelector: () => null,
+        addEventListener: () => {}
+    };
+}
+
+// A students collection whose snapshots are pushed by the replay
+function createFirebase(collection) {
+    const chain = { collection: () => chain, doc: () => chain, onSnapshot: handler => {
+        collection.handler = handler;
+        return () => { collection.handler = null; };
+    } };
+    return {
+        firestore: () => chain,
+        auth: () => ({ currentUser: { uid: 'replay-teacher' } }),
+        app: () => ({ functions: () => ({}) })
+    };
+}
+
+function snapshotFor(documents, changes) {
+    // documents: id -> data, kept sorted by id like an unordered Firestore query
+    const ids = Array.from(documents.keys()).sort();
+    const docs = ids.map(id => ({ id, data: () => documents.get(id) }));
+    return {
+        size: docs.length,
+        forEach: callback => docs.forEach(callback),
+        docChanges: () => changes
+    };
+}
+
+function main() {
+    const input = JSON.parse(fs.readFileSync(0, 'utf8'));
+    const collection = { handler: null };
+    const silent = () => {};
+    const context = vm.createContext({
+        console: { log: silent, warn: silent, error: silent, info: silent },
+        document: createDocument(),
+        firebase: createFirebase(collection),
+        alert: silent,
+        setTimeout, clearTimeout, setInterval, clearInterval
+    });
+    context.window = context;
+    SCRIPTS.forEach(script => vm.runInContext(fs.readFileSync(path.join(ROOT, script), 'utf8'), context,
+                                              { filename: script }));
+
+    const dashboard = vm.runInContext(`
+        const sdk = new ClassroomSDK();
+        sdk.roomCode = 'REPLAY';
+        sdk.isTeacher = true;
+        const dashboard = new TeacherDashboard();
+        dashboard.sdk = sdk;
+        dashboard;`, context);
+    if (input.mode === 'delta') {
+        dashboard.sdk.listenForStudents(dashboard.applyStudentChanges.bind(dashboard), { delta: true });
+    } else {
+        dashboard.sdk.listenForStudents(dashboard.updateStudentsList.bind(dashboard));
+    }
+
+    const documents = new Map();
+    const events = [];
+    input.snapshots.forEach(({ phase, changes }) => {
+        // Apply the changes and work out Firestore's indexes before the clock starts
+        const docChanges = [];
+        changes.forEach(change => {
+            const before = Array.from(documents.keys()).sort();
+            if (change.type === 'removed') {
+                documents.delete(change.id);
+            } else {
+                documents.set(change.id, change.data);
+            }
+            const after = Array.from(documents.keys()).sort();
+            docChanges.push({
+                type: change.type,
+                doc: { id: change.id, data: () => change.data },
+                oldIndex: before.indexOf(change.id),
+                newIndex: after.indexOf(change.id)
+            });
+        });
+        const snapshot = snapshotFor(documents, docChanges);
+
+        const createdBefore = dom.created;
+        const start = process.hrtime.bigint();
+        collection.handler(snapshot);
+        const elapsed = process.hrtime.bigint() - start;
+        events.push([phase, changes.length, Number(elapsed), dom.created - createdBefore]);
+    });
+
+    // The list on screen must match the collection, in order, whichever mode drew it
+    const names = context.document.getElementById('studentsList').children
+        .map(child => child.querySelector('.student-name'))
+        .map(nameSpan => nameSpan ? nameSpan.textContent : null);
+    const expected = Array.from(documents.keys()).sort().map(id => documents.get(id).name);
+    const consistent = JSON.stringify(names) === JSON.stringify(expected);
+    process.stdout.write(JSON.stringify({ events, consistent }));
+}
+
+main();
@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+
+from load_test import percentile
+
+# ==============================================================================
+#  Replay harness for the teacher's students listener
+#
+#  Feeds a change stream for rooms/{code}/students through the real
+#  ClassroomSDK.listenForStudents + TeacherDashboard code (run under node with a
+#  fake Firestore and a minimal DOM, see student_listener_replay.js) and times
+#  each snapshot, in both modes:
+#    - full:  the whole list is rebuilt and re-rendered on every change
+#    - delta: listenForStudents({ delta: true }) + applyStudentChanges
+#
+#  A synthetic stream has every student join one by one, then student
+#  documents being updated (as a heartbeat would), then a few students leaving.
+#  Streams can be written with --record and replayed later with --stream, one
+#  snapshot per line: {"phase": "update", "changes": [{"type": "modified", "id": ..., "data": {...}}]}
+#
+#  The DOM is a stand-in, so the JS times are relative; DOM nodes created per
+#  event is the number that carries over to a browser.
+#
+#  Usage:
+#    python tools/student_listener_replay.py
+#    python tools/student_listener_replay.py --students 30,300 --updates 1000
+#    python tools/student_listener_replay.py --students 100 --record stream.jsonl
+#    python tools/student_listener_replay.py --stream stream.jsonl --json results.json
+# ==============================================================================
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+DRIVER = os.path.join(TOOLS_DIR, 'student_listener_replay.js')
+DEFAULT_CLASS_SIZES = '10,30,100,300'
+DEFAULT_UPDATES = 500
+LEAVE_FRACTION = 0.1
+MODES = ['full', 'delta']
+PHASES = ['join', 'update', 'leave']
+
+def synthetic_stream(students, updates, seed=0):
+    """Snapshots for a class of `students`: joins, `updates` single-document updates, then leaves."""
+    rng = random.Random(seed)
+    ids = [f"student_{rng.getrandbits(48):012x}" for _ in range(students)]
+    data = {}
+    snapshots = []
+    for index, student_id in enumerate(ids):
+        data[student_id] = {'uid': student_id, 'name': f"Student {index + 1}", 'joined_at': index}
+        snapshots.append({'phase': 'join', 'changes': [{'type': 'added', 'id': student_id, 'data': data[student_id]}]})
+    for tick in range(updates):
+        student_id = rng.choice(ids)
+        data[student_id] = dict(data[student_id], last_seen=students + tick)
+        snapshots.append({'phase': 'update', 'changes': [{'type': 'modified', 'id': student_id, 'data': data[student_id]}]})
+    for student_id in rng.sample(ids, int(students * LEAVE_FRACTION)):
+        snapshots.append({'phase': 'leave', 'changes': [{'type': 'removed', 'id': student_id, 'data': data[student_id]}]})
+    return snapshots
+
+def read_stream(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def write_stream(path, snapshots):
+    with open(path, 'w', encoding='utf-8') as f:
+        for snapshot in snapshots:
+            f.write(json.dumps(snapshot) + '\n')
+
+def class_size(snapshots):
+    """Most students present at once in a stream."""
+    present = set()
+    largest = 0
+    for snapshot in snapshots:
+        for change in snapshot['changes']:
+            if change['type'] == 'removed':
+                present.discard(change['id'])
+            else:
+                present.add(change['id'])
+        largest = max(largest, len(present))
+    return largest
+
+def replay(node, snapshots, mode):
+    result = subprocess.run([node, DRIVER], input=json.dumps({'mode': mode, 'snapshots': snapshots}),
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Replay driver failed ({mode}):\n{result.stderr.strip()}")
+    return json.loads(result.stdout)
+
+def summarize(students, mode, output):
+    summary = {'students': students, 'mode': mode, 'consistent': output['consistent'], 'phases': {}}
+    for phase in PHASES:
+        events = [event for event in output['events'] if event[0] == phase]
+        if not events:
+            continue
+        micros = sorted(event[2] / 1000 for event in events)
+        summary['phases'][phase] = {
+            'events': len(events),
+            'mean_us': sum(micros) / len(micros),
+            'p95_us': percentile(micros, 0.95),
+            'dom_nodes_per_event': sum(event[3] for event in events) / len(events)
+        }
+    return summary
+
+def print_table(summaries):
+    print("\n" + "="*92)
+    print(f"  {'students':>8} {'mode':<6} {'phase':<7} {'events':>7} {'mean':>10} {'p95':>10} {'DOM nodes/event':>16} {'list':>5}")
+    for summary in summaries:
+        for phase, numbers in summary['phases'].items():
+            print(f"  {summary['students']:>8} {summary['mode']:<6} {phase:<7} {numbers['events']:>7} "
+                  f"{numbers['mean_us']:>8.1f}µs {numbers['p95_us']:>8.1f}µs {numbers['dom_nodes_per_event']:>16.1f} "
+                  f"{'✅' if summary['consistent'] else '❌':>4}")
+    print("="*92)
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay students-collection change streams through the teacher "
+                                                 "dashboard and time the full and delta listener modes.")
+    parser.add_argument('--students', default=DEFAULT_CLASS_SIZES,
+                        help=f"Comma-separated class sizes for synthetic streams (default: {DEFAULT_CLASS_SIZES}).")
+    parser.add_argument('--updates', type=int, default=DEFAULT_UPDATES,
+                        help=f"Student-document updates per synthetic stream (default: {DEFAULT_UPDATES}).")
+    parser.add_argument('--stream', metavar='FILE', help="Replay a recorded stream (JSON lines) instead.")
+    parser.add_argument('--record', metavar='FILE',
+                        help="Write the synthetic stream to FILE (needs a single --students size).")
+    parser.add_argument('--json', metavar='FILE', help="Also write the results to FILE as JSON.")
+    args = parser.parse_args()
+
+    node = shutil.which('node')
+    if not node:
+        print("❌ node was not found on PATH; the replay runs the dashboard code under Node.js.")
+        sys.exit(1)
+
+    if args.stream:
+        streams = [read_stream(args.stream)]
+    else:
+        try:
+            sizes = [int(size) for size in args.students.split(',')]
+        except ValueError:
+            print(f"❌ --students must be comma-separated numbers, got '{args.students}'")
+            sys.exit(2)
+        streams = [synthetic_stream(size, args.updates) for size in sizes]
+        if args.record:
+            if len(streams) != 1:
+                print("❌ --record needs a single class size in --students")
+                sys.exit(2)
+            write_stream(args.record, streams[0])
+            print(f"💾 Stream written to '{args.record}' ({len(streams[0])} snapshots)")
+
+    summaries = []
+    for snapshots in streams:
+        students = class_size(snapshots)
+        for mode in MODES:
+            print(f"--- {students} students, {len(snapshots)} snapshots, {mode} mode... ---")
+            summaries.append(summarize(students, mode, replay(node, snapshots, mode)))
+    print_table(summaries)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summaries, f, indent=2)
+        print(f"📈 Results written to '{args.json}'")
+    sys.exit(0 if all(summary['consistent'] for summary in summaries) else 1)
+
+if __name__ == "__main__":
+    main()